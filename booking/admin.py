@@ -1,15 +1,26 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
+from django.db import transaction
+from django.utils import timezone
 from core.admin import admin_site  # Import custom admin
-from .models import Booking, BookingSettings
+from core.export import ExportMixin
+from .models import Booking, BookingSettings, OutboxMessage
+from . import availability, occupancy, outbox
 
 @admin.register(Booking, site=admin_site)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(ExportMixin, admin.ModelAdmin):
     # Use 'listing' if that's your model field name, otherwise 'property'
     list_display = ('user_info', 'property_info', 'date_display', 'status_badge')
     list_filter = ('status', 'start_datetime')
     search_fields = ('user__username', 'user__email', 'listing__title')
-    actions = ['mark_as_confirmed', 'mark_as_completed', 'mark_as_cancelled']
+    list_select_related = ('user', 'listing')
+    actions = ['mark_as_confirmed', 'mark_as_completed', 'mark_as_cancelled', 'export_csv', 'export_jsonl']
+    export_fields = (
+        ('id', 'id'), ('status', 'status'), ('start', 'start_datetime'), ('end', 'end_datetime'),
+        ('listing_id', 'listing_id'), ('listing', 'listing__title'), ('listing_city', 'listing__city'),
+        ('client', 'user__username'), ('client_email', 'user__email'),
+        ('agent', 'agent__name'), ('notes', 'notes'), ('created_at', 'created_at'),
+    )
 
     def user_info(self, obj):
         return f"{obj.user.first_name} {obj.user.last_name} ({obj.user.username})"
@@ -40,22 +51,47 @@ class BookingAdmin(admin.ModelAdmin):
 
     # Admin Actions
     def mark_as_confirmed(self, request, queryset):
-        queryset.update(status='confirmed')
+        # update() skips save() and post_save, so claim capacity and queue the e-mails ourselves
+        try:
+            with transaction.atomic():
+                to_confirm = list(queryset.exclude(status='confirmed').select_related('listing__booking_settings'))
+                for booking in to_confirm:
+                    if booking.status not in Booking.ACTIVE_STATUSES:
+                        occupancy.reserve(booking.listing_id, booking.get_settings(),
+                                          booking.start_datetime, booking.end_datetime)
+                queryset.update(status='confirmed')
+                outbox.enqueue_many(OutboxMessage.BOOKING_CONFIRMED, to_confirm)
+        except occupancy.SlotUnavailable as e:
+            self.message_user(request, f"Nothing confirmed: {e}", messages.ERROR)
+            return
+        for listing_id in {b.listing_id for b in to_confirm}:
+            availability.invalidate(listing_id)
     mark_as_confirmed.short_description = "Confirm selected bookings"
 
     def mark_as_completed(self, request, queryset):
-        queryset.update(status='completed')
+        self._update_status(queryset, 'completed')
     mark_as_completed.short_description = "Mark selected bookings as completed"
 
     def mark_as_cancelled(self, request, queryset):
-        queryset.update(status='cancelled')
+        self._update_status(queryset, 'cancelled')
     mark_as_cancelled.short_description = "Cancel selected bookings"
 
+    def _update_status(self, queryset, status):
+        # update() skips save(), so hand back the active bookings' places ourselves
+        with transaction.atomic():
+            releasing = list(queryset.filter(status__in=Booking.ACTIVE_STATUSES).select_related('listing__booking_settings'))
+            queryset.update(status=status)
+            for booking in releasing:
+                occupancy.release(booking.listing_id, booking.get_settings(),
+                                  booking.start_datetime, booking.end_datetime)
+        for listing_id in {b.listing_id for b in releasing}:
+            availability.invalidate(listing_id)
+
 @admin.register(BookingSettings, site=admin_site)
 class BookingSettingsAdmin(admin.ModelAdmin):
     # FIXED: Changed 'property' to 'listing' (or whatever your OneToOne field is named)
     # If your model uses 'property', change it back. If it uses 'listing', keep this.
-    list_display = ('get_property_title', 'slot_duration_minutes', 'is_active')
+    list_display = ('get_property_title', 'duration_display', 'max_viewers_per_slot', 'is_active')
     search_fields = ('listing__title',) 
     list_filter = ('is_active',)
 
@@ -64,7 +100,20 @@ class BookingSettingsAdmin(admin.ModelAdmin):
         return obj.listing.title if hasattr(obj, 'listing') else obj.property.title
     get_property_title.short_description = 'Property'
 
-    def slot_duration_minutes(self, obj):
-        # Assuming your model might call it 'slot_duration' or 'duration'
-        return f"{obj.slot_duration} mins"
-    slot_duration_minutes.short_description = 'Duration'
\ No newline at end of file
+    def duration_display(self, obj):
+        return f"{obj.slot_duration_minutes} mins"
+    duration_display.short_description = 'Duration'
+
+@admin.register(OutboxMessage, site=admin_site)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'booking', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('kind', 'booking', 'status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at')
+    actions = ['retry_now']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Retry selected messages now')
+    def retry_now(self, request, queryset):
+        queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now())
@@ -0,0 +1,127 @@
+"""
+Viewing-slot availability.
+
+Slots are laid out from a listing's BookingSettings (opening hours and
+slot length) over a horizon of days. Each slot has room for
+max_viewers_per_slot people, less the pending/confirmed bookings that
+overlap it, as counted in SlotOccupancy (see booking.occupancy). The
+counters come from one range query per call, whether for one listing or
+a whole page of them, and the result is cached per listing until one of
+its bookings or its settings change.
+"""
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from core import cache as cache_versions
+from .models import BookingSettings, SlotOccupancy
+
+HORIZON_DAYS = 14
+CACHE_TIMEOUT = 60 * 60
+
+Slot = namedtuple('Slot', 'start end remaining')
+
+
+def _namespace(listing_id):
+    return f'availability:{listing_id}'
+
+
+def invalidate(listing_id):
+    cache_versions.bump_version(_namespace(listing_id))
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def slot_bounds(settings, day):
+    """(start, end) of every slot on day; a slot must finish by end_hour."""
+    duration = timedelta(minutes=settings.slot_duration_minutes or 60)
+    midnight = _midnight(day)
+    current = midnight + timedelta(hours=settings.start_hour)
+    close = midnight + timedelta(hours=settings.end_hour)
+    bounds = []
+    while current + duration <= close:
+        bounds.append((current, current + duration))
+        current += duration
+    return bounds
+
+
+def compute(settings_list, first_day, days=HORIZON_DAYS):
+    """Uncached {listing_id: [Slot, ...]} for first_day onwards, with one occupancy query for all listings."""
+    layouts = {}
+    for settings in settings_list:
+        if settings.is_active and settings.listing_id:
+            layouts[settings.listing_id] = (settings, [
+                bound for offset in range(days)
+                for bound in slot_bounds(settings, first_day + timedelta(days=offset))
+            ])
+    if not layouts:
+        return {}
+
+    window_start = _midnight(first_day)
+    window_end = window_start + timedelta(days=days + 1)  # end_hour may run past midnight
+    taken = {
+        (listing_id, slot_start): n for listing_id, slot_start, n in SlotOccupancy.objects.filter(
+            listing_id__in=layouts, slot_start__gte=window_start, slot_start__lt=window_end, taken__gt=0,
+        ).values_list('listing_id', 'slot_start', 'taken')
+    }
+
+    result = {}
+    for listing_id, (settings, bounds) in layouts.items():
+        slots = (
+            Slot(start, end, settings.max_viewers_per_slot - taken.get((listing_id, start), 0))
+            for start, end in bounds
+        )
+        result[listing_id] = [slot for slot in slots if slot.remaining > 0]
+    return result
+
+
+def for_listings(listing_ids, days=HORIZON_DAYS, settings_list=None, first_day=None):
+    """
+    Upcoming free slots for many listings: {listing_id: [Slot, ...]},
+    over `days` days from first_day (default today).
+    Listings without active booking settings map to an empty list.
+    """
+    listing_ids = list(dict.fromkeys(listing_ids))
+    first_day = first_day or timezone.localdate()
+    versions = cache_versions.get_versions(_namespace(i) for i in listing_ids)
+    keys = {i: f'availability:{versions[_namespace(i)]}:{i}:{first_day}:{days}' for i in listing_ids}
+    cached = cache.get_many(keys.values())
+    result = {i: cached[key] for i, key in keys.items() if key in cached}
+
+    missing = [i for i in listing_ids if i not in result]
+    if missing:
+        if settings_list is None:
+            settings_list = BookingSettings.objects.filter(listing_id__in=missing)
+        computed = compute([s for s in settings_list if s.listing_id in missing], first_day, days)
+        fresh = {i: computed.get(i, []) for i in missing}
+        cache.set_many({keys[i]: slots for i, slots in fresh.items()}, CACHE_TIMEOUT)
+        result.update(fresh)
+
+    # Cached per day; drop the slots that have started since
+    now = timezone.now()
+    return {i: [slot for slot in slots if slot.start > now] for i, slots in result.items()}
+
+
+def for_settings(settings, days=HORIZON_DAYS, first_day=None):
+    """Upcoming free slots for the listing that settings belongs to."""
+    if not settings.listing_id:
+        return []
+    return for_listings([settings.listing_id], days, [settings], first_day)[settings.listing_id]
+
+
+def calendar(settings, first_day, days):
+    """
+    Compact per-day availability: one '0'/'1' character per slot of the
+    day's grid, '1' meaning the slot is upcoming and has room.
+    """
+    free = {slot.start for slot in for_settings(settings, days, first_day)}
+    bitmaps = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        bits = ''.join('1' if start in free else '0' for start, _ in slot_bounds(settings, day))
+        bitmaps.append({'date': day.isoformat(), 'slots': bits})
+    return bitmaps
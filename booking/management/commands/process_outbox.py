@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from booking import outbox
+
+
+class Command(BaseCommand):
+    help = "Send queued booking e-mails and agent assignments from the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=outbox.BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep polling instead of exiting when the queue is empty.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep between polls in --loop mode.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            try:
+                handled = outbox.drain(batch_size=options['batch_size'])
+            except Exception as e:
+                # e.g. the database is locked; mail failures are recorded per message by drain() itself
+                if not options['loop']:
+                    raise
+                self.stderr.write(f"Outbox drain failed: {e}")
+                handled = 0
+            total += handled
+            if handled:
+                self.stdout.write(f"Processed {handled} outbox messages.")
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Outbox drained ({total} messages)."))
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_booking_agent_outbox'),
+        ('listings', '0007_propertydailyviews'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['listing', 'start_datetime'], name='booking_listing_start_idx'),
+        ),
+    ]
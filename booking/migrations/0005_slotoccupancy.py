@@ -0,0 +1,51 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_occupancy(apps, schema_editor):
+    from booking.occupancy import count
+    Booking = apps.get_model('booking', 'Booking')
+    BookingSettings = apps.get_model('booking', 'BookingSettings')
+    SlotOccupancy = apps.get_model('booking', 'SlotOccupancy')
+
+    settings_by_listing = {s.listing_id: s for s in BookingSettings.objects.exclude(listing=None)}
+    intervals = {}
+    rows = Booking.objects.filter(status__in=('pending', 'confirmed'))\
+        .values_list('listing_id', 'start_datetime', 'end_datetime')
+    for listing_id, start, end in rows:
+        intervals.setdefault(listing_id, []).append((start, end))
+
+    batch = []
+    for listing_id, booked in intervals.items():
+        settings = settings_by_listing.get(listing_id) or BookingSettings()
+        batch.extend(
+            SlotOccupancy(listing_id=listing_id, slot_start=s, taken=n)
+            for s, n in count(settings, booked).items()
+        )
+    SlotOccupancy.objects.bulk_create(batch, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0004_booking_listing_start_idx'),
+        ('listings', '0007_propertydailyviews'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_start', models.DateTimeField()),
+                ('taken', models.PositiveIntegerField(default=0)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slot_occupancy', to='listings.property')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('listing', 'slot_start'), name='slot_occupancy_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.utils import timezone
@@ -29,22 +29,18 @@ class BookingSettings(TimeStampedModel):
             return f"Settings for: {self.listing.title}"
         return f"Unassigned Settings (ID: {self.id})"
 
-    def get_available_slots(self):
+    def get_available_slots(self, days=None):
         """
-        Returns a list of available datetime slots based on 
-        start_hour, end_hour, and slot_duration_minutes.
+        Start times of the upcoming slots that still have room,
+        over the next `days` days (see booking.availability).
         """
-        import datetime
-        slots = []
-        current_date = datetime.date.today()
-        # Simple logic to generate slots for today
-        for hour in range(self.start_hour, self.end_hour):
-            slot_time = datetime.datetime.combine(current_date, datetime.time(hour, 0))
-            slots.append(slot_time)
-        return slots
+        from . import availability
+        return [slot.start for slot in availability.for_settings(self, days or availability.HORIZON_DAYS)]
 
 class Booking(TimeStampedModel):
     STATUS_CHOICES = [('pending', 'Pending'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled')]
+    # Bookings in these states hold a place in their slots (see booking.occupancy)
+    ACTIVE_STATUSES = ('pending', 'confirmed')
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
     listing = models.ForeignKey('listings.Property', on_delete=models.CASCADE, related_name='bookings')
@@ -52,14 +48,61 @@ class Booking(TimeStampedModel):
     end_datetime = models.DateTimeField()
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='pending')
     notes = models.TextField(blank=True)
+    agent = models.ForeignKey('Agent', on_delete=models.SET_NULL, null=True, blank=True, related_name='bookings')
 
     class Meta:
         ordering = ['-start_datetime']
+        indexes = [models.Index(fields=['listing', 'start_datetime'], name='booking_listing_start_idx')]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if {'status', 'start_datetime', 'end_datetime'} <= loaded.keys():
+            instance._held = instance._holding(loaded['status'], loaded['start_datetime'], loaded['end_datetime'])
+        return instance
+
+    def _holding(self, status, start, end):
+        return (start, end) if status in self.ACTIVE_STATUSES else None
+
+    def held_interval(self):
+        """The (start, end) this booking occupies in the database, or None."""
+        if self._state.adding:
+            return None
+        if not hasattr(self, '_held'):
+            # Loaded with deferred fields; ask the database
+            row = type(self).objects.filter(pk=self.pk).values_list('status', 'start_datetime', 'end_datetime').first()
+            self._held = self._holding(*row) if row else None
+        return self._held
+
+    def get_settings(self):
+        """The listing's BookingSettings, or an unsaved instance carrying the defaults."""
+        try:
+            return self.listing.booking_settings
+        except BookingSettings.DoesNotExist:
+            return BookingSettings(listing=self.listing)
 
     def save(self, *args, **kwargs):
+        from . import occupancy
         if self.listing and not self.end_datetime:
-            self.end_datetime = self.start_datetime + timedelta(minutes=60)
-        super().save(*args, **kwargs)
+            self.end_datetime = self.start_datetime + timedelta(minutes=self.get_settings().slot_duration_minutes or 60)
+        # Claiming slot capacity and writing the row succeed or fail together
+        with transaction.atomic():
+            occupancy.sync(self)
+            super().save(*args, **kwargs)
+        self._held = self._holding(self.status, self.start_datetime, self.end_datetime)
+
+class SlotOccupancy(models.Model):
+    """How many active bookings overlap one slot of a listing; maintained by booking.occupancy."""
+    listing = models.ForeignKey('listings.Property', on_delete=models.CASCADE, related_name='slot_occupancy')
+    slot_start = models.DateTimeField()
+    taken = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['listing', 'slot_start'], name='slot_occupancy_unique')]
+
+    def __str__(self):
+        return f"{self.listing_id} @ {self.slot_start:%Y-%m-%d %H:%M}: {self.taken}"
 
 class Agent(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -68,4 +111,29 @@ class Agent(models.Model):
     email = models.EmailField(blank=True)
     
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class OutboxMessage(TimeStampedModel):
+    """
+    Side effects of a booking (agent assignment, e-mails), written in the same
+    transaction as the booking and carried out later by booking.outbox.drain().
+    """
+    BOOKING_CREATED = 'booking_created'
+    BOOKING_CONFIRMED = 'booking_confirmed'
+    KIND_CHOICES = [(BOOKING_CREATED, 'Booking created'), (BOOKING_CONFIRMED, 'Booking confirmed')]
+    STATUS_CHOICES = [('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')]
+
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name='outbox_messages')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        indexes = [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.booking_id} ({self.status})"
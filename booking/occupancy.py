@@ -0,0 +1,86 @@
+"""
+Per-slot booking counters.
+
+Every slot a listing's bookings overlap has a SlotOccupancy row counting
+its active bookings. Claiming a place is a conditional UPDATE
+(taken = taken + 1 WHERE taken < capacity), so two requests racing for
+the last place can't both get it, and checking a slot is one indexed
+lookup instead of an overlap scan over bookings. Booking.save() keeps the
+counters in step; call reserve()/release() directly only around
+queryset.update().
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+
+from .availability import slot_bounds
+from .models import Booking, SlotOccupancy
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def covered_slots(settings, start, end):
+    """Start times of the slots that [start, end) overlaps."""
+    starts = []
+    day = start.date() - timedelta(days=1)  # a slot may begin the evening before (end_hour > 24)
+    while day <= end.date():
+        starts.extend(s for s, e in slot_bounds(settings, day) if s < end and e > start)
+        day += timedelta(days=1)
+    return starts
+
+
+def reserve(listing_id, settings, start, end):
+    """Take one place in every slot the interval covers, or raise SlotUnavailable. Run inside a transaction."""
+    starts = covered_slots(settings, start, end)
+    if not starts:
+        return
+    SlotOccupancy.objects.bulk_create(
+        [SlotOccupancy(listing_id=listing_id, slot_start=s) for s in starts], ignore_conflicts=True
+    )
+    claimed = SlotOccupancy.objects.filter(
+        listing_id=listing_id, slot_start__in=starts, taken__lt=settings.max_viewers_per_slot,
+    ).update(taken=F('taken') + 1)
+    if claimed != len(starts):
+        # Some slot was full; the caller's transaction undoes the slots we did claim
+        raise SlotUnavailable("Sorry, this slot is fully booked. Please choose another time.")
+
+
+def release(listing_id, settings, start, end):
+    starts = covered_slots(settings, start, end)
+    if starts:
+        SlotOccupancy.objects.filter(listing_id=listing_id, slot_start__in=starts, taken__gt=0)\
+            .update(taken=F('taken') - 1)
+
+
+def sync(booking):
+    """Move the booking's claim from what the database holds to its current state."""
+    held = booking.held_interval()
+    wanted = booking._holding(booking.status, booking.start_datetime, booking.end_datetime)
+    if held == wanted:
+        return
+    settings = booking.get_settings()
+    if held:
+        release(booking.listing_id, settings, *held)
+    if wanted:
+        reserve(booking.listing_id, settings, *wanted)
+
+
+def count(settings, intervals):
+    """{slot_start: taken} for a set of booked (start, end) intervals."""
+    return Counter(s for start, end in intervals for s in covered_slots(settings, start, end))
+
+
+def rebuild(listing_id, settings):
+    """Recount one listing's slots from its bookings, e.g. after its slot grid changed."""
+    intervals = Booking.objects.filter(listing_id=listing_id, status__in=Booking.ACTIVE_STATUSES)\
+        .values_list('start_datetime', 'end_datetime')
+    with transaction.atomic():
+        SlotOccupancy.objects.filter(listing_id=listing_id).delete()
+        SlotOccupancy.objects.bulk_create([
+            SlotOccupancy(listing_id=listing_id, slot_start=s, taken=n)
+            for s, n in count(settings, intervals).items()
+        ])
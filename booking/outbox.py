@@ -0,0 +1,163 @@
+"""
+Transactional outbox for booking side effects.
+
+Signals only insert an OutboxMessage next to the booking, so creating a
+booking never waits on SMTP. drain() (run by the process_outbox command)
+picks up due messages in batches, performs them over one shared mail
+connection and reschedules failures with exponential backoff.
+
+No transaction is open while mail is sent. On SQLite that would hold the
+write lock through the SMTP round trips and block new bookings. Messages
+are claimed first (marked 'sending', attempt counted, short commit), then
+sent one by one, and each outcome is written on its own. So a failed
+send never re-sends the e-mails that already went out. If a worker dies
+mid-batch, its messages stay 'sending' until SENDING_LEASE runs out, and
+then they are claimed again.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Agent, Booking, OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 6
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+SENDING_LEASE = timedelta(minutes=10)
+
+
+def enqueue(kind, booking):
+    return OutboxMessage.objects.create(kind=kind, booking=booking)
+
+
+def enqueue_many(kind, bookings):
+    return OutboxMessage.objects.bulk_create([OutboxMessage(kind=kind, booking=b) for b in bookings])
+
+
+def backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS))
+
+
+# ==========================================
+# 1. HANDLERS (message -> e-mails to send)
+# ==========================================
+
+def _default_agent():
+    return Agent.objects.select_related('user').order_by('pk').first()
+
+
+def _booking_created(booking):
+    listing = booking.listing
+    if booking.agent is None:
+        # Listing's own agent, else the house default; update() so no signals re-fire
+        booking.agent = listing.agent or _default_agent()
+        if booking.agent is not None:
+            Booking.objects.filter(pk=booking.pk).update(agent=booking.agent)
+
+    emails = [EmailMessage(
+        f"Booking Received: {listing.title}",
+        f"Hello {booking.user.username}, your booking for {booking.start_datetime} is pending.",
+        settings.DEFAULT_FROM_EMAIL, [booking.user.email],
+    )]
+    agent_email = booking.agent and (booking.agent.email or booking.agent.user.email)
+    if agent_email:
+        emails.append(EmailMessage(
+            "New Booking Alert",
+            f"New booking from {booking.user.username} for {listing.title}.",
+            settings.DEFAULT_FROM_EMAIL, [agent_email],
+        ))
+    return emails
+
+
+def _booking_confirmed(booking):
+    agent_name = booking.agent.name if booking.agent else "TBD"
+    return [EmailMessage(
+        f"Booking Confirmed: {booking.listing.title}",
+        f"Your viewing is confirmed for {booking.start_datetime}. Agent: {agent_name}",
+        settings.DEFAULT_FROM_EMAIL, [booking.user.email],
+    )]
+
+
+HANDLERS = {
+    OutboxMessage.BOOKING_CREATED: _booking_created,
+    OutboxMessage.BOOKING_CONFIRMED: _booking_confirmed,
+}
+
+
+# ==========================================
+# 2. WORKER
+# ==========================================
+
+def drain(batch_size=BATCH_SIZE, connection=None):
+    """
+    Process one batch of due messages. Returns how many were handled.
+    Rows are claimed with skip_locked where supported, so several workers can run.
+    """
+    batch = _claim(batch_size)
+    if not batch:
+        return 0
+
+    unsent = list(batch)
+    connection = connection or get_connection(fail_silently=False)
+    try:
+        with connection:
+            while unsent:
+                _deliver(unsent[0], connection)
+                unsent.pop(0)
+    except Exception as e:
+        # The connection itself failed (e.g. the mail server is unreachable): that costs each message an attempt
+        for message in unsent:
+            _record(message, e)
+    return len(batch)
+
+
+def _claim(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(status__in=['pending', 'sending'], next_attempt_at__lte=now)
+            .select_related('booking__user', 'booking__listing__agent__user', 'booking__agent__user')
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        OutboxMessage.objects.filter(pk__in=[m.pk for m in batch]).update(
+            status='sending', attempts=F('attempts') + 1, next_attempt_at=now + SENDING_LEASE, updated_at=now,
+        )
+    for message in batch:
+        message.attempts += 1
+    return batch
+
+
+def _deliver(message, connection):
+    try:
+        emails = [e for e in HANDLERS[message.kind](message.booking) if all(e.to)]
+        connection.send_messages(emails)
+    except Exception as e:
+        _record(message, e)
+    else:
+        _record(message)
+
+
+def _record(message, error=None):
+    """Write one message's outcome (a single UPDATE, so its own short transaction)."""
+    now = timezone.now()
+    if error is None:
+        changes = {'status': 'sent', 'sent_at': now, 'last_error': ''}
+    else:
+        changes = {'last_error': f"{type(error).__name__}: {error}"[:1000]}
+        if message.attempts >= MAX_ATTEMPTS:
+            changes['status'] = 'failed'
+            logger.error("Outbox message %s failed permanently: %s", message.pk, changes['last_error'])
+        else:
+            changes.update(status='pending', next_attempt_at=now + backoff(message.attempts))
+            logger.warning("Outbox message %s failed (attempt %s): %s",
+                           message.pk, message.attempts, changes['last_error'])
+    OutboxMessage.objects.filter(pk=message.pk, status='sending').update(updated_at=now, **changes)
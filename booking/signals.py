@@ -1,48 +1,32 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import Booking, Agent
+from .models import Booking, BookingSettings, OutboxMessage
+from . import availability, occupancy, outbox
 
 @receiver(post_save, sender=Booking)
 def handle_booking_events(sender, instance, created, **kwargs):
+    # Only record the side effects here; booking.outbox.drain() performs them off the request path
     if created:
-        print(f"SIGNAL: New booking #{instance.id} by {instance.user.username}")
-        
-        # AUTO-ASSIGN AGENT (Works perfectly!)
-        if instance.property.agent:
-            instance.agents.add(instance.property.agent)
-            print(f"Auto-assigned agent: {instance.property.agent.name}")
-        elif Agent.objects.exists():
-            first_agent = Agent.objects.first()
-            instance.agents.add(first_agent)
-            print(f"Assigned default agent: {first_agent.name}")
+        outbox.enqueue(OutboxMessage.BOOKING_CREATED, instance)
+    elif instance.status == 'confirmed' and 'status' in (kwargs.get('update_fields') or ()):
+        outbox.enqueue(OutboxMessage.BOOKING_CONFIRMED, instance)
 
-        # Email User
-        subject = f"Booking Received: {instance.property.title}"
-        message = f"Hello {instance.user.username}, your booking for {instance.start_datetime} is pending."
-        try:
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [instance.user.email])
-            print(f"User email sent to {instance.user.email}")
-        except Exception as e:
-            print(f"User email failed: {e}")
 
-        # Notify Agent
-        if instance.property.agent and instance.property.agent.user.email:
-            agent_msg = f"New booking from {instance.user.username} for {instance.property.title}."
-            try:
-                send_mail("New Booking Alert", agent_msg, settings.DEFAULT_FROM_EMAIL, [instance.property.agent.user.email])
-                print(f"Agent notified: {instance.property.agent.user.email}")
-            except Exception as e:
-                print(f"Agent email failed: {e}")
+@receiver(post_delete, sender=Booking)
+def release_slots(sender, instance, **kwargs):
+    held = instance._holding(instance.status, instance.start_datetime, instance.end_datetime)
+    if held:
+        occupancy.release(instance.listing_id, instance.get_settings(), *held)
 
-    elif instance.status == 'confirmed' and kwargs.get('update_fields', {}).get('status'):
-        print(f"SIGNAL: Booking #{instance.id} confirmed")
-        agent_name = instance.agents.first().name if instance.agents.exists() else "TBD"
-        subject = f"Booking Confirmed: {instance.property.title}"
-        message = f"Your viewing is confirmed for {instance.start_datetime}. Agent: {agent_name}"
-        try:
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [instance.user.email])
-            print(f"Confirmation sent to {instance.user.email}")
-        except Exception as e:
-            print(f"Confirmation failed: {e}")
+@receiver(post_save, sender=BookingSettings)
+def recount_slots(sender, instance, **kwargs):
+    # Hours or slot length may have changed, which moves every slot boundary
+    if instance.listing_id:
+        occupancy.rebuild(instance.listing_id, instance)
+
+@receiver([post_save, post_delete], sender=Booking)
+@receiver([post_save, post_delete], sender=BookingSettings)
+def invalidate_availability(sender, instance, **kwargs):
+    # Cached slots are versioned per listing
+    if instance.listing_id:
+        availability.invalidate(instance.listing_id)
@@ -1,3 +1,182 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from listings.models import Property
+from .models import Agent, Booking, BookingSettings, OutboxMessage, SlotOccupancy
+from . import availability, occupancy, outbox
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user('client', 'client@example.com', 'pw')
+        agent_user = User.objects.create_user('agent', 'agent@example.com', 'pw')
+        self.agent = Agent.objects.create(user=agent_user, name='Jane Agent')
+        self.listing = Property.objects.create(
+            title='Garden Villa', description='x', property_type='villa', price=1000,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=agent_user,
+        )
+
+    def make_booking(self):
+        start = timezone.now() + timedelta(days=1)
+        return Booking.objects.create(user=self.client_user, listing=self.listing, start_datetime=start)
+
+    def test_creating_a_booking_sends_nothing_until_drained(self):
+        booking = self.make_booking()
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxMessage.objects.filter(booking=booking, status='pending').count(), 1)
+
+        self.assertEqual(outbox.drain(), 1)
+        booking.refresh_from_db()
+        self.assertEqual(booking.agent, self.agent)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['agent@example.com', 'client@example.com'])
+        self.assertEqual(OutboxMessage.objects.get(booking=booking).status, 'sent')
+
+    def test_failures_are_retried_with_backoff(self):
+        booking = self.make_booking()
+        with override_settings(EMAIL_BACKEND='booking.tests.BrokenBackend'):
+            outbox.drain()
+        message = OutboxMessage.objects.get(booking=booking)
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertGreater(message.next_attempt_at, timezone.now())
+
+        # Not due yet, so a second drain does nothing
+        self.assertEqual(outbox.drain(), 0)
+
+    def test_unreachable_mail_server_costs_an_attempt(self):
+        booking = self.make_booking()
+        with override_settings(EMAIL_BACKEND='booking.tests.UnreachableBackend'):
+            self.assertEqual(outbox.drain(), 1)
+        message = OutboxMessage.objects.get(booking=booking)
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertGreater(message.next_attempt_at, timezone.now())
+
+    def test_one_failed_send_does_not_resend_the_rest(self):
+        first, second = self.make_booking(), self.make_booking()
+        FlakyBackend.sent = []
+        with override_settings(EMAIL_BACKEND='booking.tests.FlakyBackend'):
+            outbox.drain()
+        statuses = dict(OutboxMessage.objects.values_list('booking_id', 'status'))
+        self.assertEqual(statuses, {first.pk: 'sent', second.pk: 'pending'})
+        self.assertEqual(len(FlakyBackend.sent), 2)  # the first booking's client and agent mails, once
+
+    def test_confirming_via_save_queues_confirmation(self):
+        booking = self.make_booking()
+        booking.status = 'confirmed'
+        booking.save(update_fields=['status'])
+        self.assertTrue(OutboxMessage.objects.filter(booking=booking, kind=OutboxMessage.BOOKING_CONFIRMED).exists())
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('client', 'client@example.com', 'pw')
+        self.listing = Property.objects.create(
+            title='Garden Villa', description='x', property_type='villa', price=1000,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=self.user,
+        )
+        self.settings = BookingSettings.objects.create(
+            listing=self.listing, max_viewers_per_slot=2, slot_duration_minutes=45, start_hour=9, end_hour=12,
+        )
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.opening = availability._midnight(self.day) + timedelta(hours=9)
+
+    def slots_on_day(self):
+        slots = availability.for_listings([self.listing.pk], days=2)[self.listing.pk]
+        return [(s.start - self.opening, s.remaining) for s in slots if s.start.date() == self.day]
+
+    def book(self, offset_minutes, minutes=45, status='pending'):
+        start = self.opening + timedelta(minutes=offset_minutes)
+        Booking.objects.create(user=self.user, listing=self.listing, start_datetime=start,
+                               end_datetime=start + timedelta(minutes=minutes), status=status)
+
+    def test_slots_follow_duration_and_capacity(self):
+        self.assertEqual(self.slots_on_day(), [(timedelta(minutes=m), 2) for m in (0, 45, 90, 135)])
+
+        self.book(0)
+        self.book(0)
+        self.book(60, minutes=40)  # overlaps the 09:45 and 10:30 slots
+        self.book(135, status='cancelled')
+        self.assertEqual(self.slots_on_day(), [
+            (timedelta(minutes=45), 1), (timedelta(minutes=90), 1), (timedelta(minutes=135), 2),
+        ])
+
+    def test_full_slots_reject_new_bookings(self):
+        self.book(0)
+        self.book(0)
+        with self.assertRaises(occupancy.SlotUnavailable):
+            self.book(30)  # 09:30 overlaps the full 09:00 slot
+        self.assertEqual(Booking.objects.count(), 2)
+        # The 09:45 place it claimed first was rolled back with it
+        self.assertFalse(SlotOccupancy.objects.filter(slot_start=self.opening + timedelta(minutes=45), taken__gt=0).exists())
+
+        # Cancelling through save() hands the place back
+        booking = Booking.objects.first()
+        booking.status = 'cancelled'
+        booking.save()
+        self.book(0)
+        self.assertEqual(SlotOccupancy.objects.get(slot_start=self.opening).taken, 2)
+
+    def test_batch_uses_one_occupancy_query(self):
+        other = Property.objects.create(
+            title='Loft', description='x', property_type='apartment', price=500,
+            address='Ngong Rd', city='Nairobi', state='Nairobi', owner=self.user,
+        )
+        with self.assertNumQueries(2):  # settings + occupancy
+            result = availability.for_listings([self.listing.pk, other.pk], days=2)
+        self.assertEqual(result[other.pk], [])
+        with self.assertNumQueries(0):
+            availability.for_listings([self.listing.pk, other.pk], days=2)
+
+    def test_calendar_bitmap_and_etag(self):
+        url = f'/booking/availability/{self.listing.pk}/?start={self.day}&days=2'
+        response = self.client.get(url)
+        self.assertEqual(response.json()['days'][0], {'date': self.day.isoformat(), 'slots': '1111'})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.book(0)
+        self.book(0)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['days'][0]['slots'], '0111')
+
+    def test_calendar_rejects_starts_past_the_horizon(self):
+        url = f'/booking/availability/{self.listing.pk}/'
+        for start in ('9999-12-31', (timezone.localdate() + timedelta(days=366)).isoformat()):
+            self.assertEqual(self.client.get(url, {'start': start}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': timezone.localdate().isoformat()}).status_code, 200)
+
+
+class BrokenBackend:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send_messages(self, messages):
+        raise ConnectionRefusedError("SMTP down")
+
+
+class UnreachableBackend(BrokenBackend):
+    def __enter__(self):
+        raise ConnectionRefusedError("SMTP down")
+
+
+class FlakyBackend(BrokenBackend):
+    """Sends the first message's e-mails, fails on every later call."""
+    sent = []
+
+    def send_messages(self, messages):
+        if FlakyBackend.sent:
+            raise ConnectionResetError("SMTP went away")
+        FlakyBackend.sent.extend(messages)
+        return len(messages)
@@ -5,4 +5,5 @@ urlpatterns = [
     path('my-bookings/', views.my_bookings, name='my_bookings'),
     path('create/<int:property_pk>/', views.create_booking, name='create_booking'),
     path('cancel/<int:pk>/', views.cancel_booking, name='cancel_booking'),
+    path('availability/<int:property_pk>/', views.availability_calendar, name='availability_calendar'),
 ]
\ No newline at end of file
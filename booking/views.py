@@ -1,8 +1,14 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.views.decorators.http import require_GET
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
+from django.db import transaction
+from datetime import date, timedelta
 from .models import Booking, BookingSettings
+from . import availability, occupancy
 from .forms import BookingForm
 from listings.models import Property
 
@@ -25,41 +31,77 @@ def create_booking(request, property_pk):
                 messages.error(request, "You cannot book a time in the past.")
                 return redirect('property_detail', pk=property_pk)
 
-            # --- 2. VALIDATION: Check for conflicts ---
-            # Calculate end time based on settings (default 1 hour if no settings)
-            duration = 60
-            if hasattr(property_obj, 'booking_settings'):
-                duration = property_obj.booking_settings.slot_duration
-            
-            # Simple conflict check: Is there any confirmed booking at this exact start time?
-            # (For a real production app, you'd check overlapping ranges)
-            conflict = Booking.objects.filter(
-                listing=property_obj,
-                status='confirmed',
-                start_datetime=booking.start_datetime
-            ).exists()
-            
-            if conflict:
-                messages.error(request, "Sorry, this slot is already booked. Please choose another.")
+            # --- 2. VALIDATION: Within viewing hours ---
+            settings = booking.get_settings()
+            booking.end_datetime = booking.start_datetime + timedelta(minutes=settings.slot_duration_minutes or 60)
+            if not occupancy.covered_slots(settings, booking.start_datetime, booking.end_datetime):
+                messages.error(request, "Please choose a time within viewing hours.")
                 return redirect('property_detail', pk=property_pk)
 
-            # --- 3. SUCCESS ---
-            booking.save()
+            # --- 3. SUCCESS (or full) ---
+            # save() claims a place in each overlapped slot atomically; the outbox
+            # row queued by the post_save signal commits with the booking
+            try:
+                with transaction.atomic():
+                    booking.save()
+            except occupancy.SlotUnavailable as e:
+                messages.error(request, str(e))
+                return redirect('property_detail', pk=property_pk)
             messages.success(request, 'Booking request sent! You can view it in your dashboard.')
             return redirect('my_bookings')
     
     # If not POST, just redirect back to detail
     return redirect('property_detail', pk=property_pk)
 
+CALENDAR_DEFAULT_DAYS = 31
+CALENDAR_MAX_DAYS = 62
+# How far ahead ?start may go; also keeps start + days clear of date.max
+CALENDAR_HORIZON_DAYS = 365
+
+@require_GET
+def availability_calendar(request, property_pk):
+    """
+    JSON availability bitmap for the booking widget.
+    ?start=YYYY-MM-DD (default today, at most a year ahead) and ?days=N (default 31, max 62).
+    Carries an ETag, so polling clients get a 304 while nothing changed.
+    """
+    settings = BookingSettings.objects.filter(listing_id=property_pk).first()
+    if settings is None and not Property.objects.filter(pk=property_pk).exists():
+        raise Http404("No such property.")
+    today = timezone.localdate()
+    try:
+        first_day = max(date.fromisoformat(request.GET['start']), today) if request.GET.get('start') else today
+        days = min(max(int(request.GET.get('days', CALENDAR_DEFAULT_DAYS)), 1), CALENDAR_MAX_DAYS)
+    except ValueError:
+        return JsonResponse({'error': 'start must be YYYY-MM-DD and days a number'}, status=400)
+    if first_day > today + timedelta(days=CALENDAR_HORIZON_DAYS):
+        return JsonResponse({'error': f'start must be within {CALENDAR_HORIZON_DAYS} days from today'}, status=400)
+
+    payload = {'property': property_pk, 'enabled': bool(settings and settings.is_active), 'start': first_day.isoformat()}
+    if payload['enabled']:
+        payload.update({
+            'timezone': timezone.get_current_timezone_name(),
+            'first_slot': f'{settings.start_hour:02d}:00',
+            'slot_minutes': settings.slot_duration_minutes or 60,
+            'capacity': settings.max_viewers_per_slot,
+            'days': availability.calendar(settings, first_day, days),
+        })
+
+    response = JsonResponse(payload)
+    patch_cache_control(response, public=True, max_age=30)
+    set_response_etag(response)
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
 @login_required
 def my_bookings(request):
     """List of user's bookings."""
     now = timezone.now()
     # Split into Upcoming and Past
-    upcoming = Booking.objects.filter(user=request.user, start_datetime__gte=now).order_by('start_datetime')
-    past = Booking.objects.filter(user=request.user, start_datetime__lt=now).order_by('-start_datetime')
+    bookings = Booking.objects.filter(user=request.user).select_related('listing__primary_image')
+    upcoming = bookings.filter(start_datetime__gte=now).order_by('start_datetime')
+    past = bookings.filter(start_datetime__lt=now).order_by('-start_datetime')
     
-    return render(request, 'bookings/my_bookings.html', {
+    return render(request, 'booking/my_bookings.html', {
         'upcoming_bookings': upcoming,
         'past_bookings': past
     })
@@ -1,15 +1,22 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User, Group
+from django.contrib import messages
 from django.contrib.admin.models import LogEntry
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncMonth
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.utils.decorators import method_decorator
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
+from django.views.decorators.http import require_POST
+from datetime import datetime
 import json
 
 # Local imports
-from .models import Profile
+from .models import KPISnapshot, Profile
+from . import kpi, perf
+from listings import fragments, market
 
 class ArthiAdminSite(admin.AdminSite):
     """
@@ -21,53 +28,78 @@ class ArthiAdminSite(admin.AdminSite):
     site_title = "ArthiProperties Admin"
     enable_nav_sidebar = True
 
-    def index(self, request, extra_context=None):
-        # Lazy imports to prevent circular dependencies
-        from listings.models import Property, Inquiry
-        # from booking.models import Booking  # Uncomment if Booking exists
+    def get_urls(self):
+        return [
+            path('kpi/refresh/', self.admin_view(self.refresh_kpis), name='refresh_kpis'),
+            path('performance/', self.admin_view(self.performance), name='performance'),
+        ] + super().get_urls()
+
+    @method_decorator(require_POST)
+    def refresh_kpis(self, request):
+        kpi.refresh()
+        messages.success(request, "Dashboard figures refreshed.")
+        return redirect(reverse('admin:index', current_app=self.name))
+
+    PERFORMANCE_WINDOWS = {1: "Last hour", 24: "Last 24 hours", 24 * 7: "Last 7 days"}
+
+    def performance(self, request):
+        """Sampled per-view query and timing statistics (core.perf)."""
+        if not request.user.is_superuser:
+            raise PermissionDenied
+        try:
+            hours = int(request.GET.get('hours', 24))
+        except ValueError:
+            hours = 24
+        if hours not in self.PERFORMANCE_WINDOWS:
+            hours = 24
+        views = perf.summary(hours)
+        cards = fragments.stats()
+        context = {
+            **self.each_context(request),
+            'title': "Performance",
+            'views': views,
+            'hours': hours,
+            'windows': self.PERFORMANCE_WINDOWS.items(),
+            'sample_rate': perf.SAMPLE_RATE,
+            'sampled_requests': sum(v['requests'] for v in views),
+            'pending': perf.pending(),
+            'bucket_labels': [f"≤{bound}" for bound in perf.BUCKETS_MS] + [f">{perf.BUCKETS_MS[-1]}"],
+            # Fragment cache counters (listings.fragments), also shown by `manage.py fragment_stats`
+            'fragments': cards,
+            'fragment_hit_rate': f"{cards['hit_rate']:.1%}" if cards['hit_rate'] is not None else 'n/a',
+        }
+        return TemplateResponse(request, 'admin/performance.html', context)
 
+    def index(self, request, extra_context=None):
         # =================================================
-        # 1. CORE KPI CARDS
+        # 1. KPI SNAPSHOT (one row, see core.kpi)
         # =================================================
-        total_properties = Property.objects.count()
-        active_listings = Property.objects.filter(status='available').count()
-        total_users = User.objects.count()
-        total_inquiries = Inquiry.objects.count()
-        
-        # Portfolio Calculation
-        portfolio_agg = Property.objects.filter(status='available').aggregate(total=Sum('price'))
-        portfolio_value = portfolio_agg['total'] or 0
+        snapshot = kpi.snapshot()
 
         # =================================================
         # 2. CHARTS & ANALYTICS
         # =================================================
-        
+
         # --- A. Inventory Breakdown (Pie Chart) ---
-        prop_types = Property.objects.values('property_type').annotate(count=Count('id')).order_by('-count')
-        # Use simple list comprehension, json.dumps handles the rest
-        pie_labels = [p['property_type'].replace('_', ' ').title() for p in prop_types]
-        pie_data = [p['count'] for p in prop_types]
+        pie_labels = [t.replace('_', ' ').title() for t, _ in snapshot.property_types]
+        pie_data = [count for _, count in snapshot.property_types]
 
         # --- B. Lead Generation Velocity (Line Chart) ---
-        # Group inquiries by month
-        inquiries_trend = Inquiry.objects.annotate(month=TruncMonth('created_at'))\
-            .values('month').annotate(count=Count('id')).order_by('month')
-        
-        line_labels = [i['month'].strftime('%b %Y') for i in inquiries_trend] if inquiries_trend else []
-        line_data = [i['count'] for i in inquiries_trend] if inquiries_trend else []
+        line_labels = [datetime.strptime(m, '%Y-%m').strftime('%b %Y') for m, _ in snapshot.inquiry_trend]
+        line_data = [count for _, count in snapshot.inquiry_trend]
 
         # --- C. Geographic Hotspots (Bar Chart) ---
-        # Top 5 Locations (using 'city' or 'location' field - verify your model field name!)
-        # Assuming field is 'city' based on your snippet. If it's 'location', change 'city' to 'location' below.
-        city_stats = Property.objects.values('city').annotate(count=Count('id')).order_by('-count')[:5]
-        bar_labels = [c['city'] for c in city_stats]
-        bar_data = [c['count'] for c in city_stats]
+        bar_labels = [city for city, _ in snapshot.top_cities]
+        bar_data = [count for _, count in snapshot.top_cities]
 
         # =================================================
         # 3. RECENT ACTIVITY FEED
         # =================================================
         recent_actions = LogEntry.objects.select_related('user', 'content_type').order_by('-action_time')[:6]
 
+        # Busiest market segments, read from the maintained table (listings.market)
+        market_stats = market.top()
+
         # =================================================
         # 4. CONTEXT ASSEMBLY
         # =================================================
@@ -75,10 +107,12 @@ class ArthiAdminSite(admin.AdminSite):
         extra_context.update({
             # KPIs
             'kpi': {
-                'active': active_listings,
-                'inquiries': total_inquiries,
-                'users': total_users,
-                'value': portfolio_value,
+                'active': snapshot.active_listings,
+                'inquiries': snapshot.total_inquiries,
+                'users': snapshot.total_users,
+                'value': snapshot.portfolio_value,
+                'as_of': snapshot.refreshed_at,
+                'stale': snapshot.stale,
             },
             # Charts JSON (Dumps directly to string for JS)
             'charts': {
@@ -91,6 +125,7 @@ class ArthiAdminSite(admin.AdminSite):
             },
             # Activity Log
             'recent_actions': recent_actions,
+            'market_stats': market_stats,
         })
         return super().index(request, extra_context=extra_context)
 
@@ -149,6 +184,20 @@ class ProfileAdmin(admin.ModelAdmin):
 admin_site.register(User, UserAdmin)
 admin_site.register(Group)
 
+@admin.register(KPISnapshot, site=admin_site)
+class KPISnapshotAdmin(admin.ModelAdmin):
+    list_display = ('refreshed_at', 'stale', 'total_properties', 'active_listings', 'total_inquiries', 'total_users')
+    actions = ['refresh_now']
+
+    def has_add_permission(self, request):
+        return False
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Recompute dashboard figures now')
+    def refresh_now(self, request, queryset):
+        kpi.refresh()
+
 @admin.register(LogEntry, site=admin_site)
 class LogEntryAdmin(admin.ModelAdmin):
     list_display = ('action_time', 'user', 'action_flag', 'change_message')
@@ -0,0 +1,202 @@
+"""
+View benchmarks with query, latency and memory budgets (manage.py benchmark).
+
+The main pages are driven through the test client against a dataset from
+core.synthetic:
+- the listing grid with each filter and sort,
+- listing detail, favorite toggle, booking and My Bookings,
+- the admin index and the analytics endpoint.
+
+Each scenario records:
+
+* queries: the database queries on a cold cache, the worst case. Budgets
+  for these are exact, since a view's query count should not depend on
+  the dataset size or the machine (that is what an N+1 looks like).
+* p50 / p95 latency over `runs` warm requests.
+* peak Python memory allocated during one request (tracemalloc).
+
+Budgets are kept in BUDGET_FILE and rewritten by `manage.py benchmark
+--record`. A run fails when a view makes more queries than its budget,
+or when its p95 latency or peak memory exceeds the budget by more than
+LATENCY_SLACK (plus LATENCY_GRACE_MS) / MEMORY_SLACK. Latency is only
+meaningful against budgets recorded on comparable hardware. core.tests
+checks the query budgets on a small dataset.
+"""
+import json
+import os
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection, reset_queries
+from django.db.models import Count, Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from listings.models import Property
+from . import perf, synthetic
+
+BUDGET_FILE = os.path.join(os.path.dirname(__file__), 'benchmark_budgets.json')
+LATENCY_SLACK = 1.5
+LATENCY_GRACE_MS = 10  # on top of the slack: a GC pause or busy host is worth several ms on a fast view
+MEMORY_SLACK = 1.5
+PREFIX = 'bench'
+
+
+@dataclass
+class Scenario:
+    name: str
+    path: str
+    user: object = None  # log in as this user first
+    method: str = 'get'
+    data: object = None  # dict, or a function of the run number for requests that must differ
+
+
+@dataclass
+class Result:
+    name: str
+    queries: int
+    p50_ms: float
+    p95_ms: float
+    peak_kb: float
+
+
+def prepare(properties, seed=1):
+    """Generate the benchmark dataset; returns the generator's totals."""
+    agents = max(properties // 200, 5)
+    totals = synthetic.Generator(seed=seed, prefix=PREFIX).run(max(properties // 2, 50), agents, properties)
+    synthetic.refresh_derived()
+    User.objects.create_superuser(f'{PREFIX}_admin', f'{PREFIX}_admin@example.com', synthetic.PASSWORD)
+    return totals
+
+
+def scenarios():
+    """The benchmarked requests, built from whatever prepare() generated."""
+    admin = User.objects.get(username=f'{PREFIX}_admin')
+    # An ordinary account (the first few are agents) with some history
+    client = User.objects.filter(username__startswith=f'{PREFIX}_', profile__is_agent=False, is_staff=False)\
+        .annotate(n=Count('bookings')).order_by('-n', 'id').first()
+    available = Property.objects.filter(status='available')
+    # The most viewed listing: the detail page everybody hits
+    listing = available.annotate(total=Sum('daily_views__views')).order_by('-total', 'id').first()
+    city = available.values('city').annotate(n=Count('id')).order_by('-n')[0]['city']
+    prices = sorted(available.values_list('price', flat=True))
+    low, high = prices[len(prices) // 4], prices[3 * len(prices) // 4]
+
+    def booking(run):
+        # A different future slot every run, so none fills up
+        day = timezone.localdate() + timedelta(days=3 + run // 8)
+        return {'start_datetime': datetime.combine(day, datetime.min.time()).replace(hour=9 + run % 8)
+                .strftime('%Y-%m-%dT%H:%M'), 'notes': ''}
+
+    return [
+        Scenario('list', '/'),
+        Scenario('list_search', f'/?q={listing.title.split()[-1]}'),
+        Scenario('list_property_type', '/?property_type=apartment'),
+        Scenario('list_city', f'/?city={city}'),
+        Scenario('list_price_range', f'/?min_price={low}&max_price={high}'),
+        Scenario('list_sort_price', '/?sort=price'),
+        Scenario('list_sort_price_desc', '/?sort=-price'),
+        Scenario('list_sort_oldest', '/?sort=created_at'),
+        Scenario('list_page_5', '/?page=5'),
+        Scenario('list_cursor', '/?paginate=cursor'),
+        Scenario('list_signed_in', '/', user=client),
+        Scenario('detail', f'/property/{listing.pk}/'),
+        Scenario('detail_signed_in', f'/property/{listing.pk}/', user=client),
+        Scenario('toggle_favorite', f'/favorites/toggle/{listing.pk}/', user=client, method='post'),
+        Scenario('create_booking', f'/booking/create/{listing.pk}/', user=client, method='post', data=booking),
+        Scenario('my_bookings', '/booking/my-bookings/', user=client),
+        Scenario('admin_index', '/admin/', user=admin),
+        Scenario('admin_analytics', '/admin/listings/property/analytics/', user=admin),
+    ]
+
+
+def _request(client, scenario, run):
+    data = scenario.data(run) if callable(scenario.data) else scenario.data
+    response = getattr(client, scenario.method)(scenario.path, data)
+    if response.status_code >= 400:
+        raise AssertionError(f"{scenario.name}: {scenario.path} answered {response.status_code}")
+    return response
+
+
+def measure(client, scenario, runs=20):
+    client.logout()
+    if scenario.user:
+        client.force_login(scenario.user)
+
+    for cache in caches.all(initialized_only=True):
+        cache.clear()
+    reset_queries()  # the log is a bounded deque; a full one would count 0
+    with CaptureQueriesContext(connection) as queries:
+        _request(client, scenario, 0)
+    # Counted now: the captured slice is read from the live log, which later requests reset
+    query_count = len(queries)
+
+    tracemalloc.start()
+    try:
+        _request(client, scenario, 1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for run in range(2, runs + 2):
+        started = time.perf_counter()
+        _request(client, scenario, run)
+        timings.append((time.perf_counter() - started) * 1000)
+    p50, p95 = np.percentile(timings, [50, 95])
+    return Result(scenario.name, query_count, round(float(p50), 2), round(float(p95), 2), round(peak / 1024, 1))
+
+
+def run(client, selected=None, runs=20, log=None):
+    results = []
+    # A sampled request that happens to flush core.perf's buffer would add its queries to the count
+    sample_rate, perf.SAMPLE_RATE = perf.SAMPLE_RATE, 0
+    try:
+        for scenario in scenarios():
+            if selected and scenario.name not in selected:
+                continue
+            results.append(measure(client, scenario, runs))
+            if log:
+                log(results[-1])
+    finally:
+        perf.SAMPLE_RATE = sample_rate
+    return results
+
+
+# ==========================================
+# BUDGETS
+# ==========================================
+
+def load_budgets(path=BUDGET_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)['views']
+
+
+def save_budgets(results, properties, path=BUDGET_FILE):
+    views = {r.name: {k: v for k, v in asdict(r).items() if k != 'name'} for r in results}
+    with open(path, 'w') as f:
+        json.dump({'properties': properties, 'views': views}, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def check(results, budgets, latency=True, memory=True):
+    """Budget violations, as messages; views without a budget are skipped."""
+    failures = []
+    for r in results:
+        budget = budgets.get(r.name)
+        if not budget:
+            continue
+        if r.queries > budget['queries']:
+            failures.append(f"{r.name}: {r.queries} queries, budget {budget['queries']}")
+        if latency and r.p95_ms > budget['p95_ms'] * LATENCY_SLACK + LATENCY_GRACE_MS:
+            failures.append(f"{r.name}: p95 {r.p95_ms:.1f}ms, budget {budget['p95_ms']:.1f}ms")
+        if memory and r.peak_kb > budget['peak_kb'] * MEMORY_SLACK:
+            failures.append(f"{r.name}: peak {r.peak_kb:.0f}KB, budget {budget['peak_kb']:.0f}KB")
+    return failures
@@ -0,0 +1,45 @@
+"""
+Namespaced cache versions.
+
+Cached results embed the current version of their namespace in the key;
+bumping the version retires every entry in that namespace at once
+without having to know or delete the individual keys.
+
+A missing version (never set, or culled by the shared file cache) is seeded
+from the clock rather than a constant. Starting again at 1 could repeat a
+version whose entries are still cached, and those stale entries would be
+served again.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _key(namespace):
+    return f'version:{namespace}'
+
+
+def get_version(namespace):
+    return cache.get_or_set(_key(namespace), time.time_ns, None)
+
+
+def get_versions(namespaces):
+    """{namespace: version} for many namespaces in one cache round trip."""
+    keys = {_key(ns): ns for ns in namespaces}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # add() rather than set() so a concurrent bump isn't overwritten
+        seed = time.time_ns()
+        cache.add(key, seed, None)
+        found[key] = cache.get(key, seed)
+    return {ns: found[key] for key, ns in keys.items()}
+
+
+def bump_version(namespace):
+    try:
+        return cache.incr(_key(namespace))
+    except ValueError:
+        # Key expired or was evicted; a fresh clock value can't match any earlier version
+        version = time.time_ns()
+        cache.set(_key(namespace), version, None)
+        return version
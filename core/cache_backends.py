@@ -0,0 +1,132 @@
+"""
+Two-tier cache backend: a small per-process LRU in front of a shared cache.
+
+Almost everything this project caches is stored under a versioned key
+(see core.cache), so an entry never changes once written; it is only
+replaced by a key with a newer version. Such entries can safely be kept
+in process memory for a few seconds, which saves the round trip to the
+shared tier on hot pages (cards, facets, availability).
+
+Mutable keys (the namespace versions themselves, counters) must be seen
+by every process at once. Keys starting with one of SHARED_ONLY_PREFIXES
+skip the local tier.
+
+    'default': {
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'OPTIONS': {
+            'SHARED': 'shared',         # alias of the shared cache
+            'LOCAL_TIMEOUT': 5,         # seconds an entry may live in-process
+            'MAX_ENTRIES': 2000,        # per-process LRU bound
+            'SHARED_ONLY_PREFIXES': ('version:', 'fragments:'),
+        },
+    }
+
+Writes go to both tiers. Other processes notice a write once their local
+copy expires, so keep LOCAL_TIMEOUT short.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+_missing = object()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self._shared_only = tuple(options.get('SHARED_ONLY_PREFIXES', ('version:',)))
+        # LocMemCache is already an LRU (reads move keys to the end, culls drop the oldest)
+        self._local = LocMemCache(f'tiered:{location}', {
+            'TIMEOUT': self._local_timeout,
+            'OPTIONS': {'MAX_ENTRIES': self._max_entries, 'CULL_FREQUENCY': self._cull_frequency},
+        })
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_ok(self, key):
+        return not str(key).startswith(self._shared_only)
+
+    def _local_ttl(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def get(self, key, default=None, version=None):
+        if not self._local_ok(key):
+            return self.shared.get(key, default, version)
+        value = self._local.get(key, _missing, version)
+        if value is _missing:
+            value = self.shared.get(key, _missing, version)
+            if value is _missing:
+                return default
+            self._local.set(key, value, version=version)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self._local.get_many([k for k in keys if self._local_ok(k)], version)
+        missing = [k for k in keys if k not in found]
+        if missing:
+            fetched = self.shared.get_many(missing, version)
+            self._local.set_many({k: v for k, v in fetched.items() if self._local_ok(k)}, version=version)
+            found.update(fetched)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version)
+        self._set_local(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version)
+        for key, value in data.items():
+            self._set_local(key, value, timeout, version)
+        return failed
+
+    def _set_local(self, key, value, timeout, version):
+        if not self._local_ok(key):
+            return
+        ttl = self._local_ttl(timeout)
+        if ttl is not None and ttl <= 0:
+            self._local.delete(key, version)
+        else:
+            self._local.set(key, value, ttl, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Only the shared tier can say whether the key exists anywhere
+        added = self.shared.add(key, value, timeout, version)
+        if added:
+            self._set_local(key, value, timeout, version)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version)
+        self._local.delete(key, version)
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local.delete(key, version)
+        return self.shared.touch(key, timeout, version)
+
+    def has_key(self, key, version=None):
+        return (self._local_ok(key) and self._local.has_key(key, version)) or self.shared.has_key(key, version)
+
+    def delete(self, key, version=None):
+        self._local.delete(key, version)
+        return self.shared.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self._local.delete_many(keys, version)
+        self.shared.delete_many(keys, version)
+
+    def clear(self):
+        self._local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,59 @@
+"""
+Precomputed KPIs for the admin home page.
+
+The dashboard reads one KPISnapshot row instead of aggregating the
+property, inquiry and user tables on every visit. The headline counters are
+kept current by signals (core.signals) with F() deltas; the chart
+breakdowns are rebuilt by refresh(), run from the refresh_kpis command or
+the dashboard's refresh button.
+"""
+from django.contrib.auth.models import User
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import KPISnapshot
+
+SNAPSHOT_ID = 1
+TOP_CITIES = 5
+
+
+def snapshot():
+    """The current snapshot; computed on the spot only if none exists yet."""
+    return KPISnapshot.objects.filter(pk=SNAPSHOT_ID).first() or refresh()
+
+
+def refresh():
+    """Recompute every figure from the source tables."""
+    # Lazy import; listings depends on core
+    from listings.models import Inquiry, Property
+
+    portfolio = Property.objects.filter(status='available').aggregate(total=Sum('price'))['total']
+    types = Property.objects.values('property_type').annotate(count=Count('id')).order_by('-count')
+    trend = Inquiry.objects.annotate(month=TruncMonth('created_at'))\
+        .values('month').annotate(count=Count('id')).order_by('month')
+    cities = Property.objects.values('city').annotate(count=Count('id')).order_by('-count')[:TOP_CITIES]
+
+    obj, _ = KPISnapshot.objects.update_or_create(pk=SNAPSHOT_ID, defaults={
+        'total_properties': Property.objects.count(),
+        'active_listings': Property.objects.filter(status='available').count(),
+        'total_users': User.objects.count(),
+        'total_inquiries': Inquiry.objects.count(),
+        'portfolio_value': portfolio or 0,
+        'property_types': [[t['property_type'], t['count']] for t in types],
+        'inquiry_trend': [[i['month'].strftime('%Y-%m'), i['count']] for i in trend],
+        'top_cities': [[c['city'], c['count']] for c in cities],
+        'refreshed_at': timezone.now(),
+        'stale': False,
+    })
+    return obj
+
+
+def adjust(**deltas):
+    """Apply counter deltas in one UPDATE, e.g. adjust(total_inquiries=1). No-op before the first refresh."""
+    deltas = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    KPISnapshot.objects.filter(pk=SNAPSHOT_ID).update(stale=True, **deltas)
+
+
+def mark_stale():
+    KPISnapshot.objects.filter(pk=SNAPSHOT_ID, stale=False).update(stale=True)
@@ -0,0 +1,55 @@
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core import benchmark
+from listings import tracking
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the main views against a generated dataset in a throwaway test database, "
+        "and fail if any exceeds its query, latency or memory budget (core/benchmark_budgets.json)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=2000)
+        parser.add_argument('--runs', type=int, default=20, help="Timed requests per view.")
+        parser.add_argument('--view', action='append', dest='views', help="Only this view (repeatable).")
+        parser.add_argument('--record', action='store_true', help="Write the results as the new budgets.")
+        parser.add_argument('--no-latency', action='store_true', help="Don't check latency (e.g. on slow CI hosts).")
+
+    def handle(self, *args, **options):
+        scratch = tempfile.mkdtemp(prefix='benchmark-')
+        # The production cache layout, pointed at scratch space so real caches are left alone
+        cache_settings = {**settings.CACHES, 'shared': {**settings.CACHES['shared'], 'LOCATION': scratch}}
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=cache_settings, MEDIA_ROOT=scratch):
+                self.stdout.write(f"Generating {options['properties']} listings...")
+                benchmark.prepare(options['properties'])
+                self.stdout.write(f"{'view':<24}{'queries':>8}{'p50 ms':>10}{'p95 ms':>10}{'peak KB':>10}")
+                results = benchmark.run(Client(), options['views'], options['runs'], log=self.show)
+        finally:
+            # Buffered page views belong in the test database, not the real one at exit
+            tracking.flush()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['record']:
+            benchmark.save_budgets(results, options['properties'])
+            self.stdout.write(self.style.SUCCESS(f"Recorded budgets for {len(results)} views."))
+            return
+        failures = benchmark.check(results, benchmark.load_budgets(), latency=not options['no_latency'])
+        if failures:
+            raise CommandError("Over budget:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All views within budget."))
+
+    def show(self, r):
+        self.stdout.write(f"{r.name:<24}{r.queries:>8}{r.p50_ms:>10.1f}{r.p95_ms:>10.1f}{r.peak_kb:>10.0f}")
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the database with realistic synthetic users, agents, listings, images, bookings, "
+        "inquiries, favorites and view counters for load and performance testing. Seeded, so "
+        "runs are repeatable."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=None, help="Default: half the number of properties.")
+        parser.add_argument('--agents', type=int, default=None, help="Default: one per 200 properties (at least 5).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--days', type=int, default=730, help="How far back listings and accounts go.")
+        parser.add_argument('--view-days', type=int, default=7, help="Days of daily view counters.")
+        parser.add_argument('--chunk-size', type=int, default=synthetic.CHUNK_SIZE)
+        parser.add_argument('--prefix', default='synth', help="Username prefix of the generated accounts.")
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="Don't rebuild market stats, KPIs and similar listings afterwards.")
+
+    def handle(self, *args, **options):
+        properties = options['properties']
+        users = options['users'] or max(properties // 2, 10)
+        agents = options['agents'] or max(properties // 200, 5)
+        log = self.stdout.write if options['verbosity'] > 1 else None
+
+        started = time.monotonic()
+        generator = synthetic.Generator(
+            seed=options['seed'], days=options['days'], view_days=options['view_days'],
+            chunk_size=options['chunk_size'], prefix=options['prefix'], log=log,
+        )
+        try:
+            totals = generator.run(users, agents, properties)
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write(
+            f"Created {totals.users} users, {totals.agents} agents, {totals.properties} listings, "
+            f"{totals.images} images, {totals.bookings} bookings, {totals.inquiries} inquiries, "
+            f"{totals.favorites} favorites and {totals.daily_views} daily view counters "
+            f"in {time.monotonic() - started:.0f}s."
+        )
+        if not options['skip_derived']:
+            synthetic.refresh_derived(log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS("Done."))
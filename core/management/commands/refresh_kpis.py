@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import kpi
+
+
+class Command(BaseCommand):
+    help = "Recompute the admin dashboard KPI snapshot. Run periodically (e.g. every 15 minutes from cron)."
+
+    def handle(self, *args, **options):
+        snapshot = kpi.refresh()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {snapshot}."))
@@ -0,0 +1,42 @@
+import time
+
+from django.db import connection
+from django.http import FileResponse
+
+from . import perf
+
+
+class QueryStatsMiddleware:
+    """
+    Samples requests for core.perf: query count, DB time, the slowest
+    statement and render time, filed under the resolved view name.
+    Put it first so its timing covers the rest of the middleware too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not perf.sampled():
+            return self.get_response(request)
+
+        recorder = perf.QueryRecorder()
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = match.view_name if match else f'<unresolved {response.status_code}>'
+        if response.streaming and not isinstance(response, FileResponse):
+            # Exports run their queries as the body streams; keep counting until it is done
+            response.streaming_content = self.measure_stream(response.streaming_content, view, started, recorder)
+        else:
+            perf.record(view, (time.perf_counter() - started) * 1000, recorder)
+        return response
+
+    def measure_stream(self, content, view, started, recorder):
+        try:
+            with connection.execute_wrapper(recorder):
+                yield from content
+        finally:
+            perf.record(view, (time.perf_counter() - started) * 1000, recorder)
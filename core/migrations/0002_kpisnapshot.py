@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KPISnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_properties', models.IntegerField(default=0)),
+                ('active_listings', models.IntegerField(default=0)),
+                ('total_users', models.IntegerField(default=0)),
+                ('total_inquiries', models.IntegerField(default=0)),
+                ('portfolio_value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('property_types', models.JSONField(default=list)),
+                ('inquiry_trend', models.JSONField(default=list)),
+                ('top_cities', models.JSONField(default=list)),
+                ('refreshed_at', models.DateTimeField()),
+                ('stale', models.BooleanField(default=False, help_text='Charts may lag until the next refresh')),
+            ],
+            options={
+                'verbose_name': 'KPI snapshot',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_kpisnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ViewTiming',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view', models.CharField(max_length=200)),
+                ('hour', models.DateTimeField()),
+                ('requests', models.PositiveIntegerField(default=0)),
+                ('queries', models.PositiveIntegerField(default=0)),
+                ('db_ms', models.FloatField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_queries', models.PositiveIntegerField(default=0)),
+                ('histogram', models.JSONField(default=list)),
+                ('slowest_sql', models.TextField(blank=True)),
+                ('slowest_sql_ms', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='core_viewti_hour_0ec052_idx')],
+                'unique_together': {('view', 'hour')},
+            },
+        ),
+    ]
@@ -16,6 +16,48 @@ class TimeStampedModel(models.Model):
     class Meta:
         abstract = True
 
+class KPISnapshot(models.Model):
+    """Single-row copy of the admin dashboard figures, maintained by core.kpi."""
+    total_properties = models.IntegerField(default=0)
+    active_listings = models.IntegerField(default=0)
+    total_users = models.IntegerField(default=0)
+    total_inquiries = models.IntegerField(default=0)
+    portfolio_value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    # Chart series as [label, count] pairs
+    property_types = models.JSONField(default=list)
+    inquiry_trend = models.JSONField(default=list)
+    top_cities = models.JSONField(default=list)
+    refreshed_at = models.DateTimeField()
+    stale = models.BooleanField(default=False, help_text="Charts may lag until the next refresh")
+
+    class Meta:
+        verbose_name = "KPI snapshot"
+
+    def __str__(self):
+        return f"KPIs as of {self.refreshed_at:%Y-%m-%d %H:%M}"
+
+class ViewTiming(models.Model):
+    """Sampled request statistics for one view over one hour, accumulated by core.perf."""
+    view = models.CharField(max_length=200)
+    hour = models.DateTimeField()
+    requests = models.PositiveIntegerField(default=0)
+    # Sums over the sampled requests; divide by `requests` for averages
+    queries = models.PositiveIntegerField(default=0)
+    db_ms = models.FloatField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_queries = models.PositiveIntegerField(default=0)
+    # Request counts per core.perf.BUCKETS_MS latency bucket
+    histogram = models.JSONField(default=list)
+    slowest_sql = models.TextField(blank=True)
+    slowest_sql_ms = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('view', 'hour')
+        indexes = [models.Index(fields=['hour'])]
+
+    def __str__(self):
+        return f"{self.view} @ {self.hour:%Y-%m-%d %H:00}"
+
 class Profile(TimeStampedModel):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone = models.CharField(max_length=20, blank=True, null=True)
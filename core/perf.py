@@ -0,0 +1,241 @@
+"""
+Sampled per-view SQL and timing statistics (core.middleware.QueryStatsMiddleware).
+
+SAMPLE_RATE of requests are instrumented: a connection.execute_wrapper
+times every statement the request runs, and the middleware times the
+whole response. Streamed responses (the admin exports) are measured until
+the last chunk is sent, so the queries that run while streaming are
+included. Each sample is recorded as:
+- the query count and total DB time;
+- the slowest statement;
+- render time, meaning everything that isn't the database: view code,
+  templates and middleware.
+Unsampled requests pay one random() call.
+
+Samples are aggregated in process memory per (view name, hour), so the
+buffer stays small however busy the site is. Each bucket keeps counts,
+sums, the maximum query count, a latency histogram over BUCKETS_MS and
+the slowest statement. A timer thread flushes the buffer FLUSH_INTERVAL
+seconds after its first sample, off the request path. The buffer is also
+flushed at interpreter exit. Flushes go into ViewTiming rows that every
+worker adds to. A flush is one short write transaction: an INSERT of
+missing rows, a locked read, one UPDATE, and a DELETE of rows older than
+RETENTION_HOURS, which keeps the table a rolling window. The test runner
+turns the timer off and discard()s the buffer.
+
+The admin's Performance page (ArthiAdminSite.performance) reads summary().
+"""
+import atexit
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ViewTiming
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = getattr(settings, 'QUERY_STATS_SAMPLE_RATE', 0.1)
+FLUSH_INTERVAL = getattr(settings, 'QUERY_STATS_FLUSH_INTERVAL', 30)
+RETENTION_HOURS = getattr(settings, 'QUERY_STATS_RETENTION_HOURS', 24 * 7)
+# Histogram bucket upper bounds; one more bucket counts everything slower
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SQL_MAX_LENGTH = 2000
+
+_lock = threading.Lock()
+_buffer = {}
+_timer = None
+
+
+def sampled():
+    return SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE
+
+
+class QueryRecorder:
+    """execute_wrapper callable that counts and times the statements it sees."""
+    def __init__(self):
+        self.count = 0
+        self.db_ms = 0.0
+        self.slowest_sql = ''
+        self.slowest_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.count += 1
+            self.db_ms += elapsed
+            if elapsed > self.slowest_ms:
+                self.slowest_sql, self.slowest_ms = sql, elapsed
+
+
+def _bucket(total_ms):
+    for i, bound in enumerate(BUCKETS_MS):
+        if total_ms <= bound:
+            return i
+    return len(BUCKETS_MS)
+
+
+def record(view, total_ms, recorder):
+    """Add one sampled request to the buffer."""
+    hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+    with _lock:
+        if not _buffer:
+            _start_timer()
+        stats = _buffer.get((view, hour))
+        if stats is None:
+            stats = _buffer[(view, hour)] = _empty()
+        _add(stats, {
+            'requests': 1,
+            'queries': recorder.count,
+            'max_queries': recorder.count,
+            'db_ms': recorder.db_ms,
+            'total_ms': total_ms,
+            'histogram': [int(i == _bucket(total_ms)) for i in range(len(BUCKETS_MS) + 1)],
+            'slowest_sql': recorder.slowest_sql,
+            'slowest_sql_ms': recorder.slowest_ms,
+        })
+
+
+def _start_timer():
+    # Called with _lock held, for the first sample after a flush
+    global _timer
+    if FLUSH_INTERVAL and _timer is None:
+        _timer = threading.Timer(FLUSH_INTERVAL, _flush_on_timer)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_on_timer():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush()
+    finally:
+        connection.close()  # this thread's own connection
+
+
+def _empty():
+    return {
+        'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0, 'total_ms': 0.0,
+        'histogram': [0] * (len(BUCKETS_MS) + 1), 'slowest_sql': '', 'slowest_sql_ms': 0.0,
+    }
+
+
+def _add(stats, other):
+    """Merge `other` into `stats`; both are dicts shaped like _empty()."""
+    for field in ('requests', 'queries', 'db_ms', 'total_ms'):
+        stats[field] += other[field]
+    stats['max_queries'] = max(stats['max_queries'], other['max_queries'])
+    # A freshly created row has an empty histogram
+    empty = [0] * (len(BUCKETS_MS) + 1)
+    stats['histogram'] = [a + b for a, b in zip(stats['histogram'] or empty, other['histogram'] or empty)]
+    if other['slowest_sql_ms'] > stats['slowest_sql_ms']:
+        stats['slowest_sql'] = other['slowest_sql'][:SQL_MAX_LENGTH]
+        stats['slowest_sql_ms'] = other['slowest_sql_ms']
+
+
+def flush():
+    """Write out the buffered buckets. Returns the number of sampled requests written."""
+    global _buffer
+    with _lock:
+        buckets, _buffer = _buffer, {}
+    if not buckets:
+        return 0
+    try:
+        _write(buckets)
+    except Exception:
+        logger.exception("Dropping query stats for %s views", len(buckets))
+        return 0
+    return sum(stats['requests'] for stats in buckets.values())
+
+
+def _write(buckets):
+    fields = list(_empty())
+    with transaction.atomic():
+        # Create missing rows first, so concurrent workers meet on the same row and the lock below
+        ViewTiming.objects.bulk_create(
+            [ViewTiming(view=view, hour=hour) for view, hour in buckets], ignore_conflicts=True,
+        )
+        match = Q()
+        for view, hour in buckets:
+            match |= Q(view=view, hour=hour)
+        rows = list(ViewTiming.objects.select_for_update().filter(match))
+        for row in rows:
+            stats = {field: getattr(row, field) for field in fields}
+            _add(stats, buckets[(row.view, row.hour)])
+            for field, value in stats.items():
+                setattr(row, field, value)
+        ViewTiming.objects.bulk_update(rows, fields)
+        ViewTiming.objects.filter(hour__lt=timezone.now() - timedelta(hours=RETENTION_HOURS)).delete()
+
+
+def pending():
+    with _lock:
+        return sum(stats['requests'] for stats in _buffer.values())
+
+
+def discard():
+    """Drop the buffered samples without writing them (tests)."""
+    global _buffer
+    with _lock:
+        _buffer = {}
+
+
+atexit.register(flush)
+
+
+# ==========================================
+# REPORTING
+# ==========================================
+
+def percentile(histogram, fraction):
+    """Upper bound (ms) of the histogram bucket holding the given fraction; None past the last bound."""
+    total = sum(histogram)
+    if not total:
+        return None
+    seen = 0
+    for bound, count in zip(BUCKETS_MS + (None,), histogram):
+        seen += count
+        if seen >= fraction * total:
+            return bound
+    return None
+
+
+def summary(hours=24):
+    """Per-view figures over the last `hours`, slowest p95 first, then by average time."""
+    since = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=hours - 1)
+    merged = {}
+    for row in ViewTiming.objects.filter(hour__gte=since):
+        stats = merged.setdefault(row.view, _empty())
+        _add(stats, {field: getattr(row, field) for field in _empty()})
+
+    views = []
+    for view, stats in merged.items():
+        n = stats['requests'] or 1
+        views.append({
+            'view': view,
+            'requests': stats['requests'],
+            'avg_queries': stats['queries'] / n,
+            'max_queries': stats['max_queries'],
+            'avg_db_ms': stats['db_ms'] / n,
+            'avg_render_ms': (stats['total_ms'] - stats['db_ms']) / n,
+            'avg_total_ms': stats['total_ms'] / n,
+            'p50_ms': percentile(stats['histogram'], 0.5),
+            'p95_ms': percentile(stats['histogram'], 0.95),
+            'histogram': stats['histogram'],
+            'slowest_sql': stats['slowest_sql'],
+            'slowest_sql_ms': stats['slowest_sql_ms'],
+        })
+    # None (past the last bucket) sorts as the slowest
+    views.sort(key=lambda v: (v['p95_ms'] is None, v['p95_ms'] or 0, v['avg_total_ms']), reverse=True)
+    return views
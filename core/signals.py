@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from listings.models import Inquiry, Property
+from . import kpi
+
+_UNKNOWN = object()
+
+def _listing_figures(status, price):
+    # (active_listings, portfolio_value) contributed by one property
+    return (1, price) if status == 'available' else (0, 0)
+
+@receiver(post_save, sender=Property)
+def count_property_save(sender, instance, created, **kwargs):
+    active, value = _listing_figures(instance.status, instance.price)
+    if created:
+        kpi.adjust(total_properties=1, active_listings=active, portfolio_value=value)
+        return
+    if not (instance.has_changed('status') or instance.has_changed('price')):
+        return
+    old_status = instance.loaded_value('status', _UNKNOWN)
+    old_price = instance.loaded_value('price', _UNKNOWN)
+    if old_status is _UNKNOWN or old_price is _UNKNOWN:
+        # Saved from a deferred queryset; leave it to the next refresh
+        kpi.mark_stale()
+        return
+    old_active, old_value = _listing_figures(old_status, old_price)
+    kpi.adjust(active_listings=active - old_active, portfolio_value=value - old_value)
+
+@receiver(post_delete, sender=Property)
+def count_property_delete(sender, instance, **kwargs):
+    active, value = _listing_figures(instance.status, instance.price)
+    kpi.adjust(total_properties=-1, active_listings=-active, portfolio_value=-value)
+
+@receiver(post_save, sender=Inquiry)
+def count_inquiry_save(sender, instance, created, **kwargs):
+    if created:
+        kpi.adjust(total_inquiries=1)
+
+@receiver(post_delete, sender=Inquiry)
+def count_inquiry_delete(sender, instance, **kwargs):
+    kpi.adjust(total_inquiries=-1)
+
+@receiver(post_save, sender=User)
+def count_user_save(sender, instance, created, **kwargs):
+    if created:
+        kpi.adjust(total_users=1)
+
+@receiver(post_delete, sender=User)
+def count_user_delete(sender, instance, **kwargs):
+    kpi.adjust(total_users=-1)
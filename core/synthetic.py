@@ -0,0 +1,475 @@
+"""
+Synthetic data for load and performance testing (manage.py generate_data).
+
+Builds a catalogue of any size with distributions close to what the site
+sees in production:
+
+* cities weighted by market size, each with its own price level; listings
+  scattered around the city centre.
+* property type and listing type drawn jointly: land is sold, offices
+  are mostly let, apartments are rented nearly as often as sold.
+* prices log-normal around a per-type base, so they skew right the way
+  real asking prices do. A hidden "luxury" score per listing pushes
+  price, floor area and the premium amenities (pool, gym, security, air
+  conditioning) up together, so the amenities stay correlated.
+* a log-normal popularity per listing drives its bookings, inquiries,
+  favorites and daily views, so a few listings get most of the traffic.
+
+Everything comes from one seeded NumPy generator, so a seed always gives
+the same data, with dates counted back from the day it runs. Rows are
+written with bulk_create in chunks of listings; each chunk's images,
+booking settings, bookings, inquiries, favorites and view counters are
+written with it. Signals don't run, so the dependent data is written
+directly: Profiles, slot occupancy and timestamps. The derived tables
+are rebuilt once at the end (refresh_derived). Images are a few
+placeholder JPEGs, rendered once and shared by every listing.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from PIL import Image
+
+from booking.models import Agent, Booking, BookingSettings, SlotOccupancy
+from listings import analytics, clustering, conditional, market, pricing, renditions, similarity
+from listings.models import Favorite, Inquiry, Property, PropertyDailyViews, PropertyImage
+from . import cache as cache_versions
+from . import kpi
+from .models import Profile
+
+PASSWORD = 'password123'
+CHUNK_SIZE = 5000
+PLACEHOLDERS = 12
+# similarity.rebuild compares every listing with every other one; beyond
+# this it is left for `manage.py rebuild_similar` to run deliberately
+SIMILARITY_LIMIT = 50_000
+
+# name, county, centre (lat, lng), share of listings, price level, on the water
+CITIES = [
+    ('Nairobi', 'Nairobi County', (-1.2921, 36.8219), 0.40, 1.30, False),
+    ('Mombasa', 'Mombasa County', (-4.0435, 39.6682), 0.13, 1.00, True),
+    ('Kisumu', 'Kisumu County', (-0.0917, 34.7680), 0.08, 0.70, True),
+    ('Nakuru', 'Nakuru County', (-0.3031, 36.0800), 0.08, 0.70, False),
+    ('Eldoret', 'Uasin Gishu County', (0.5143, 35.2698), 0.06, 0.60, False),
+    ('Thika', 'Kiambu County', (-1.0333, 37.0693), 0.06, 0.65, False),
+    ('Ruiru', 'Kiambu County', (-1.1466, 36.9609), 0.05, 0.75, False),
+    ('Kitengela', 'Kajiado County', (-1.4731, 36.9591), 0.05, 0.60, False),
+    ('Malindi', 'Kilifi County', (-3.2192, 40.1169), 0.04, 0.90, True),
+    ('Naivasha', 'Nakuru County', (-0.7167, 36.4333), 0.03, 0.80, True),
+    ('Nyeri', 'Nyeri County', (-0.4201, 36.9476), 0.02, 0.55, False),
+    ('Machakos', 'Machakos County', (-1.5177, 37.2634), 0.02, 0.50, False),
+]
+NEIGHBOURHOODS = {
+    'Nairobi': ['Karen', 'Kilimani', 'Westlands', 'Lavington', 'Runda', 'Kileleshwa', 'South B', 'Embakasi'],
+    'Mombasa': ['Nyali', 'Bamburi', 'Shanzu', 'Tudor', 'Mtwapa'],
+    'Kisumu': ['Milimani', 'Riat Hills', 'Mamboleo'],
+    'Nakuru': ['Milimani', 'Section 58', 'Lanet'],
+}
+
+# type, share, sale price, monthly rent, bedrooms (low, high) or None
+PROPERTY_TYPES = [
+    ('apartment', 0.32, 9e6, 60e3, (1, 4)),
+    ('house', 0.18, 18e6, 120e3, (2, 5)),
+    ('villa', 0.06, 60e6, 350e3, (4, 7)),
+    ('bungalow', 0.10, 14e6, 80e3, (2, 4)),
+    ('land', 0.14, 6e6, 40e3, None),
+    ('commercial_land', 0.05, 40e6, 250e3, None),
+    ('commercial', 0.07, 50e6, 400e3, None),
+    ('office', 0.08, 30e6, 200e3, None),
+]
+# (sale, rent, lease) chances per type
+LISTING_TYPES = {
+    'land': (0.9, 0.0, 0.1),
+    'commercial_land': (0.8, 0.0, 0.2),
+    'commercial': (0.3, 0.4, 0.3),
+    'office': (0.3, 0.4, 0.3),
+}
+RESIDENTIAL_LISTING_TYPES = (0.55, 0.42, 0.03)
+
+# amenity: (base log-odds, luxury weight, types it applies to or None for all buildings)
+AMENITIES = {
+    'has_parking': (0.8, 0.8, None),
+    'has_swimming_pool': (-2.5, 1.5, ('house', 'villa', 'apartment')),
+    'has_garden': (0.0, 0.6, ('house', 'villa', 'bungalow')),
+    'has_security': (0.5, 1.2, None),
+    'has_elevator': (-0.5, 1.0, ('apartment', 'office', 'commercial')),
+    'has_gym': (-2.0, 1.4, ('apartment', 'villa', 'office')),
+    'has_air_conditioning': (-1.5, 1.3, None),
+}
+LAND_TYPES = ('land', 'commercial_land')
+LAND_AMENITIES = {'has_road_access': 1.5, 'has_electricity': 0.5, 'has_water_connection': 0.2}
+
+FIRST_NAMES = ['Amina', 'Brian', 'Cynthia', 'David', 'Esther', 'Felix', 'Grace', 'Hassan', 'Irene', 'James',
+               'Kevin', 'Lucy', 'Mercy', 'Njeri', 'Otieno', 'Peter', 'Faith', 'Samuel', 'Wanjiru', 'Yusuf']
+LAST_NAMES = ['Achieng', 'Baraka', 'Chege', 'Kamau', 'Kariuki', 'Kiptoo', 'Mwangi', 'Njoroge', 'Ochieng',
+              'Odhiambo', 'Omondi', 'Otieno', 'Wafula', 'Wambui', 'Wanjiku', 'Mutua']
+ADJECTIVES = ['Spacious', 'Modern', 'Elegant', 'Cozy', 'Bright', 'Secure', 'Charming', 'Executive']
+MESSAGES = [
+    'Is this property still available?',
+    'Could I arrange a viewing this weekend?',
+    'Is the price negotiable?',
+    'What are the service charges?',
+    'Are pets allowed?',
+]
+
+
+@dataclass
+class Totals:
+    users: int = 0
+    agents: int = 0
+    properties: int = 0
+    images: int = 0
+    bookings: int = 0
+    inquiries: int = 0
+    favorites: int = 0
+    daily_views: int = 0
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at we set instead of stamping now()."""
+    fields = [f for model in models for f in model._meta.concrete_fields
+              if getattr(f, 'auto_now', False) or getattr(f, 'auto_now_add', False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, auto_now, auto_now_add in saved:
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _choose(items, draw):
+    """The item a uniform draw in [0, 1) lands on."""
+    return items[int(draw * len(items))]
+
+
+class Generator:
+    def __init__(self, seed=42, days=730, view_days=7, chunk_size=CHUNK_SIZE, prefix='synth', log=None):
+        self.rng = np.random.default_rng(seed)
+        self.now = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        self.days = days
+        self.view_days = view_days
+        self.chunk_size = chunk_size
+        self.prefix = prefix
+        self.log = log or (lambda message: None)
+        self.totals = Totals()
+        self.user_ids = []
+        self.agents = []  # (agent id, user id)
+
+    def run(self, users, agents, properties):
+        if User.objects.filter(username__startswith=f'{self.prefix}_').exists():
+            raise ValueError(f"Users named {self.prefix}_* already exist; pick another prefix.")
+        models = (Profile, Property, PropertyImage, BookingSettings, Booking, Inquiry, Favorite)
+        with explicit_timestamps(*models):
+            self.create_users(users, agents)
+            self.images = self.placeholder_images()
+            for start in range(0, properties, self.chunk_size):
+                with transaction.atomic():
+                    self.create_listings(min(self.chunk_size, properties - start))
+                self.log(f"{self.totals.properties}/{properties} listings")
+        return self.totals
+
+    def _ago(self, fractions):
+        """Datetimes the given fractions of the `days` window before now."""
+        return [self.now - timedelta(days=self.days * float(f)) for f in fractions]
+
+    # ==========================================
+    # USERS AND AGENTS
+    # ==========================================
+
+    def create_users(self, count, agent_count):
+        rng = self.rng
+        count = max(count, agent_count)
+        password = make_password(PASSWORD)  # hashed once, shared: hashing per user would dominate
+        joined = self._ago(rng.random(count) ** 0.7)
+        firsts = [_choose(FIRST_NAMES, d) for d in rng.random(count)]
+        lasts = [_choose(LAST_NAMES, d) for d in rng.random(count)]
+        ids = []
+        for start in range(0, count, self.chunk_size):
+            batch = [
+                User(username=f'{self.prefix}_{i}', email=f'{self.prefix}_{i}@example.com', password=password,
+                     first_name=firsts[i], last_name=lasts[i], date_joined=joined[i])
+                for i in range(start, min(start + self.chunk_size, count))
+            ]
+            with transaction.atomic():
+                created = User.objects.bulk_create(batch)
+                Profile.objects.bulk_create([
+                    Profile(user=u, phone=f'+2547{rng.integers(10**7, 10**8)}', is_agent=i < agent_count,
+                            created_at=u.date_joined, updated_at=u.date_joined)
+                    for i, u in enumerate(created, start)
+                ])
+            ids += [u.pk for u in created]
+        agents = Agent.objects.bulk_create([
+            Agent(user_id=ids[i], name=f'{firsts[i]} {lasts[i]}', email=f'{self.prefix}_{i}@example.com',
+                  phone=f'+2547{rng.integers(10**7, 10**8)}')
+            for i in range(agent_count)
+        ])
+        self.user_ids = np.array(ids)
+        self.user_names = firsts
+        self.agents = [(a.pk, a.user_id) for a in agents]
+        # A few agencies carry most of the listings
+        self.agent_weights = 1.0 / np.arange(1, len(agents) + 1) ** 0.8
+        self.totals.users += count
+        self.totals.agents += len(agents)
+
+    def placeholder_images(self):
+        """Storage names of PLACEHOLDERS small JPEGs, with their renditions, made once."""
+        names = []
+        for i in range(PLACEHOLDERS):
+            name = f'properties/synthetic/placeholder_{i}.jpg'
+            if not default_storage.exists(name):
+                colour = tuple(int(c) for c in self.rng.integers(40, 220, 3))
+                buffer = BytesIO()
+                Image.new('RGB', (1200, 900), colour).save(buffer, 'JPEG')
+                name = default_storage.save(name, ContentFile(buffer.getvalue()))
+                renditions.generate(name)
+            names.append(name)
+        return names
+
+    # ==========================================
+    # LISTINGS
+    # ==========================================
+
+    def create_listings(self, n):
+        rng = self.rng
+        luxury = rng.standard_normal(n)
+        popularity = rng.lognormal(0.0, 1.0, n)
+
+        cities = rng.choice(len(CITIES), size=n, p=np.array([c[3] for c in CITIES]) / sum(c[3] for c in CITIES))
+        types = rng.choice(len(PROPERTY_TYPES), size=n, p=[t[1] for t in PROPERTY_TYPES])
+        created = self._ago(rng.random(n) ** 1.5)  # skewed towards recent listings
+        agent_rows = rng.choice(len(self.agents), size=n, p=self.agent_weights / self.agent_weights.sum())
+        owners = rng.choice(self.user_ids, size=n)
+        # Every other random number a listing needs, drawn up front: per-row generator calls are slow
+        u = rng.random((13, n))
+        z = rng.standard_normal((5, n))
+        amenity_draws = rng.random((len(AMENITIES) + len(LAND_AMENITIES) + 1, n))
+
+        props = []
+        for i in range(n):
+            city, county, (lat, lng), _, level, on_water = CITIES[cities[i]]
+            ptype, _, sale_price, rent, rooms = PROPERTY_TYPES[types[i]]
+            sale, rent_share, _ = LISTING_TYPES.get(ptype, RESIDENTIAL_LISTING_TYPES)
+            listing_type = 'sale' if u[0, i] < sale else 'rent' if u[0, i] < sale + rent_share else 'lease'
+
+            bedrooms = bathrooms = area = acres = year = None
+            if rooms:
+                bedrooms = int(min(rooms[1], max(rooms[0], round(sum(rooms) / 2 + 0.5 * luxury[i] + 0.8 * z[0, i]))))
+                bathrooms = Decimal(max(1, bedrooms - int(u[1, i] < 0.5))) + Decimal('0.5') * int(u[2, i] < 0.3)
+                area = bedrooms * (350 + 200 * u[3, i]) * np.exp(0.15 * luxury[i])
+                year = int(2025 - min(45, -12 * np.log1p(-u[4, i])))
+                if ptype != 'apartment':
+                    acres = np.exp(np.log(0.12) + 0.6 * z[1, i])
+            elif ptype in LAND_TYPES:
+                acres = np.exp(np.log(0.5 if ptype == 'land' else 2.0) + 0.8 * z[1, i])
+            else:
+                area = np.exp(np.log(3000) + 0.6 * z[1, i])
+                year = int(2025 - min(45, -15 * np.log1p(-u[4, i])))
+
+            base = sale_price if listing_type == 'sale' else rent * (1.2 if listing_type == 'lease' else 1.0)
+            if rooms:
+                base *= (bedrooms / (sum(rooms) / 2)) ** 0.6
+            elif ptype in LAND_TYPES:
+                base *= (acres / (0.5 if ptype == 'land' else 2.0)) ** 0.7
+            price = base * level * np.exp(0.35 * luxury[i] + 0.25 * z[2, i])
+
+            amenities = {}
+            draws = iter(amenity_draws[:, i])
+            for name, (intercept, weight, applies) in AMENITIES.items():
+                draw = next(draws)
+                if ptype not in LAND_TYPES and (not applies or ptype in applies):
+                    amenities[name] = bool(draw < 1 / (1 + np.exp(-(intercept + weight * luxury[i]))))
+            for name, log_odds in LAND_AMENITIES.items():
+                draw = next(draws)
+                amenities[name] = ptype not in LAND_TYPES or bool(draw < 1 / (1 + np.exp(-log_odds)))
+            amenities['is_waterfront'] = on_water and bool(next(draws) < 0.05 + 0.05 * max(luxury[i], 0))
+
+            if u[5, i] < 0.72:
+                status = 'available'
+            elif u[5, i] < 0.92:
+                status = 'sold' if listing_type == 'sale' else 'rented'
+            else:
+                status = 'pending'
+            # Closed listings were last touched when they closed
+            updated = created[i] + (self.now - created[i]) * (u[6, i] if status != 'available' else u[6, i] * 0.1)
+
+            area_name = _choose(NEIGHBOURHOODS.get(city, [f'{city} Central']), u[7, i])
+            label = ptype.replace('_', ' ').title()
+            title = f"{_choose(ADJECTIVES, u[8, i])} {f'{bedrooms}-Bedroom ' if bedrooms else ''}{label} in {area_name}"
+            agent_id, agent_user = self.agents[agent_rows[i]]
+            prop = Property(
+                title=title,
+                description=f"{title}, {city}. " + ', '.join(
+                    n.replace('has_', '').replace('_', ' ') for n, v in amenities.items() if v
+                ).capitalize() + '.',
+                property_type=ptype, listing_type=listing_type, status=status,
+                price=Decimal(f'{price:.2f}'), price_negotiable=bool(u[9, i] < 0.4),
+                address=f'{int(1 + 400 * u[10, i])} {area_name} Road', city=city, state=county,
+                zipcode=f'{int(100 + 900 * u[11, i]):05d}',
+                latitude=Decimal(f'{lat + 0.06 * z[3, i]:.6f}'), longitude=Decimal(f'{lng + 0.06 * z[4, i]:.6f}'),
+                bedrooms=bedrooms, bathrooms=bathrooms,
+                area_sqft=Decimal(f'{area:.2f}') if area else None,
+                land_size_acres=Decimal(f'{acres:.4f}') if acres else None,
+                year_built=year,
+                parking_spaces=int(1 + 4 * u[12, i]) if amenities.get('has_parking') else 0,
+                # Most listings are posted by an agency; the rest by private owners
+                owner_id=int(owners[i]) if u[9, i] > 0.7 else agent_user,
+                agent_id=agent_id if u[12, i] < 0.85 else None,
+                created_at=created[i], updated_at=updated,
+                **amenities,
+            )
+            prop.geohash = prop.compute_geohash()
+            props.append(prop)
+
+        props = Property.objects.bulk_create(props)
+        self.totals.properties += len(props)
+        self.create_images(props)
+        settings = self.create_booking_settings(props)
+        self.create_bookings(props, popularity, settings)
+        self.create_inquiries(props, popularity)
+        self.create_favorites(props, popularity)
+        self.create_views(props, popularity)
+
+    def create_images(self, props):
+        counts = self.rng.integers(1, 9, len(props))
+        picks = iter(self.rng.integers(len(self.images), size=int(counts.sum())))
+        images = [
+            PropertyImage(property_id=p.pk, image=self.images[next(picks)], is_primary=k == 0,
+                          renditions_ready=True, created_at=p.created_at, updated_at=p.created_at)
+            for p, count in zip(props, counts) for k in range(count)
+        ]
+        PropertyImage.objects.bulk_create(images)
+        # One UPDATE for the chunk; bulk_update would build a CASE over every row
+        Property.objects.filter(pk__in=[p.pk for p in props]).update(primary_image=Subquery(
+            PropertyImage.objects.filter(property=OuterRef('pk'), is_primary=True).values('pk')[:1]
+        ))
+        self.totals.images += len(images)
+
+    def create_booking_settings(self, props):
+        settings = [BookingSettings(listing_id=p.pk, created_at=p.created_at, updated_at=p.created_at) for p in props]
+        BookingSettings.objects.bulk_create(settings)
+        return {s.listing_id: s for s in settings}
+
+    # ==========================================
+    # ACTIVITY
+    # ==========================================
+
+    def _times_since(self, props, rate, until):
+        """
+        Poisson(rate) events per listing at random times between its creation
+        and `until`: (listing index per event, event datetimes).
+        """
+        counts = self.rng.poisson(rate)
+        span = np.array([(until - p.created_at).total_seconds() for p in props])
+        listing = np.repeat(np.arange(len(props)), counts)
+        offsets = self.rng.random(len(listing)) * span[listing]
+        return listing, [props[i].created_at + timedelta(seconds=float(s)) for i, s in zip(listing, offsets)]
+
+    def create_bookings(self, props, popularity, settings):
+        listing, when = self._times_since(props, 0.5 * popularity, self.now + timedelta(days=14))
+        u = self.rng.random((2, len(listing)))
+        users = self.rng.choice(self.user_ids, size=len(listing))
+        taken = {}
+        bookings = []
+        for j, (i, at) in enumerate(zip(listing, when)):
+            prop = props[i]
+            config = settings[prop.pk]
+            hour = config.start_hour + int(u[0, j] * (config.end_hour - config.start_hour))
+            start = timezone.make_aware(datetime.combine(timezone.localtime(at).date(), time(hour)))
+            if start > self.now:
+                status = 'pending' if u[1, j] < 0.6 else 'confirmed'
+            else:
+                status = 'pending' if u[1, j] < 0.1 else 'confirmed' if u[1, j] < 0.7 else 'cancelled'
+            if status in Booking.ACTIVE_STATUSES:
+                slot = (prop.pk, start)
+                if taken.get(slot, 0) >= config.max_viewers_per_slot:
+                    continue
+                taken[slot] = taken.get(slot, 0) + 1
+            bookings.append(Booking(
+                listing_id=prop.pk, user_id=int(users[j]), agent_id=prop.agent_id,
+                start_datetime=start, end_datetime=start + timedelta(minutes=config.slot_duration_minutes),
+                status=status, created_at=min(at, start), updated_at=min(at, start),
+            ))
+        Booking.objects.bulk_create(bookings)
+        # What Booking.save() would have counted (see booking.occupancy); one slot per booking
+        SlotOccupancy.objects.bulk_create(
+            [SlotOccupancy(listing_id=pk, slot_start=start, taken=n) for (pk, start), n in taken.items()]
+        )
+        self.totals.bookings += len(bookings)
+
+    def create_inquiries(self, props, popularity):
+        listing, when = self._times_since(props, 0.6 * popularity, self.now)
+        u = self.rng.random((4, len(listing)))
+        users = self.rng.integers(len(self.user_ids), size=len(listing))
+        inquiries = []
+        for j, (i, at) in enumerate(zip(listing, when)):
+            if u[0, j] < 0.8:  # signed in; the rest are anonymous visitors
+                user_id, name = int(self.user_ids[users[j]]), self.user_names[users[j]]
+            else:
+                user_id, name = None, _choose(FIRST_NAMES, u[1, j])
+            inquiries.append(Inquiry(
+                property_id=props[i].pk, user_id=user_id, inquirer_name=name,
+                inquirer_email=f'{name.lower()}{users[j]}@example.com',
+                message=_choose(MESSAGES, u[2, j]),
+                status='read' if (self.now - at).days > 7 or u[3, j] < 0.5 else 'new',
+                created_at=at, updated_at=at,
+            ))
+        Inquiry.objects.bulk_create(inquiries)
+        self.totals.inquiries += len(inquiries)
+
+    def create_favorites(self, props, popularity):
+        listing, when = self._times_since(props, 0.4 * popularity, self.now)
+        users = self.rng.choice(self.user_ids, size=len(listing))
+        seen = set()
+        favorites = []
+        for user_id, i, at in zip(users.tolist(), listing, when):
+            pair = (user_id, props[i].pk)
+            if pair not in seen:
+                seen.add(pair)
+                favorites.append(Favorite(user_id=user_id, property_id=pair[1], added_at=at,
+                                          created_at=at, updated_at=at))
+        Favorite.objects.bulk_create(favorites, ignore_conflicts=True)
+        self.totals.favorites += len(favorites)
+
+    def create_views(self, props, popularity):
+        """Daily view counters (listings.tracking's table) for the last view_days days."""
+        today = timezone.localdate()
+        days = [today - timedelta(days=d) for d in range(self.view_days)]
+        views = self.rng.poisson(3.0 * popularity[:, None], (len(props), len(days)))
+        listed = [timezone.localtime(p.created_at).date() for p in props]
+        counters = [
+            PropertyDailyViews(property_id=p.pk, date=day, views=int(views[i, d]))
+            for i, p in enumerate(props)
+            for d, day in enumerate(days)
+            if views[i, d] and listed[i] <= day
+        ]
+        PropertyDailyViews.objects.bulk_create(counters, batch_size=2000)
+        self.totals.daily_views += len(counters)
+
+
+def refresh_derived(log=None, similar=True):
+    """Rebuild what the skipped signals would have kept current."""
+    log = log or (lambda message: None)
+    cache_versions.bump_version(pricing.CACHE_NAMESPACE)
+    conditional.bump()
+    clustering.bump_version()
+    analytics.invalidate()
+    kpi.refresh()
+    log(f"Market statistics: {market.recompute()} groups.")
+    total = Property.objects.count()
+    if similar and total <= SIMILARITY_LIMIT:
+        log(f"Similar listings: {similarity.rebuild()} lists.")
+    else:
+        log(f"Similar listings skipped ({total} listings); run `manage.py rebuild_similar` when ready.")
@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    """
+    Points the shared file cache at a temporary directory for the run.
+    The real one (CACHE_DIR) outlives test databases: entries keyed by
+    versions or row ids from another database would be served to this one,
+    and clearing it would wipe a live site's cache on the same host. The
+    per-process tier starts empty anyway.
+
+    Also turns off core.perf sampling. The tests that need it turn it back
+    on.
+
+    core.perf, listings.tracking and listings.fragments lose their flush
+    timers, which would write into the test database (or cache) from
+    another thread. Whatever is still buffered at the end is discarded, not
+    flushed into the real database and cache at exit.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp(prefix='test-cache-')
+        self.cache_settings = override_settings(CACHES={
+            **settings.CACHES, 'shared': {**settings.CACHES['shared'], 'LOCATION': self.cache_dir},
+        })
+        self.cache_settings.enable()
+        from core import perf
+        from listings import fragments, tracking
+        perf.SAMPLE_RATE = 0
+        perf.FLUSH_INTERVAL = tracking.FLUSH_INTERVAL = fragments.FLUSH_INTERVAL = None
+
+    def teardown_test_environment(self, **kwargs):
+        from core import perf
+        from listings import fragments, tracking
+        perf.discard()
+        tracking.discard()
+        fragments.discard()
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
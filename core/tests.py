@@ -1,3 +1,178 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, SimpleTestCase, TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
 
-# Create your tests here.
+from booking.models import Booking, SlotOccupancy
+from listings.models import Inquiry, MarketStats, Property
+from . import benchmark, kpi, perf, synthetic
+from . import cache as cache_versions
+from .cache_backends import TieredCache
+from .models import ViewTiming
+
+
+class KPISnapshotTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        self.listing = Property.objects.create(
+            title='Garden Villa', description='x', property_type='villa', price=1000,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=self.owner,
+        )
+        kpi.refresh()
+
+    def assertMatchesFreshCounts(self):
+        incremental = kpi.snapshot()
+        fresh = kpi.refresh()
+        fields = ['total_properties', 'active_listings', 'total_users', 'total_inquiries', 'portfolio_value']
+        self.assertEqual([getattr(incremental, f) for f in fields], [getattr(fresh, f) for f in fields])
+
+    def test_signals_keep_counters_current(self):
+        Property.objects.create(
+            title='Loft', description='x', property_type='apartment', price=500,
+            address='Ngong Rd', city='Nairobi', state='Nairobi', owner=self.owner,
+        )
+        Inquiry.objects.create(property=self.listing, inquirer_name='A', inquirer_email='a@example.com', message='Hi')
+        User.objects.create_user('buyer')
+        self.listing.price = 1500
+        self.listing.status = 'sold'
+        self.listing.save()
+        self.assertTrue(kpi.snapshot().stale)
+        self.assertMatchesFreshCounts()
+
+        self.listing.delete()
+        self.assertMatchesFreshCounts()
+
+    def test_dashboard_reads_the_snapshot(self):
+        admin = User.objects.create_superuser('boss', 'boss@example.com', 'pw')
+        self.client.force_login(admin)
+        response = self.client.get('/admin/')
+        self.assertEqual(response.context['kpi']['active'], 1)
+        self.assertContains(response, 'Figures as of')
+
+        response = self.client.post('/admin/kpi/refresh/')
+        self.assertRedirects(response, '/admin/')
+
+
+class CacheVersionTests(SimpleTestCase):
+    def test_evicted_version_does_not_restart_at_an_old_value(self):
+        first = cache_versions.get_version('tests')
+        bumped = cache_versions.bump_version('tests')
+        cache.delete('version:tests')  # culled by the file cache
+        self.assertNotIn(cache_versions.get_version('tests'), (first, bumped))
+        cache.delete('version:tests')
+        self.assertNotIn(cache_versions.bump_version('tests'), (first, bumped))
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-tests'},
+})
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        # Two "processes": separate local tiers over one shared tier
+        options = {'OPTIONS': {'SHARED': 'shared', 'LOCAL_TIMEOUT': 60, 'MAX_ENTRIES': 3}}
+        self.one = TieredCache('one', options)
+        self.two = TieredCache('two', options)
+        self.one.clear()
+
+    def test_reads_fall_through_and_fill_the_local_tier(self):
+        self.one.set('card:1', 'html')
+        self.assertEqual(self.two.get('card:1'), 'html')
+        self.one.shared.delete('card:1')
+        self.assertEqual(self.two.get('card:1'), 'html')  # served from process memory
+        self.assertEqual(self.two.get_many(['card:1', 'card:2']), {'card:1': 'html'})
+
+    def test_version_keys_are_never_held_locally(self):
+        self.one.set('version:listings', 1)
+        self.assertEqual(self.two.get('version:listings'), 1)
+        self.one.incr('version:listings')
+        self.assertEqual(self.two.get('version:listings'), 2)
+
+    def test_local_tier_is_bounded(self):
+        for i in range(10):
+            self.one.set(f'k{i}', i)
+        self.assertLessEqual(len(self.one._local._cache), 3)
+        self.assertEqual(self.one.get('k0'), 0)  # still in the shared tier
+
+
+@override_settings(MEDIA_ROOT='/tmp/core-tests-media')
+class SyntheticDataTests(TestCase):
+    def generate(self, prefix):
+        synthetic.Generator(seed=7, prefix=prefix, chunk_size=40).run(users=30, agents=3, properties=100)
+        return list(Property.objects.filter(agent__user__username__startswith=prefix)
+                    .order_by('id').values_list('title', 'price', 'city'))
+
+    def test_seeded_runs_repeat(self):
+        first = self.generate('a')
+        self.assertEqual(Property.objects.count(), 100)
+        self.assertEqual(self.generate('b'), first)
+        self.assertFalse(Property.objects.filter(primary_image__isnull=True).exists())
+        self.assertEqual(User.objects.get(username='a_0').profile.is_agent, True)
+
+    def test_occupancy_and_derived_tables_match(self):
+        self.generate('a')
+        active = Booking.objects.filter(status__in=Booking.ACTIVE_STATUSES).count()
+        self.assertEqual(sum(SlotOccupancy.objects.values_list('taken', flat=True)), active)
+        synthetic.refresh_derived()
+        self.assertEqual(kpi.snapshot().total_properties, 100)
+        self.assertTrue(MarketStats.objects.exists())
+
+
+@tag('benchmark')
+@override_settings(MEDIA_ROOT='/tmp/core-tests-media')
+class ViewBudgetTests(TestCase):
+    def test_query_budgets_hold_on_a_small_dataset(self):
+        # The budgets were recorded on a much bigger dataset; query counts must not depend on its size
+        benchmark.prepare(200)
+        results = benchmark.run(Client(), runs=3)
+        self.assertEqual(len(results), len(benchmark.load_budgets()))
+        self.assertEqual(benchmark.check(results, benchmark.load_budgets(), latency=False, memory=False), [])
+
+
+class QueryStatsTests(TestCase):
+    def setUp(self):
+        self.sample_rate, perf.SAMPLE_RATE = perf.SAMPLE_RATE, 1
+        perf.flush()
+        self.admin = User.objects.create_superuser('root', 'root@example.com', 'pw')
+
+    def tearDown(self):
+        perf.SAMPLE_RATE = self.sample_rate
+        perf.discard()
+
+    def test_sampled_requests_are_aggregated_per_view_and_hour(self):
+        for _ in range(3):
+            self.client.get('/')
+        self.assertEqual(perf.pending(), 3)
+        self.assertEqual(perf.flush(), 3)
+        self.client.get('/')
+        perf.flush()
+
+        row = ViewTiming.objects.get(view='property_list')
+        self.assertEqual(row.requests, 4)
+        self.assertEqual(sum(row.histogram), 4)
+        self.assertGreater(row.queries, 0)
+        self.assertTrue(row.slowest_sql)
+        summary = {v['view']: v for v in perf.summary(hours=1)}
+        self.assertEqual(summary['property_list']['avg_queries'], row.queries / 4)
+
+    def test_streamed_exports_count_the_queries_made_while_streaming(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/listings/property/export/csv/')
+            self.assertEqual(perf.pending(), 0)  # not recorded until the body has been sent
+            b''.join(response.streaming_content)
+        self.assertEqual(perf.pending(), 1)
+        perf.flush()
+        self.assertEqual(ViewTiming.objects.get(view='arthi_admin:listings_property_export').queries, len(queries))
+
+    def test_performance_page_is_for_superusers(self):
+        self.client.get('/')
+        perf.flush()
+        self.client.force_login(self.admin)
+        response = self.client.get('/admin/performance/?hours=1')
+        self.assertContains(response, 'property_list')
+
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get('/admin/performance/').status_code, 403)
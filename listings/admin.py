@@ -1,13 +1,16 @@
 from django.contrib import admin
 from django.utils.html import format_html
+from django.utils import timezone
 from core.admin import admin_site  # Import our custom analytical admin
-from .models import Property, PropertyImage, PropertyDocument, Inquiry, Favorite
+from core import kpi
+from core.export import ExportMixin
+from .models import Property, PropertyImage, PropertyDocument, PricingHistory, MarketStats, Inquiry, Favorite
 from booking.models import Agent  # Import Agent for registration
 from django.http import JsonResponse
 from django.urls import path
-from django.db.models import Sum
-from datetime import datetime
 from dateutil.relativedelta import relativedelta
+from decimal import Decimal
+from . import analytics, market, pricing, similarity
 
 # --- Related Model Registrations ---
 
@@ -31,7 +34,7 @@ class PropertyImageInline(admin.TabularInline):
 
     def image_preview(self, obj):
         if obj.image:
-            return format_html('<img src="{}" style="width: 100px; height: auto; border-radius: 5px;" />', obj.image.url)
+            return format_html('<img src="{}" style="width: 100px; height: auto; border-radius: 5px;" />', obj.rendition_url('thumb'))
         return ""
 
 class PropertyDocumentInline(admin.TabularInline):
@@ -41,10 +44,24 @@ class PropertyDocumentInline(admin.TabularInline):
     model = PropertyDocument
     extra = 1
 
+class PricingHistoryInline(admin.TabularInline):
+    """
+    Read-only price changes, recorded automatically (see listings.pricing).
+    """
+    model = PricingHistory
+    fields = ('changed_at', 'old_price', 'new_price', 'changed_by', 'reason')
+    readonly_fields = fields
+    ordering = ('-changed_at',)
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
 # --- Main Property Admin ---
 
 @admin.register(Property, site=admin_site)
-class PropertyAdmin(admin.ModelAdmin):
+class PropertyAdmin(ExportMixin, admin.ModelAdmin):
     change_list_template = 'admin/listings/property_analytics.html'
     
     # Enhanced List View: Status is included to satisfy list_editable.
@@ -64,7 +81,7 @@ class PropertyAdmin(admin.ModelAdmin):
     
     # Autocomplete optimizes management of large numbers of owners/agents.
     autocomplete_fields = ['owner', 'agent']  
-    inlines = [PropertyImageInline, PropertyDocumentInline]
+    inlines = [PropertyImageInline, PropertyDocumentInline, PricingHistoryInline]
     list_per_page = 20
 
     # Organized Form Layout for better management experience.
@@ -96,15 +113,62 @@ class PropertyAdmin(admin.ModelAdmin):
     )
 
     # Bulk Management Actions.
-    actions = ['mark_as_sold', 'mark_as_available']
+    actions = ['mark_as_sold', 'mark_as_available', 'reduce_price', 'raise_price', 'export_csv', 'export_jsonl']
+
+    # Streamed by core.export; owner and agent come from JOINs
+    export_fields = (
+        ('id', 'id'), ('external_ref', 'external_ref'), ('title', 'title'),
+        ('property_type', 'property_type'), ('listing_type', 'listing_type'), ('status', 'status'),
+        ('price', 'price'), ('currency', 'currency'),
+        ('address', 'address'), ('city', 'city'), ('state', 'state'), ('country', 'country'),
+        ('latitude', 'latitude'), ('longitude', 'longitude'),
+        ('bedrooms', 'bedrooms'), ('bathrooms', 'bathrooms'), ('area_sqft', 'area_sqft'),
+        ('land_size_acres', 'land_size_acres'),
+        ('owner', 'owner__username'), ('owner_email', 'owner__email'),
+        ('agent', 'agent__name'), ('agent_email', 'agent__email'),
+        ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+    )
 
     @admin.action(description='Mark selected properties as Sold')
     def mark_as_sold(self, request, queryset):
-        queryset.update(status='sold')
+        self._set_status(queryset, 'sold')
 
     @admin.action(description='Mark selected properties as Available')
     def mark_as_available(self, request, queryset):
-        queryset.update(status='available')
+        self._set_status(queryset, 'available')
+
+    def _set_status(self, queryset, status):
+        rows = list(queryset.values_list('pk', 'status', 'price', *market.GROUP_FIELDS))
+        queryset.update(status=status, updated_at=timezone.now())
+        # update() skips post_save, so refresh the derived figures by hand, for the moved rows only
+        moved = [row for row in rows if row[1] != status]
+        if not moved:
+            return
+        analytics.invalidate()
+        # Rows entering or leaving the market move the KPI counters, as in core.signals
+        flipped = [price for _, old, price, *_ in moved if (old == 'available') != (status == 'available')]
+        sign = 1 if status == 'available' else -1
+        kpi.adjust(active_listings=sign * len(flipped), portfolio_value=sign * sum(flipped))
+        market.recompute({tuple(group) for _, _, _, *group in moved})
+        similarity.mark_stale([pk for pk, *_ in moved])
+
+    @admin.action(description='Reduce price of selected properties by 5%%')
+    def reduce_price(self, request, queryset):
+        self._scale_prices(request, queryset, Decimal('0.95'), 'Bulk reduction (5%)')
+
+    @admin.action(description='Raise price of selected properties by 5%%')
+    def raise_price(self, request, queryset):
+        self._scale_prices(request, queryset, Decimal('1.05'), 'Bulk increase (5%)')
+
+    def _scale_prices(self, request, queryset, factor, reason):
+        # Through pricing.change_prices so the history is written too
+        new_prices = {pk: price * factor for pk, price in queryset.values_list('pk', 'price')}
+        changed = pricing.change_prices(new_prices, changed_by=request.user, reason=reason)
+        self.message_user(request, f"Updated {changed} prices.")
+
+    def save_model(self, request, obj, form, change):
+        obj._changed_by = request.user  # credited in the price history
+        super().save_model(request, obj, form, change)
     
     # Custom display methods for Luxury aesthetic.
     def title_display(self, obj):
@@ -134,41 +198,41 @@ class PropertyAdmin(admin.ModelAdmin):
         return [path('analytics/', self.analytics_api, name='analytics')] + urls
     
     def analytics_api(self, request):
-        now = datetime.now()
-        labels, data = [], []
-        for i in range(12):
-            month = now - relativedelta(months=i)
-            sold = Property.objects.filter(
-                status='sold',
-                created_at__year=month.year,
-                created_at__month=month.month
-            ).count()
-            labels.append(month.strftime('%b'))
-            data.append(sold)
-        
-        total_sold = Property.objects.filter(status='sold').count()
-        revenue = Property.objects.filter(status='sold').aggregate(Sum('price'))['price__sum'] or 0
-        total = Property.objects.count()
-        sell_rate = round((total_sold / total * 100), 1) if total > 0 else 0
-        
-        return JsonResponse({
-            'labels': labels[::-1],
-            'data': data[::-1],
-            'total_sold': total_sold,
-            'total_revenue': float(revenue),
-            'sell_rate': sell_rate,
-            'available': Property.objects.filter(status='available').count()
-        })
+        # ?start=2025-01&end=2025-12 (months, inclusive); defaults to the last 12
+        start, end = analytics.default_range()
+        try:
+            if request.GET.get('end'):
+                end = analytics.parse_month(request.GET['end'])
+            if request.GET.get('start'):
+                start = analytics.parse_month(request.GET['start'])
+            elif request.GET.get('end'):
+                start = end - relativedelta(months=11)
+        except ValueError:
+            return JsonResponse({'error': 'start/end must look like YYYY-MM'}, status=400)
+        if start > end:
+            return JsonResponse({'error': 'start must not be after end'}, status=400)
+        start = max(start, end - relativedelta(months=analytics.MAX_MONTHS - 1))
+
+        return JsonResponse(analytics.sales_summary(start, end))
 
 # --- Other Models ---
 
 @admin.register(Inquiry, site=admin_site)
-class InquiryAdmin(admin.ModelAdmin):
+class InquiryAdmin(ExportMixin, admin.ModelAdmin):
     list_display = ('inquirer_name', 'property_link', 'inquirer_email', 'status', 'created_at_formatted')
     list_filter = ('status', 'created_at')
     list_editable = ('status',)
+    list_select_related = ('property',)
     search_fields = ('inquirer_name', 'inquirer_email', 'message')
     readonly_fields = ('created_at',)
+    actions = ['export_csv', 'export_jsonl']
+    export_fields = (
+        ('id', 'id'), ('created_at', 'created_at'), ('status', 'status'),
+        ('inquirer_name', 'inquirer_name'), ('inquirer_email', 'inquirer_email'),
+        ('inquirer_phone', 'inquirer_phone'), ('message', 'message'),
+        ('property_id', 'property_id'), ('property', 'property__title'), ('property_city', 'property__city'),
+        ('user', 'user__username'),
+    )
 
     def property_link(self, obj):
         return obj.property.title if obj.property else "General Inquiry"
@@ -182,4 +246,26 @@ class InquiryAdmin(admin.ModelAdmin):
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'property', 'created_at')
     list_filter = ('created_at',)
-    search_fields = ('user__username', 'property__title')
\ No newline at end of file
+    search_fields = ('user__username', 'property__title')
+
+
+@admin.register(MarketStats, site=admin_site)
+class MarketStatsAdmin(admin.ModelAdmin):
+    """
+    Read-only: rows are recomputed from the listings (see listings.market).
+    """
+    list_display = ('city', 'property_type', 'listing_type', 'listings', 'median_price',
+                    'price_p25', 'price_p75', 'median_price_per_sqft', 'median_price_per_acre', 'refreshed_at')
+    list_filter = ('property_type', 'listing_type', 'city')
+    search_fields = ('city',)
+    actions = ['recompute_all']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Recompute all market statistics')
+    def recompute_all(self, request, queryset):
+        self.message_user(request, f"Recomputed {market.recompute()} market groups.")
@@ -0,0 +1,88 @@
+"""
+Sales analytics for the PropertyAdmin dashboard.
+
+The monthly series is one TruncMonth-grouped query over the requested
+range and the headline totals one GROUP BY status; the combined result is
+cached until a property is created, deleted or changes status.
+"""
+from datetime import date, datetime, time
+
+from dateutil.relativedelta import relativedelta
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core import cache as cache_versions
+from .models import Property
+
+CACHE_NAMESPACE = 'analytics'
+CACHE_TIMEOUT = 60 * 60
+MAX_MONTHS = 60
+# Parsed months are clamped to this range, so date arithmetic on them can't overflow
+MIN_MONTH = date(1900, 1, 1)
+MAX_MONTH = date(2999, 12, 1)
+
+
+def parse_month(value):
+    """'2026-03' -> date(2026, 3, 1), clamped to MIN_MONTH..MAX_MONTH; raises ValueError on anything else."""
+    year, month = value.split('-')
+    return min(max(date(int(year), int(month), 1), MIN_MONTH), MAX_MONTH)
+
+
+def default_range():
+    """The last 12 months, ending with the current one."""
+    end = timezone.localdate().replace(day=1)
+    return end - relativedelta(months=11), end
+
+
+def sales_summary(start, end):
+    """Sales series and totals for the months start..end (inclusive, both first-of-month dates)."""
+    key = f'analytics:sales:{cache_versions.get_version(CACHE_NAMESPACE)}:{start:%Y-%m}:{end:%Y-%m}'
+    return cache.get_or_set(key, lambda: _compute(start, end), CACHE_TIMEOUT)
+
+
+def invalidate():
+    cache_versions.bump_version(CACHE_NAMESPACE)
+
+
+def _compute(start, end):
+    lower = timezone.make_aware(datetime.combine(start, time.min))
+    upper = timezone.make_aware(datetime.combine(end + relativedelta(months=1), time.min))
+
+    monthly = dict(
+        Property.objects.filter(status='sold', created_at__gte=lower, created_at__lt=upper)
+        .annotate(month=TruncMonth('created_at'))
+        .values('month')
+        .annotate(count=Count('id'))
+        .order_by()
+        .values_list('month', 'count')
+    )
+    monthly = {m.date() if hasattr(m, 'date') else m: c for m, c in monthly.items()}
+
+    months = []
+    month = start
+    while month <= end:
+        months.append(month)
+        month += relativedelta(months=1)
+    label_format = '%b' if len(months) <= 12 else '%b %Y'
+
+    by_status = {
+        row['status']: row
+        for row in Property.objects.values('status').annotate(count=Count('id'), revenue=Sum('price')).order_by()
+    }
+    total = sum(row['count'] for row in by_status.values())
+    sold = by_status.get('sold', {})
+    total_sold = sold.get('count', 0)
+
+    return {
+        'labels': [m.strftime(label_format) for m in months],
+        'data': [monthly.get(m, 0) for m in months],
+        'start': f'{start:%Y-%m}',
+        'end': f'{end:%Y-%m}',
+        'total_sold': total_sold,
+        'total_revenue': float(sold.get('revenue') or 0),
+        'sell_rate': round((total_sold / total * 100), 1) if total > 0 else 0,
+        'available': by_status.get('available', {}).get('count', 0),
+        'as_of': timezone.now().isoformat(),
+    }
@@ -0,0 +1,147 @@
+"""
+Read-only JSON API for listings, mounted under /api/.
+
+    GET /api/properties/                 available listings, newest first
+    GET /api/properties/?sort=price      also -price, created_at, -created_at
+    GET /api/properties/search/?q=...    full-text search, best match first
+    GET /api/properties/<id>/            one listing
+    GET /api/properties/<id>/price-history/   its price over time
+    GET /api/price-index/?city=...       monthly price index per city
+
+Every endpoint takes ?fields=id,title,price,... (see listings.serializers)
+and the list endpoints take the same filters as the HTML list page. Pages
+are keyset cursors (listings.pagination), so deep pages stay cheap.
+"""
+from django.urls import include, path
+from django.utils.functional import cached_property
+from rest_framework import viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.routers import DefaultRouter
+from rest_framework.utils.urls import replace_query_param
+
+from . import pricing, search
+from .models import Property
+from .pagination import CursorPaginator, InvalidCursor
+from .serializers import (
+    DETAIL_FIELDS, LIST_FIELDS, PropertyFilterSerializer, PropertySerializer, parse_fields, property_queryset,
+)
+
+SORT_OPTIONS = ('price', '-price', 'created_at', '-created_at')
+
+
+class PropertyCursorPagination(BasePagination):
+    """DRF adapter for listings.pagination.CursorPaginator."""
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            size = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            size = self.page_size
+        size = max(1, min(size, self.max_page_size))
+        paginator = CursorPaginator(queryset, size, view.ordering_for(queryset))
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound("Invalid cursor.")
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+            'results': data,
+        })
+
+
+class PropertyViewSet(viewsets.ReadOnlyModelViewSet):
+    permission_classes = [AllowAny]
+    pagination_class = PropertyCursorPagination
+    lookup_value_regex = r'\d+'
+
+    @cached_property
+    def requested_fields(self):
+        default = DETAIL_FIELDS if self.action == 'retrieve' else LIST_FIELDS
+        return parse_fields(self.request.query_params.get('fields'), default)
+
+    def ordering_for(self, queryset):
+        sort = self.request.query_params.get('sort')
+        if sort in SORT_OPTIONS:
+            return sort
+        if 'search_rank' in queryset.query.annotations:
+            return 'search_rank'
+        return '-created_at'
+
+    def get_queryset(self):
+        queryset = Property.objects.all()
+        if self.action != 'retrieve':
+            queryset = self.filter_queryset_params(queryset.filter(status='available'))
+        # The cursor reads the sort column off each row, so it is always loaded
+        sort_column = self.ordering_for(queryset).lstrip('-')
+        always = ('id',) if sort_column == 'search_rank' else ('id', sort_column)
+        return property_queryset(queryset, self.requested_fields, always)
+
+    def filter_queryset_params(self, queryset):
+        params = PropertyFilterSerializer.parse(self.request.query_params)
+        if 'property_type' in params:
+            queryset = queryset.filter(property_type=params['property_type'])
+        if 'city' in params:
+            queryset = queryset.filter(city__iexact=params['city'])
+        if 'min_price' in params:
+            queryset = queryset.filter(price__gte=params['min_price'])
+        if 'max_price' in params:
+            queryset = queryset.filter(price__lte=params['max_price'])
+        if self.action == 'search' and params.get('q'):
+            queryset = search.search(queryset, params['q'])
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('context', self.get_serializer_context())
+        return PropertySerializer(*args, fields=self.requested_fields, **kwargs)
+
+    @action(detail=False)
+    def search(self, request):
+        return self.list(request)
+
+    @action(detail=True, url_path='price-history')
+    def price_history(self, request, pk=None):
+        prop = Property.objects.filter(pk=pk).only('id', 'price', 'currency', 'created_at').first()
+        if prop is None:
+            raise NotFound()
+        return Response({
+            'id': prop.pk,
+            'currency': prop.currency,
+            'points': [{'at': at, 'price': price} for at, price in pricing.series(prop)],
+        })
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def price_index(request):
+    """Chained monthly price index (100 = first month with changes), per city; ?city= narrows it."""
+    index = pricing.city_index(request.query_params.get('city', '').strip() or None)
+    return Response({
+        city: [{'month': month.strftime('%Y-%m'), 'index': level, 'changes': n} for month, level, n in months]
+        for city, months in index.items()
+    })
+
+
+router = DefaultRouter()
+router.register('properties', PropertyViewSet, basename='api-property')
+
+urlpatterns = [
+    path('', include(router.urls)),
+    path('price-index/', price_index, name='api-price-index'),
+]
@@ -0,0 +1,150 @@
+"""
+Server-side marker clustering for the map search.
+
+The viewport is split into standard web-map tiles (z/x/y). Each tile's
+clusters are computed by grouping rows on a zoom-dependent geohash prefix
+in a single aggregate query and cached under a tile key, so panning
+around the map only ever computes tiles it has not seen yet.
+"""
+import math
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import Substr
+
+from core import cache as cache_versions
+from . import geo
+from .models import Property
+
+MAX_ZOOM = 20
+MAX_TILES = 64
+TILE_CACHE_TIMEOUT = 60 * 10
+CLUSTERS_PER_TILE_AXIS = 8  # cluster cells are ~1/8th of a tile wide
+MERCATOR_MAX_LAT = 85.05112878
+
+CACHE_NAMESPACE = 'map'
+
+
+# ==========================================
+# 1. TILE MATHS
+# ==========================================
+
+def lat_lng_to_tile(lat, lng, zoom):
+    lat = max(min(lat, MERCATOR_MAX_LAT), -MERCATOR_MAX_LAT)
+    n = 2 ** zoom
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(x, y, zoom):
+    """Return (south, west, north, east) for a tile."""
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def tiles_for_bbox(south, west, north, east, zoom, limit=None):
+    """
+    The (x, y) tiles covering the box. With a limit, raises ValueError when
+    there would be more tiles than that, before building the list: a
+    world-sized box at zoom 20 covers billions of tiles.
+    """
+    x_min, y_min = lat_lng_to_tile(north, west, zoom)
+    x_max, y_max = lat_lng_to_tile(south, east, zoom)
+    if limit is not None and (x_max - x_min + 1) * (y_max - y_min + 1) > limit:
+        raise ValueError('Viewport spans too many tiles for this zoom level.')
+    return [(x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+
+def cluster_precision(zoom):
+    """Geohash length whose cells are about 1/8th of a tile at this zoom."""
+    target = 360.0 / (2 ** zoom) / CLUSTERS_PER_TILE_AXIS
+    for precision in range(1, geo.GEOHASH_PRECISION + 1):
+        if geo.cell_size(precision)[1] <= target:
+            return precision
+    return geo.GEOHASH_PRECISION
+
+
+# ==========================================
+# 2. CACHED CLUSTERS
+# ==========================================
+
+def bump_version():
+    """Invalidate every cached tile (called when listings change)."""
+    cache_versions.bump_version(CACHE_NAMESPACE)
+
+
+def _tile_key(zoom, x, y, version):
+    return f'map:tile:{version}:{zoom}:{x}:{y}'
+
+
+def get_clusters(south, west, north, east, zoom):
+    """
+    Clusters for every tile touching the box, as a list of dicts with
+    lat/lng/count/min_price/max_price (plus 'id' for single listings).
+    """
+    tiles = tiles_for_bbox(south, west, north, east, zoom, limit=MAX_TILES)
+
+    version = cache_versions.get_version(CACHE_NAMESPACE)
+    keys = {_tile_key(zoom, x, y, version): (x, y) for x, y in tiles}
+    cached = cache.get_many(keys.keys())
+    missing = [keys[k] for k in keys if k not in cached]
+
+    if missing:
+        computed = _compute_tiles(missing, zoom)
+        cache.set_many(
+            {_tile_key(zoom, x, y, version): computed[(x, y)] for x, y in missing},
+            TILE_CACHE_TIMEOUT,
+        )
+        cached.update({_tile_key(zoom, x, y, version): computed[(x, y)] for x, y in missing})
+
+    return [cluster for key in keys for cluster in cached[key]]
+
+
+def _compute_tiles(tiles, zoom):
+    """One grouped query over the union of the tiles, split back per tile."""
+    bounds = [tile_bounds(x, y, zoom) for x, y in tiles]
+    south = min(b[0] for b in bounds)
+    west = min(b[1] for b in bounds)
+    north = max(b[2] for b in bounds)
+    east = max(b[3] for b in bounds)
+
+    # Exact per-tile boxes so rows of already-cached tiles inside the union are skipped
+    in_tiles = Q()
+    for s, w, n, e in bounds:
+        in_tiles |= Q(latitude__range=(s, n), longitude__range=(w, e))
+
+    precision = cluster_precision(zoom)
+    rows = geo.within_bbox(Property.objects.filter(status='available'), south, west, north, east)\
+        .filter(in_tiles)\
+        .annotate(cell=Substr('geohash', 1, precision))\
+        .values('cell')\
+        .annotate(
+            count=Count('id'), min_id=Min('id'),
+            min_price=Min('price'), max_price=Max('price'),
+            lat=Avg('latitude'), lng=Avg('longitude'),
+        )\
+        .order_by()
+
+    result = {tile: [] for tile in tiles}
+    for row in rows:
+        lat, lng = float(row['lat']), float(row['lng'])
+        tile = lat_lng_to_tile(lat, lng, zoom)
+        if tile not in result:
+            # Centroid of a cell straddling several tiles fell outside them; keep it nearby
+            tile = min(result, key=lambda t: (t[0] - tile[0]) ** 2 + (t[1] - tile[1]) ** 2)
+        cluster = {
+            'lat': round(lat, 6),
+            'lng': round(lng, 6),
+            'count': row['count'],
+            'min_price': float(row['min_price']),
+            'max_price': float(row['max_price']),
+        }
+        if row['count'] == 1:
+            cluster['id'] = row['min_id']
+        result[tile].append(cluster)
+    return result
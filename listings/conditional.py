@@ -0,0 +1,88 @@
+"""
+Validators for conditional GET on the public listing pages.
+
+property_list and property_detail are wrapped in django's condition()
+decorator with the functions below, so a client holding a current copy
+gets a 304 before any template work. The validators are cheap:
+
+* Property.updated_at, which image changes also bump (see touch()),
+* the newest updated_at over all listings (indexed) plus a version bumped
+  on deletes, since both pages show other listings (grid, similar homes),
+* who is asking: user id and a fingerprint of their favorites, as the
+  hearts and prefilled forms differ per user.
+
+Anonymous list pages also get Last-Modified. Detail pages don't: their
+viewing slots change without any timestamp moving. Pages carrying a flash
+message are never answered with a 304.
+"""
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from core import cache as cache_versions
+from .models import Favorite, Property
+
+CACHE_NAMESPACE = 'listings'
+
+
+def touch(*property_ids):
+    """Mark listings as changed when something shown with them (images, renditions) changes."""
+    Property.objects.filter(pk__in=property_ids).update(updated_at=timezone.now())
+
+
+def bump():
+    """Record a change updated_at can't show, i.e. a deleted listing."""
+    cache_versions.bump_version(CACHE_NAMESPACE)
+
+
+def catalogue_stamp(request=None):
+    """(delete version, newest updated_at): changes whenever any listing does."""
+    if request is None:
+        newest = Property.objects.aggregate(newest=Max('updated_at'))['newest']
+        return cache_versions.get_version(CACHE_NAMESPACE), newest
+    # Computed once per request; the ETag and Last-Modified functions and the facets all need it
+    if not hasattr(request, '_catalogue_stamp'):
+        request._catalogue_stamp = catalogue_stamp()
+    return request._catalogue_stamp
+
+
+def _viewer(request):
+    if not request.user.is_authenticated:
+        return 'anon'
+    favorites = Favorite.objects.filter(user=request.user).aggregate(n=Count('id'), last=Max('id'))
+    return request.user.pk, favorites['n'], favorites['last']
+
+
+def _etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _has_messages(request):
+    return len(get_messages(request)) > 0
+
+
+def list_etag(request, *args, **kwargs):
+    if _has_messages(request):
+        return None
+    return _etag('list', sorted(request.GET.lists()), catalogue_stamp(request), _viewer(request))
+
+
+def list_last_modified(request, *args, **kwargs):
+    # Only anonymous pages are the same for everyone; logged-in users revalidate by ETag
+    if request.user.is_authenticated or _has_messages(request):
+        return None
+    return catalogue_stamp(request)[1]
+
+
+def detail_etag(request, pk):
+    if request.method != 'GET' or _has_messages(request):
+        return None
+    updated_at = Property.objects.filter(pk=pk).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None  # let the view 404
+    # Suggested viewing slots change with bookings and drop off as the day goes on
+    slots = cache_versions.get_version(f'availability:{pk}'), timezone.now().strftime('%Y%m%d%H')
+    return _etag('detail', pk, updated_at, catalogue_stamp(request), _viewer(request), slots)
+
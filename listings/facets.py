@@ -0,0 +1,38 @@
+"""
+Sidebar filter facets for the listing pages: the cities and property types
+(with counts) among available listings.
+
+One GROUP BY query, cached under the catalogue stamp (see
+conditional.catalogue_stamp), so it is only recomputed after a listing
+is edited, added or deleted. property_list already computes the stamp for
+its ETag, so a cache hit costs no query at all.
+"""
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Property
+from . import conditional
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def sidebar(request=None):
+    """{'cities': [...], 'property_types': [(code, name, count), ...]}"""
+    version, newest = conditional.catalogue_stamp(request)
+    key = f'listings:facets:{version}:{newest.timestamp() if newest else 0}'
+    return cache.get_or_set(key, _compute, CACHE_TIMEOUT)
+
+
+def _compute():
+    rows = Property.objects.filter(status='available').order_by()\
+        .values_list('city', 'property_type').annotate(n=Count('id'))
+    cities, types = set(), Counter()
+    for city, property_type, n in rows:
+        cities.add(city)
+        types[property_type] += n
+    return {
+        'cities': sorted(cities),
+        'property_types': [(code, name, types[code]) for code, name in Property.PROPERTY_TYPES],
+    }
@@ -0,0 +1,162 @@
+"""
+Versioned HTML fragment cache for property cards and detail sections.
+
+Cards (list, search and favorites grids) and the static parts of the
+detail page look the same to every visitor, so their rendered HTML is
+cached per listing. The key carries the listing's updated_at as its
+version: every Property save moves it, and image/rendition changes bump it
+through conditional.touch(), so an edited listing simply stops matching
+its old entries, which then age out. Nothing is ever deleted by hand.
+
+Anything per-user (favorite hearts, remove buttons) must stay OUTSIDE the
+cached fragment; the templates render it around the card.
+
+TEMPLATE_VERSION is part of every key. Bump it when a cached template
+changes so a deploy doesn't keep serving the old markup.
+
+Hits and misses are counted in process memory and added to counters in
+the shared cache every FLUSH_INTERVAL seconds (by a timer thread, as
+listings.tracking does) and at exit, so rendering a page never writes to
+the file cache just to count. `manage.py fragment_stats` shows them.
+"""
+import atexit
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+TEMPLATE_VERSION = 1
+TIMEOUT = 60 * 60 * 24
+CARD_TEMPLATE = 'properties/partials/property_card.html'
+SECTION_TEMPLATES = {
+    'gallery': 'properties/partials/detail_gallery.html',
+    'body': 'properties/partials/detail_body.html',
+}
+
+_STATS_KEYS = {'hits': 'fragments:hits', 'misses': 'fragments:misses'}
+FLUSH_INTERVAL = getattr(settings, 'FRAGMENT_STATS_FLUSH_INTERVAL', 30)
+
+_lock = threading.Lock()
+_counts = Counter()
+_timer = None
+
+
+def key(name, obj):
+    version = obj.updated_at.timestamp() if obj.updated_at else 0
+    return f'fragment:{TEMPLATE_VERSION}:{name}:{obj.pk}:{version}'
+
+
+def get_or_render(name, obj, render):
+    """One fragment: the cached HTML, or render() stored for next time."""
+    html = cache.get(key(name, obj))
+    if html is None:
+        html = render()
+        cache.set(key(name, obj), html, TIMEOUT)
+        record(misses=1)
+    else:
+        record(hits=1)
+    return mark_safe(html)
+
+
+def load_cards(properties):
+    """
+    Fetch the cards for a whole page in one round trip, rendering and
+    storing the misses together. Each property gets the HTML as .card_html.
+    """
+    properties = list(properties)
+    keys = {key('card', prop): prop for prop in properties}
+    found = cache.get_many(keys)
+    rendered = {}
+    for cache_key, prop in keys.items():
+        html = found.get(cache_key)
+        if html is None:
+            html = rendered[cache_key] = render_to_string(CARD_TEMPLATE, {'property': prop})
+        prop.card_html = mark_safe(html)
+    if rendered:
+        cache.set_many(rendered, TIMEOUT)
+    record(hits=len(keys) - len(rendered), misses=len(rendered))
+    return properties
+
+
+def card(prop):
+    if hasattr(prop, 'card_html'):
+        return prop.card_html
+    return get_or_render('card', prop, lambda: render_to_string(CARD_TEMPLATE, {'property': prop}))
+
+
+def section(name, prop):
+    """One of the static detail page sections (SECTION_TEMPLATES)."""
+    return get_or_render(
+        f'detail-{name}', prop, lambda: render_to_string(SECTION_TEMPLATES[name], {'property': prop}),
+    )
+
+
+# ==========================================
+# HIT / MISS COUNTERS
+# ==========================================
+
+def record(hits=0, misses=0):
+    with _lock:
+        _counts['hits'] += hits
+        _counts['misses'] += misses
+        _start_timer()
+
+
+def _start_timer():
+    # Called with _lock held
+    global _timer
+    if FLUSH_INTERVAL and _timer is None:
+        _timer = threading.Timer(FLUSH_INTERVAL, _flush_on_timer)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_on_timer():
+    global _timer
+    with _lock:
+        _timer = None
+    flush()
+
+
+def flush():
+    """Add this process's counts to the shared counters."""
+    global _counts
+    with _lock:
+        counts, _counts = _counts, Counter()
+    for name, n in counts.items():
+        if not n:
+            continue
+        cache.add(_STATS_KEYS[name], 0, None)
+        try:
+            cache.incr(_STATS_KEYS[name], n)
+        except ValueError:
+            # Evicted between add() and incr(); losing a few counts is fine
+            pass
+
+
+def stats():
+    """The shared counters plus whatever this process hasn't flushed yet."""
+    found = cache.get_many(_STATS_KEYS.values())
+    with _lock:
+        counts = {name: found.get(cache_key, 0) + _counts[name] for name, cache_key in _STATS_KEYS.items()}
+    total = counts['hits'] + counts['misses']
+    counts['hit_rate'] = counts['hits'] / total if total else None
+    return counts
+
+
+def discard():
+    """Drop the unflushed counts (tests)."""
+    global _counts
+    with _lock:
+        _counts = Counter()
+
+
+def reset_stats():
+    discard()
+    cache.delete_many(_STATS_KEYS.values())
+
+
+atexit.register(flush)
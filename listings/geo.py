@@ -0,0 +1,220 @@
+"""
+Geospatial helpers for the "nearby" and map searches.
+
+Every Property with coordinates carries a geohash cell key (see
+Property.save). Radius, nearest-neighbour and bounding-box searches first
+prune candidates to the handful of cells covering the search area using
+range scans on the indexed geohash column, then refine the survivors
+(exact haversine distance, exact box bounds) inside the database.
+"""
+import math
+
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_MILE = 1.609344
+GEOHASH_PRECISION = 9  # ~5m cells, fine enough for any search radius we serve
+MAX_SEARCH_RADIUS_KM = 500
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_BASE32_INDEX = {c: i for i, c in enumerate(_BASE32)}
+
+
+# ==========================================
+# 1. GEOHASH ENCODING
+# ==========================================
+
+def encode(lat, lng, precision=GEOHASH_PRECISION):
+    """Encode a coordinate into a geohash string of the given length."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def decode_bounds(geohash):
+    """Return (lat_lo, lat_hi, lng_lo, lng_hi) for a geohash cell."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    even = True
+    for char in geohash:
+        value = _BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lng_lo + lng_hi) / 2
+                if bit:
+                    lng_lo = mid
+                else:
+                    lng_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lng_lo, lng_hi
+
+
+def cell_size(precision):
+    """Return (lat_degrees, lng_degrees) spanned by a cell of this precision."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def covering_cells(lat, lng, radius_km):
+    """
+    Return the geohash prefixes whose cells together cover the circle.
+
+    Picks the finest precision whose cells are at least as large as the
+    radius, so the centre cell plus its 8 neighbours always contain it.
+    Close to a pole no precision is wide enough; the whole latitude band
+    the circle touches is covered instead.
+    """
+    validate_radius(radius_km)
+    lat_delta, lng_delta = _degree_deltas(lat, radius_km)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lng_size = cell_size(precision)
+        if lat_size >= lat_delta and lng_size >= lng_delta:
+            break
+    else:
+        return bbox_cells(max(lat - lat_delta, -90.0), -180.0, min(lat + lat_delta, 90.0), 180.0)
+
+    lat_lo, lat_hi, lng_lo, lng_hi = decode_bounds(encode(lat, lng, precision))
+    lat_size, lng_size = lat_hi - lat_lo, lng_hi - lng_lo
+    center_lat, center_lng = (lat_lo + lat_hi) / 2, (lng_lo + lng_hi) / 2
+
+    cells = set()
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            cell_lat = center_lat + dy * lat_size
+            if not -90 <= cell_lat <= 90:
+                continue
+            cell_lng = (center_lng + dx * lng_size + 180) % 360 - 180
+            cells.add(encode(cell_lat, cell_lng, precision))
+    return sorted(cells)
+
+
+def bbox_cells(south, west, north, east, max_cells=16):
+    """
+    Return the geohash prefixes covering a lat/lng bounding box, using
+    the finest precision that needs no more than max_cells cells.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lng_size = cell_size(precision)
+        rows = math.floor((north + 90) / lat_size) - math.floor((south + 90) / lat_size) + 1
+        cols = math.floor((east + 180) / lng_size) - math.floor((west + 180) / lng_size) + 1
+        if rows * cols <= max_cells or precision == 1:
+            break
+
+    lat_lo, _, lng_lo, _ = decode_bounds(encode(south, west, precision))
+    cells = set()
+    for row in range(rows):
+        cell_lat = min(lat_lo + (row + 0.5) * lat_size, 90.0)
+        for col in range(cols):
+            cell_lng = min(lng_lo + (col + 0.5) * lng_size, 180.0)
+            cells.add(encode(cell_lat, cell_lng, precision))
+    return sorted(cells)
+
+
+def _prefix_filter(prefixes):
+    condition = Q()
+    for prefix in prefixes:
+        # A range scan on the indexed column; LIKE 'abc%' can't use the index on SQLite.
+        condition |= Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+    return condition
+
+
+def _degree_deltas(lat, radius_km):
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    # A degree of longitude is narrowest at the circle's poleward edge, so measure it there;
+    # a circle reaching the pole spans every longitude
+    cos_edge = math.cos(math.radians(min(abs(lat) + lat_delta, 90.0)))
+    if cos_edge < 1e-6:
+        return lat_delta, 180.0
+    lng_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_edge)), 180.0)
+    return lat_delta, lng_delta
+
+
+def validate_radius(radius_km):
+    """Raise ValueError unless the radius is a finite, positive distance."""
+    if not (math.isfinite(radius_km) and radius_km > 0):
+        raise ValueError(f"Search radius must be finite and positive, not {radius_km!r}")
+    return radius_km
+
+
+# ==========================================
+# 2. QUERIES
+# ==========================================
+
+def distance_km_expression(lat, lng):
+    """Haversine distance (km) from the point to each row, evaluated in SQL."""
+    row_lat = Radians(Cast('latitude', FloatField()))
+    row_lng = Radians(Cast('longitude', FloatField()))
+    half_dlat = (row_lat - Value(math.radians(lat))) / Value(2.0)
+    half_dlng = (row_lng - Value(math.radians(lng))) / Value(2.0)
+    a = Power(Sin(half_dlat), 2) + Value(math.cos(math.radians(lat))) * Cos(row_lat) * Power(Sin(half_dlng), 2)
+    return Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a))
+
+
+def cell_filter(lat, lng, radius_km):
+    """Index-friendly Q object restricting rows to the covering cells."""
+    return _prefix_filter(covering_cells(lat, lng, radius_km))
+
+
+def within_bbox(queryset, south, west, north, east):
+    """Rows whose coordinates fall inside the box, pruned by geohash cell first."""
+    return queryset.filter(_prefix_filter(bbox_cells(south, west, north, east)))\
+        .filter(latitude__range=(south, north), longitude__range=(west, east))
+
+
+def within_radius(queryset, lat, lng, radius_km):
+    """Rows within radius_km of the point, nearest first, annotated with distance_km."""
+    radius_km = min(validate_radius(radius_km), MAX_SEARCH_RADIUS_KM)
+    lat_delta, _ = _degree_deltas(lat, radius_km)
+    return queryset.filter(cell_filter(lat, lng, radius_km))\
+        .filter(latitude__range=(lat - lat_delta, lat + lat_delta))\
+        .annotate(distance_km=distance_km_expression(lat, lng))\
+        .filter(distance_km__lte=radius_km)\
+        .order_by('distance_km', 'pk')
+
+
+def nearest(queryset, lat, lng, k, start_radius_km=2):
+    """
+    The k rows nearest to the point, annotated with distance_km.
+
+    Grows the search radius geometrically; each step is an exact radius
+    search, so the first step that yields k rows holds the true k nearest.
+    """
+    radius_km = start_radius_km
+    while True:
+        results = list(within_radius(queryset, lat, lng, radius_km)[:k])
+        if len(results) >= k or radius_km >= MAX_SEARCH_RADIUS_KM:
+            return results
+        radius_km = min(radius_km * 4, MAX_SEARCH_RADIUS_KM)
@@ -0,0 +1,412 @@
+"""
+Bulk listing import from CSV or JSONL feeds (manage.py import_listings).
+
+Columns are the Property form fields plus external_ref, owner (username),
+agent_email, latitude, longitude and images; JSONL uses the same keys.
+The feed is read as a stream and handled in batches of batch_size rows, so
+memory stays flat whatever the file size. For each batch:
+
+* every row is validated with PropertyCreateForm, the same rules as the
+  add-listing form. Owners and agents are looked up once per batch, not
+  once per row.
+* rows whose external_ref is already known are compared with the stored
+  listing, and only the columns that differ are written (bulk_update, plus
+  a PricingHistory row when the price moved). Only the columns the row
+  actually carries are compared: a column missing from the feed (or a
+  JSONL null) keeps the stored value instead of falling back to the model
+  default. Re-importing an unchanged feed writes nothing.
+* the rest are inserted with bulk_create, together with a default
+  BookingSettings row and their images. Images are fetched and stored
+  before the batch's transaction opens, so a slow download never holds
+  the database write lock; files of a batch that fails are deleted again.
+
+bulk_create/bulk_update skip save() and the signals, so the importer does
+their work itself: geohash and updated_at per row, then one pass at the
+end over the derived data (map tiles, analytics, KPIs). Like the signals,
+it only recomputes the market stats of the groups the import touched and
+queues the touched listings for the next similar-listings refresh. The
+FTS search index follows by trigger. Image renditions are left to
+`manage.py generate_renditions`.
+
+Images are local paths (relative to images_dir) or http(s) URLs,
+separated by "|" in CSV and a list in JSONL. A feed is untrusted input: a
+local path that resolves outside images_dir rejects the row, downloads
+from hosts that aren't public are refused, and anything over
+MAX_IMAGE_BYTES or that PIL can't read as an image is skipped.
+Downloading is by far the slowest part of an import; skip it with
+images=False.
+"""
+import csv
+import ipaddress
+import json
+import os
+import socket
+import urllib.parse
+import urllib.request
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from io import BytesIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.utils import timezone
+from PIL import Image
+
+from booking.models import Agent, BookingSettings
+from core import cache as cache_versions
+from core import kpi
+from .forms import PropertyCreateForm
+from .models import PricingHistory, Property, PropertyImage
+from . import analytics, clustering, market, pricing, similarity
+
+DEFAULT_BATCH_SIZE = 1000
+DOWNLOAD_TIMEOUT = 20
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+IMAGE_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp', 'GIF': '.gif'}
+# bulk_update builds a CASE per column and row, so keep its batches small
+UPDATE_BATCH_SIZE = 200
+TRUE_STRINGS = {'1', 'true', 't', 'yes', 'y', 'on'}
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    images: int = 0
+    errors: list = field(default_factory=list)  # (line, message)
+
+
+def read_rows(path, fmt=None):
+    """Yield (line number, dict) from a CSV or JSONL file without loading it whole."""
+    fmt = fmt or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if fmt == 'csv':
+            reader = csv.DictReader(handle)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_no, line in enumerate(handle, 1):
+                if line.strip():
+                    yield line_no, _json_row(line)
+
+
+def _json_row(line):
+    # A line that isn't a JSON object comes back as the ValueError the importer records for it
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return ValueError(f"invalid JSON: {e}")
+    if not isinstance(row, dict):
+        return ValueError(f"expected a JSON object, got {type(row).__name__}")
+    return row
+
+
+def _batches(rows, size):
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ==========================================
+# ROW VALIDATION
+# ==========================================
+
+_FORM_FIELDS = PropertyCreateForm.base_fields
+
+# What a re-import may change on a known listing: every imported column, but never
+# the owner, images or booking setup. Each row only touches the ones it carries (_columns).
+UPDATE_COLUMNS = tuple(f for f in _FORM_FIELDS if f != 'agent') + ('latitude', 'longitude', 'geohash', 'agent_id')
+
+
+def _present(row, name):
+    # CSV cells of columns the header lacks come back as None, like JSONL nulls
+    return row.get(name) is not None
+
+
+def _columns(row):
+    """The UPDATE_COLUMNS a feed row carries; a re-import compares and writes only these."""
+    columns = [name for name in _FORM_FIELDS if name != 'agent' and _present(row, name)]
+    if _present(row, 'latitude') or _present(row, 'longitude'):
+        columns += ['latitude', 'longitude', 'geohash']
+    if _present(row, 'agent_email'):
+        columns.append('agent_id')
+    return columns
+
+
+def _form_data(row, stored=None):
+    """
+    Feed row -> form data, feed booleans normalized. Columns missing from the
+    row take the stored listing's value when there is one (`stored`, a
+    values() dict), otherwise the model default.
+    """
+    data = {}
+    for name, form_field in _FORM_FIELDS.items():
+        value = row.get(name)
+        model_field = Property._meta.get_field(name)
+        if stored is not None and value is None and name in stored:
+            data[name] = stored[name]
+        elif isinstance(model_field, models.BooleanField):
+            data[name] = value if isinstance(value, bool) else str(value or '').strip().lower() in TRUE_STRINGS
+        elif value in (None, '') and model_field.has_default():
+            data[name] = model_field.get_default()
+        elif value is not None:
+            data[name] = value
+    data.pop('agent', None)  # resolved per batch from agent_email
+    return data
+
+
+def _ref(row):
+    return str(row['external_ref']).strip() if row.get('external_ref') else None
+
+
+def _coordinate(value, limit):
+    if value in (None, ''):
+        return None
+    try:
+        number = Decimal(str(value)).quantize(Decimal('0.000001'))
+    except InvalidOperation:
+        raise ValueError(f"not a number: {value!r}")
+    if not -limit <= number <= limit:
+        raise ValueError(f"out of range: {value}")
+    return number
+
+
+def _image_list(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split('|')
+    return [str(v).strip() for v in value if v and str(v).strip()]
+
+
+def _is_url(source):
+    return source.startswith(('http://', 'https://'))
+
+
+def _check_public_host(url):
+    """Refuse URLs whose host resolves to a loopback, private or otherwise internal address."""
+    host = urllib.parse.urlsplit(url).hostname
+    if not host:
+        raise ValueError(f"no host in {url!r}")
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+    except socket.gaierror as e:
+        raise ValueError(f"can't resolve {host}: {e}")
+    if not all(ipaddress.ip_address(a.split('%')[0]).is_global for a in addresses):
+        raise ValueError(f"{host} is not a public host")
+
+
+class _CheckedRedirects(urllib.request.HTTPRedirectHandler):
+    # A public URL may not redirect the download to an internal one
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _check_public_host(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+_opener = urllib.request.build_opener(_CheckedRedirects)
+
+
+# ==========================================
+# IMPORT
+# ==========================================
+
+class Importer:
+    def __init__(self, default_owner, batch_size=DEFAULT_BATCH_SIZE, images=True, images_dir='.',
+                 booking_settings=True, dry_run=False, log=None):
+        self.default_owner = default_owner
+        self.batch_size = batch_size
+        self.images = images
+        self.images_dir = images_dir
+        self.booking_settings = booking_settings
+        self.dry_run = dry_run
+        self.log = log or (lambda message: None)
+        self.result = ImportResult()
+        self._image_field = PropertyImage._meta.get_field('image')
+        self._images_root = os.path.realpath(images_dir)
+        # Listings whose derived data the final pass refreshes (_refresh_derived)
+        self._similar_stale, self._market_groups = set(), set()
+
+    def run(self, rows):
+        for number, batch in enumerate(_batches(rows, self.batch_size), 1):
+            self._import_batch(batch)
+            self.log(f"Batch {number}: {self.result.created} created, {self.result.updated} updated, "
+                     f"{len(self.result.errors)} rejected so far.")
+        if not self.dry_run and (self.result.created or self.result.updated):
+            self._refresh_derived()
+        return self.result
+
+    def _import_batch(self, batch):
+        for line, row in batch:
+            if isinstance(row, ValueError):
+                self.result.errors.append((line, str(row)))
+        batch = [(line, row) for line, row in batch if not isinstance(row, ValueError)]
+        owners = {o.username: o for o in User.objects.filter(
+            username__in={str(row['owner']) for _, row in batch if row.get('owner')})}
+        agents = {a.email: a.pk for a in Agent.objects.filter(
+            email__in={str(row['agent_email']) for _, row in batch if row.get('agent_email')})}
+        existing = {
+            row['external_ref']: row for row in
+            Property.objects.filter(external_ref__in={_ref(row) for _, row in batch if _ref(row)})
+            .values('external_ref', 'id', *UPDATE_COLUMNS)
+        }
+
+        # Last row wins when a feed repeats a reference inside one batch
+        valid = {}
+        for line, row in batch:
+            try:
+                prop, images = self._build(row, owners, agents, existing.get(_ref(row)))
+            except ValueError as e:
+                self.result.errors.append((line, str(e)))
+                continue
+            valid[prop.external_ref or f'line:{line}'] = (prop, images)
+
+        new = [(p, images) for p, images in valid.values() if p.external_ref not in existing]
+        updates = []
+        for prop, _ in valid.values():
+            if prop.external_ref in existing:
+                stored = existing[prop.external_ref]
+                prop.pk = stored['id']
+                changed = [c for c in prop._columns if getattr(prop, c) != stored[c]]
+                if changed:
+                    updates.append((prop, changed, stored['price'], tuple(stored[f] for f in market.GROUP_FIELDS)))
+        self.result.unchanged += len(valid) - len(new) - len(updates)
+
+        if self.dry_run:
+            self.result.created += len(new)
+            self.result.updated += len(updates)
+            return
+        # Downloads happen outside the transaction: it holds the write lock from the first INSERT
+        images = [[name for name in map(self._store_image, sources) if name] for _, sources in new]
+        try:
+            with transaction.atomic():
+                self._insert([p for p, _ in new], images)
+                self._update(updates)
+        except Exception:
+            for name in (name for names in images for name in names):
+                default_storage.delete(name)
+            raise
+
+    def _build(self, row, owners, agents, stored=None):
+        """An unsaved Property for the row; `stored` is the existing listing's values() on a re-import."""
+        form = PropertyCreateForm(data=_form_data(row, stored))
+        if not form.is_valid():
+            raise ValueError('; '.join(f"{name}: {' '.join(errors)}" for name, errors in form.errors.items()))
+        prop = form.save(commit=False)
+
+        prop.owner = owners.get(str(row.get('owner') or '')) or self.default_owner
+        if row.get('owner') and str(row['owner']) not in owners:
+            raise ValueError(f"owner: unknown user {row['owner']!r}")
+        if row.get('agent_email'):
+            prop.agent_id = agents.get(str(row['agent_email']))
+            if prop.agent_id is None:
+                raise ValueError(f"agent_email: no agent with email {row['agent_email']!r}")
+        if stored is not None and not (_present(row, 'latitude') or _present(row, 'longitude')):
+            prop.latitude, prop.longitude = stored['latitude'], stored['longitude']
+        else:
+            prop.latitude = _coordinate(row.get('latitude'), 90)
+            prop.longitude = _coordinate(row.get('longitude'), 180)
+        prop._columns = _columns(row)
+        prop.external_ref = _ref(row)
+        # save() isn't called, so do its work here
+        prop.geohash = prop.compute_geohash()
+        if not self.images:
+            return prop, []
+        return prop, [s if _is_url(s) else self._local_path(s) for s in _image_list(row.get('images'))]
+
+    def _local_path(self, source):
+        # realpath() resolves "..", absolute paths and symlinks before the check
+        path = os.path.realpath(os.path.join(self._images_root, source))
+        if os.path.commonpath([path, self._images_root]) != self._images_root:
+            raise ValueError(f"images: {source!r} is outside the images directory")
+        return path
+
+    def _insert(self, new, stored_images):
+        """new: unsaved Properties; stored_images: per property, the names _store_image() saved."""
+        if not new:
+            return
+        created = Property.objects.bulk_create(new, batch_size=self.batch_size)
+        self.result.created += len(created)
+        self._similar_stale.update(p.pk for p in created)
+        self._market_groups.update(market.group_of(p) for p in created)
+
+        if self.booking_settings:
+            BookingSettings.objects.bulk_create(
+                [BookingSettings(listing=p) for p in created], batch_size=self.batch_size, ignore_conflicts=True,
+            )
+
+        images = [
+            PropertyImage(property=prop, image=name, is_primary=position == 0)
+            for prop, names in zip(created, stored_images) for position, name in enumerate(names)
+        ]
+        if images:
+            images = PropertyImage.objects.bulk_create(images, batch_size=self.batch_size)
+            self.result.images += len(images)
+            primary = [Property(pk=img.property_id, primary_image=img) for img in images if img.is_primary]
+            Property.objects.bulk_update(primary, ['primary_image'], batch_size=self.batch_size)
+
+    def _update(self, updates):
+        """updates: [(prop, changed columns, stored price, stored group)]. Only the changed columns are written."""
+        if not updates:
+            return
+        now = timezone.now()
+        columns, history = {'updated_at'}, []
+        for prop, changed, old_price, old_group in updates:
+            prop.updated_at = now
+            columns.update(changed)
+            # The same fields the post_save signals watch
+            if set(changed) & set(similarity.FEATURE_FIELDS + ('status',)):
+                self._similar_stale.add(prop.pk)
+            if set(changed) & set(market.TRIGGER_FIELDS):
+                self._market_groups.update([market.group_of(prop), old_group])
+            if 'price' in changed:
+                history.append(PricingHistory(property_id=prop.pk, old_price=old_price, new_price=prop.price,
+                                              reason='Feed import'))
+        Property.objects.bulk_update([p for p, _, _, _ in updates], sorted(columns), batch_size=UPDATE_BATCH_SIZE)
+        PricingHistory.objects.bulk_create(history, batch_size=self.batch_size)
+        self.result.updated += len(updates)
+
+    def _store_image(self, source):
+        """
+        Copy one image (a URL, or a path _build() already checked) into media
+        storage; returns the stored name, or None if it is skipped.
+        """
+        try:
+            if _is_url(source):
+                _check_public_host(source)
+                with _opener.open(source, timeout=DOWNLOAD_TIMEOUT) as response:
+                    content = response.read(MAX_IMAGE_BYTES + 1)
+            else:
+                with open(source, 'rb') as handle:
+                    content = handle.read(MAX_IMAGE_BYTES + 1)
+            if len(content) > MAX_IMAGE_BYTES:
+                raise ValueError(f"larger than {MAX_IMAGE_BYTES} bytes")
+            with Image.open(BytesIO(content)) as image:
+                image.verify()
+                extension = IMAGE_EXTENSIONS.get(image.format)
+            if extension is None:
+                raise ValueError(f"unsupported image format {image.format}")
+        except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+            # SyntaxError is what some of PIL's format plugins raise for a corrupt file
+            self.log(f"  image {source}: {e}")
+            return None
+        # The stored name's extension follows the content, not the feed
+        stem = os.path.splitext(os.path.basename(source.split('?')[0]))[0] or 'image'
+        name = self._image_field.generate_filename(None, stem + extension)
+        return default_storage.save(name, ContentFile(content))
+
+    def _refresh_derived(self):
+        # What the post_save signals would have done, once for the whole import
+        cache_versions.bump_version(pricing.CACHE_NAMESPACE)
+        clustering.bump_version()
+        analytics.invalidate()
+        kpi.refresh()
+        market.recompute(self._market_groups)
+        similarity.mark_stale(self._similar_stale)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from listings import pricing
+
+
+class Command(BaseCommand):
+    help = "Merge price changes older than the retention window into one row per listing and month."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=pricing.RETENTION_DAYS,
+                            help="Keep every change from this many days back.")
+
+    def handle(self, *args, **options):
+        removed = pricing.compact(options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} price history rows older than {options['days']} days."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from listings import fragments
+
+
+class Command(BaseCommand):
+    help = "Show hit/miss counts for the property card and detail fragment cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters after printing them.")
+
+    def handle(self, *args, **options):
+        counts = fragments.stats()
+        rate = f"{counts['hit_rate']:.1%}" if counts['hit_rate'] is not None else 'n/a'
+        self.stdout.write(f"Fragment cache: {counts['hits']} hits, {counts['misses']} misses, hit rate {rate}.")
+        if options['reset']:
+            fragments.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset."))
@@ -0,0 +1,55 @@
+import os
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from listings import conditional, renditions
+from listings.models import PropertyImage
+
+
+class Command(BaseCommand):
+    help = "Backfill thumb/card/detail JPEG and WebP renditions for existing property images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes (1 runs inline).")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="How many finished images to flag as ready per UPDATE.")
+        parser.add_argument('--force', action='store_true',
+                            help="Regenerate images that already have renditions.")
+
+    def handle(self, *args, **options):
+        queryset = PropertyImage.objects.exclude(image='')
+        if not options['force']:
+            queryset = queryset.filter(renditions_ready=False)
+        rows = list(queryset.order_by('pk').values_list('pk', 'image'))
+        self.stdout.write(f"Generating renditions for {len(rows)} images with {options['workers']} workers...")
+
+        # Workers never touch the database, but don't hand them our open connection
+        connections.close_all()
+
+        pks_by_name = defaultdict(list)
+        for pk, name in rows:
+            pks_by_name[name].append(pk)
+        done = failed = 0
+        ready = []
+        for name, error in renditions.generate_many(list(pks_by_name), workers=options['workers']):
+            if error:
+                failed += 1
+                self.stderr.write(f"  {name}: {error}")
+            else:
+                ready.extend(pks_by_name[name])
+            if len(ready) >= options['batch_size']:
+                done += self._mark_ready(ready)
+                self.stdout.write(f"  {done + failed}/{len(rows)}")
+        done += self._mark_ready(ready)
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {done} generated, {failed} failed."))
+
+    def _mark_ready(self, pks):
+        count = PropertyImage.objects.filter(pk__in=pks).update(renditions_ready=True)
+        # New image URLs, so pages must stop answering 304
+        conditional.touch(*PropertyImage.objects.filter(pk__in=pks).values_list('property_id', flat=True).distinct())
+        pks.clear()
+        return count
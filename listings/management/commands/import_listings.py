@@ -0,0 +1,53 @@
+import os
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from listings import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Import listings from a CSV or JSONL feed in batches. Rows with a known "
+        "external_ref update that listing; the rest are created."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Default: from the file extension.")
+        parser.add_argument('--owner', required=True, help="Username owning rows without an owner column.")
+        parser.add_argument('--batch-size', type=int, default=importer.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--images-dir', default=None, help="Base for relative image paths (default: the feed's folder).")
+        parser.add_argument('--skip-images', action='store_true', help="Don't fetch images.")
+        parser.add_argument('--no-booking', action='store_true', help="Don't create BookingSettings for new listings.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and count only; write nothing.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"No such file: {path}")
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['owner']!r}")
+
+        run = importer.Importer(
+            owner,
+            batch_size=options['batch_size'],
+            images=not options['skip_images'],
+            images_dir=options['images_dir'] or os.path.dirname(os.path.abspath(path)),
+            booking_settings=not options['no_booking'],
+            dry_run=options['dry_run'],
+            log=self.stdout.write if options['verbosity'] > 1 else None,
+        )
+        result = run.run(importer.read_rows(path, options['format']))
+
+        for line, message in result.errors[:50]:
+            self.stderr.write(f"line {line}: {message}")
+        if len(result.errors) > 50:
+            self.stderr.write(f"... and {len(result.errors) - 50} more rejected rows")
+        prefix = "Dry run: would have " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{result.created} created, {result.updated} updated, {result.unchanged} unchanged, "
+            f"{result.images} images, {len(result.errors)} rejected."
+        ))
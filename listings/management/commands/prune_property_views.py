@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from listings import tracking
+from listings.models import PropertyView
+
+
+class Command(BaseCommand):
+    help = "Flush buffered views and delete raw PropertyView rows older than the retention window. Daily counters are kept."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help="Keep raw view rows for this many days.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        tracking.flush()
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted = 0
+        while True:
+            # Small chunks keep each write transaction (and SQLite's lock) short
+            ids = list(PropertyView.objects.filter(viewed_at__lt=cutoff)
+                       .values_list('pk', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            deleted += PropertyView.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} view rows older than {options['days']} days."))
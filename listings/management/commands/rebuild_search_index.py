@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from listings import search
+
+
+class Command(BaseCommand):
+    help = "Create (if needed) and repopulate the FTS5 property search index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help="Database alias to rebuild.")
+        parser.add_argument('--recreate', action='store_true',
+                            help="Drop the index and triggers first, e.g. after changing tokenizer settings.")
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError("Full-text index is SQLite-only; other backends use the icontains fallback.")
+
+        if options['recreate']:
+            search.drop_index(connection)
+        if not search.create_index(connection):
+            raise CommandError("This SQLite build has no FTS5 support; search will use the icontains fallback.")
+
+        search.rebuild_index(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.FTS_TABLE}')
+            count = cursor.fetchone()[0]
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt ({count} properties)."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from listings import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every listing's 'you might also like' neighbours. Run nightly and after bulk imports; "
+        "with --stale, every few minutes, to catch up on edited listings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale', action='store_true', help="Only the listings queued since the last run.")
+
+    def handle(self, *args, **options):
+        if options['stale']:
+            count = similarity.refresh_stale()
+            self.stdout.write(self.style.SUCCESS(f"Recomputed {count} neighbour lists."))
+            return
+        count = similarity.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Stored up to {similarity.K} neighbours for {count} listings."))
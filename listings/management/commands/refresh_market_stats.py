@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from listings import market
+
+
+class Command(BaseCommand):
+    help = "Recompute every row of the city market statistics table. Signals keep it current between runs."
+
+    def handle(self, *args, **options):
+        count = market.recompute()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {count} market groups."))
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.utils import timezone
+
+from booking import availability
+from listings import analytics, facets, fragments
+from listings.models import Property
+from listings.pagination import cached_count
+from listings.views import PAGE_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the cache after a deploy: the first listing pages, the sidebar facets, "
+        "the detail sections and viewing slots of the most viewed listings, and the "
+        "admin sales summary."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=3, help="Listing pages (default sort) to warm.")
+        parser.add_argument('--details', type=int, default=50, help="Most viewed listings whose detail page to warm.")
+        parser.add_argument('--days', type=int, default=7, help="Window for 'most viewed'.")
+
+    def handle(self, *args, **options):
+        available = Property.objects.filter(status='available')
+
+        # Listing pages: the same query and order property_list uses by default
+        cards = fragments.load_cards(
+            available.cards().order_by('-created_at', '-id')[:options['pages'] * PAGE_SIZE]
+        )
+        cached_count(available, {})  # cursor-mode total for the unfiltered list
+        sidebar = facets.sidebar()
+        self.stdout.write(f"Listing pages: {len(cards)} cards, {len(sidebar['cities'])} cities in the facets.")
+
+        # Detail pages, most viewed first (newest listings if there are no views yet)
+        since = timezone.localdate() - timedelta(days=options['days'])
+        top = available.filter(daily_views__date__gte=since)\
+            .annotate(recent_views=Sum('daily_views__views')).order_by('-recent_views')
+        ids = list(top.values_list('id', flat=True)[:options['details']])
+        if len(ids) < options['details']:
+            newest = available.exclude(id__in=ids).order_by('-created_at')
+            ids += list(newest.values_list('id', flat=True)[:options['details'] - len(ids)])
+
+        listings = Property.objects.filter(id__in=ids).select_related('primary_image').prefetch_related('images')
+        for listing in listings:
+            for name in fragments.SECTION_TEMPLATES:
+                fragments.section(name, listing)
+        availability.for_listings(ids)
+        self.stdout.write(f"Detail pages: {len(ids)} listings.")
+
+        analytics.sales_summary(*analytics.default_range())
+        self.stdout.write(self.style.SUCCESS("Cache warmed."))
@@ -0,0 +1,103 @@
+"""
+City market statistics: the MarketStats table.
+
+One row per (city, property_type, listing_type) over available listings,
+holding the count, price quartiles, and median price per sqft (area_sqft)
+and per acre (land_size_acres). Pages only ever read the table.
+
+Medians can't be adjusted by deltas, but recomputing a group is cheap.
+recompute(groups) reloads just those groups' listings and takes NumPy
+percentiles; recompute() with no argument redoes every group from a single
+query. The signals recompute, on commit, the group a listing left and the
+one it joined. Bulk paths (admin actions, pricing.change_prices, the
+importer) call recompute(groups) themselves with the groups of the rows
+they touched. `manage.py refresh_market_stats` redoes everything.
+"""
+import operator
+from decimal import Decimal
+from functools import reduce
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .models import MarketStats, Property
+
+GROUP_FIELDS = ('city', 'property_type', 'listing_type')
+# Fields that move a listing between groups or change a group's figures
+TRIGGER_FIELDS = GROUP_FIELDS + ('price', 'area_sqft', 'land_size_acres', 'status')
+CENT = Decimal('0.01')
+
+
+def group_of(prop):
+    return tuple(getattr(prop, f) for f in GROUP_FIELDS)
+
+
+def loaded_group_of(prop):
+    """The group prop belonged to when loaded, or None if that isn't known."""
+    values = tuple(prop.loaded_value(f) for f in GROUP_FIELDS)
+    return None if None in values else values
+
+
+def for_city(city, property_type=None):
+    rows = MarketStats.objects.filter(city__iexact=city)
+    if property_type:
+        rows = rows.filter(property_type=property_type)
+    return rows.order_by('-listings')
+
+
+def top(limit=8):
+    return MarketStats.objects.order_by('-listings', 'city')[:limit]
+
+
+def _money(value):
+    return Decimal(float(value)).quantize(CENT)
+
+
+def _median_ratio(prices, sizes):
+    known = ~np.isnan(sizes) & (sizes > 0)
+    if not known.any():
+        return None
+    return _money(np.median(prices[known] / sizes[known]))
+
+
+def _group_filter(groups):
+    return reduce(operator.or_, (Q(**dict(zip(GROUP_FIELDS, g))) for g in groups))
+
+
+def recompute(groups=None):
+    """Rebuild the rows of the given groups (all groups if None). Returns the rows written."""
+    listings = Property.objects.filter(status='available')
+    stale = MarketStats.objects.all()
+    if groups is not None:
+        groups = {g for g in groups if g is not None}
+        if not groups:
+            return 0
+        listings = listings.filter(_group_filter(groups))
+        stale = stale.filter(_group_filter(groups))
+
+    rows = list(listings.order_by().values_list(*GROUP_FIELDS, 'price', 'area_sqft', 'land_size_acres'))
+    stats = []
+    if rows:
+        keys = [r[:3] for r in rows]
+        numbers = np.array([[float(v) if v is not None else np.nan for v in r[3:]] for r in rows])
+        prices, areas, acres = numbers.T
+        # Sort once by group, then every group is a contiguous slice
+        _, inverse = np.unique(np.array(keys, dtype=str), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.flatnonzero(np.diff(inverse[order])) + 1
+        for members in np.split(order, bounds):
+            p25, p50, p75 = np.percentile(prices[members], [25, 50, 75])
+            stats.append(MarketStats(
+                **dict(zip(GROUP_FIELDS, keys[members[0]])),
+                listings=len(members),
+                price_p25=_money(p25), median_price=_money(p50), price_p75=_money(p75),
+                median_price_per_sqft=_median_ratio(prices[members], areas[members]),
+                median_price_per_acre=_median_ratio(prices[members], acres[members]),
+            ))
+
+    with transaction.atomic():
+        stale.delete()
+        MarketStats.objects.bulk_create(stats, batch_size=500)
+    return len(stats)
@@ -0,0 +1,36 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:52
+
+from django.db import migrations, models
+
+
+def backfill_geohash(apps, schema_editor):
+    from listings import geo
+
+    Property = apps.get_model('listings', 'Property')
+    batch = []
+    rows = Property.objects.exclude(latitude=None).exclude(longitude=None)\
+        .only('id', 'latitude', 'longitude').iterator(chunk_size=2000)
+    for prop in rows:
+        prop.geohash = geo.encode(float(prop.latitude), float(prop.longitude))
+        batch.append(prop)
+        if len(batch) >= 2000:
+            Property.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    if batch:
+        Property.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-17 09:12
+
+from django.db import migrations
+
+
+def create_fts_index(apps, schema_editor):
+    from listings import search
+
+    if search.create_index(schema_editor.connection):
+        search.rebuild_index(schema_editor.connection)
+
+
+def drop_fts_index(apps, schema_editor):
+    from listings import search
+
+    search.drop_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0002_property_geohash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0003_property_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='property_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['status', 'price', 'id'], name='property_status_price_idx'),
+        ),
+    ]
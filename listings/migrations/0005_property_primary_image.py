@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_primary_image(apps, schema_editor):
+    Property = apps.get_model('listings', 'Property')
+    PropertyImage = apps.get_model('listings', 'PropertyImage')
+
+    # Flagged image first, then the oldest; the first row seen per property wins
+    chosen = {}
+    rows = PropertyImage.objects.order_by('property_id', '-is_primary', 'id')\
+        .values_list('property_id', 'id').iterator(chunk_size=2000)
+    for property_id, image_id in rows:
+        chosen.setdefault(property_id, image_id)
+
+    batch = [Property(pk=pk, primary_image_id=image_id) for pk, image_id in chosen.items()]
+    Property.objects.bulk_update(batch, ['primary_image'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_property_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='primary_image',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='listings.propertyimage'),
+        ),
+        migrations.RunPython(backfill_primary_image, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-16 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_property_primary_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertyimage',
+            name='renditions_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
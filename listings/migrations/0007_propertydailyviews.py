@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0006_propertyimage_renditions_ready'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PropertyDailyViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='listings.property')),
+            ],
+            options={
+                'verbose_name_plural': 'Property daily views',
+                'unique_together': {('property', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0005_slotoccupancy'),
+        ('listings', '0007_propertydailyviews'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='property',
+            index=models.Index(fields=['updated_at'], name='property_updated_idx'),
+        ),
+    ]
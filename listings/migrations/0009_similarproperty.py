@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0008_property_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarProperty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('distance', models.FloatField()),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbour_of', to='listings.property')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar', to='listings.property')),
+            ],
+            options={
+                'verbose_name_plural': 'Similar properties',
+                'ordering': ['property', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('property', 'rank'), name='similar_property_rank_unique')],
+            },
+        ),
+    ]
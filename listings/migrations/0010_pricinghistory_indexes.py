@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0009_similarproperty'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='pricinghistory',
+            options={'verbose_name_plural': 'Pricing history'},
+        ),
+        migrations.AddIndex(
+            model_name='pricinghistory',
+            index=models.Index(fields=['property', 'changed_at'], name='pricing_property_changed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricinghistory',
+            index=models.Index(fields=['changed_at'], name='pricing_changed_idx'),
+        ),
+    ]
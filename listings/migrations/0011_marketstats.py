@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0010_pricinghistory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MarketStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('city', models.CharField(max_length=100)),
+                ('property_type', models.CharField(choices=[('apartment', 'Apartment'), ('house', 'House'), ('villa', 'Villa'), ('commercial', 'Commercial'), ('land', 'Land'), ('commercial_land', 'Commercial Land'), ('bungalow', 'Bungalow'), ('office', 'Office Space')], max_length=50)),
+                ('listing_type', models.CharField(choices=[('sale', 'For Sale'), ('rent', 'For Rent'), ('lease', 'For Lease')], max_length=10)),
+                ('listings', models.PositiveIntegerField(default=0)),
+                ('price_p25', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('median_price', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('price_p75', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('median_price_per_sqft', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True)),
+                ('median_price_per_acre', models.DecimalField(blank=True, decimal_places=2, max_digits=16, null=True)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Market statistics',
+                'ordering': ['city', 'property_type', 'listing_type'],
+                'constraints': [models.UniqueConstraint(fields=('city', 'property_type', 'listing_type'), name='market_stats_group_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0011_marketstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='property',
+            name='external_ref',
+            field=models.CharField(blank=True, editable=False, max_length=100, null=True, unique=True),
+        ),
+    ]
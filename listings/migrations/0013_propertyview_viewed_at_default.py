@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:04
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0012_property_external_ref'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propertyview',
+            name='viewed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:09
+
+from django.db import migrations
+
+
+def reset_renditions(apps, schema_editor):
+    # Rendition names now carry the original's extension; until `manage.py generate_renditions`
+    # has rebuilt them, pages serve the originals instead of links to the old names
+    PropertyImage = apps.get_model('listings', 'PropertyImage')
+    PropertyImage.objects.filter(renditions_ready=True).update(renditions_ready=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0014_similarityrefresh'),
+    ]
+
+    operations = [
+        migrations.RunPython(reset_renditions, migrations.RunPython.noop),
+    ]
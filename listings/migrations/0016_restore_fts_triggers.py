@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:30
+
+from django.db import migrations
+
+
+def restore_fts_triggers(apps, schema_editor):
+    # 0012 added a unique column, which SQLite can only do by rebuilding
+    # listings_property -- and the rebuild dropped the search triggers with it
+    from listings import search
+
+    if search.create_index(schema_editor.connection):
+        search.rebuild_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0015_renditions_keep_extension'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_fts_triggers, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,26 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 from decimal import Decimal
 from core.models import TimeStampedModel
+from . import geo, renditions
 
 User = get_user_model()
 
+# Columns a listing card needs; see PropertyQuerySet.cards()
+CARD_FIELDS = (
+    'id', 'title', 'property_type', 'listing_type', 'status', 'price', 'currency',
+    'address', 'city', 'bedrooms', 'bathrooms', 'area_sqft', 'land_size_acres',
+    'created_at', 'updated_at', 'primary_image',
+)
+
+class PropertyQuerySet(models.QuerySet):
+    def cards(self):
+        """Slim projection for listing grids: card columns plus the primary image, in one query."""
+        return self.select_related('primary_image')\
+            .only(*CARD_FIELDS, 'primary_image__image', 'primary_image__renditions_ready')
+
 class Property(TimeStampedModel):
     PROPERTY_TYPES = [
         ('apartment', 'Apartment'), ('house', 'House'), ('villa', 'Villa'),
@@ -42,6 +57,7 @@ class Property(TimeStampedModel):
     zipcode = models.CharField(max_length=20, blank=True, null=True) # Fixed
     latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     
     # Details
     bedrooms = models.IntegerField(blank=True, null=True)
@@ -67,19 +83,88 @@ class Property(TimeStampedModel):
 
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_properties')
     agent = models.ForeignKey('booking.Agent', on_delete=models.SET_NULL, null=True, blank=True)
+
+    # Id of the listing in an external feed; re-imports update the row (listings.importer)
+    external_ref = models.CharField(max_length=100, unique=True, null=True, blank=True, editable=False)
+
+    # Denormalized card image, maintained by listings.signals when images change
+    primary_image = models.ForeignKey(
+        'PropertyImage', on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='+', editable=False
+    )
+
+    objects = PropertyQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Properties"
+        indexes = [
+            # Keyset pagination seeks for the listing feed (listings.pagination)
+            models.Index(fields=['status', 'created_at', 'id'], name='property_status_created_idx'),
+            models.Index(fields=['status', 'price', 'id'], name='property_status_price_idx'),
+            # MAX(updated_at) for the conditional GET validators (listings.conditional)
+            models.Index(fields=['updated_at'], name='property_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.city}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so signals can tell which fields an edit changed
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def has_changed(self, field):
+        """True for unsaved rows, or when field differs from the value last loaded/saved."""
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None or field not in loaded:
+            return True
+        return getattr(self, field) != loaded[field]
+
+    def loaded_value(self, field, default=None):
+        """Value of field as last loaded/saved, or default when it wasn't loaded."""
+        return (getattr(self, '_loaded_values', None) or {}).get(field, default)
+
+    def save(self, *args, **kwargs):
+        # Keep the spatial cell key in step with the coordinates (used by listings.geo)
+        self.geohash = self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            f.attname: getattr(self, f.attname)
+            for f in self._meta.concrete_fields if f.attname not in deferred
+        }
+
+    def refresh_primary_image(self):
+        """Point primary_image at the flagged image, else the oldest one."""
+        self.primary_image = self.images.order_by('-is_primary', 'id').first()
+        Property.objects.filter(pk=self.pk).update(primary_image=self.primary_image)
+
+    def compute_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            return ''
+        return geo.encode(float(self.latitude), float(self.longitude))
+
 class PropertyImage(TimeStampedModel):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='properties/%Y/%m/%d/')
     is_primary = models.BooleanField(default=False)
     caption = models.CharField(max_length=200, blank=True)
     image_type = models.CharField(max_length=50, default='exterior')
+    renditions_ready = models.BooleanField(default=False, editable=False)
+
+    def rendition_url(self, size='card', fmt='jpeg'):
+        """URL of a resized derivative (see listings.renditions); the original until it exists."""
+        if not self.image:
+            return ''
+        if not self.renditions_ready:
+            return self.image.url
+        return self.image.storage.url(renditions.rendition_name(self.image.name, size, fmt))
 
 class PropertyDocument(TimeStampedModel):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='documents')
@@ -93,7 +178,60 @@ class PropertyView(TimeStampedModel):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='views')
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     viewer_ip = models.GenericIPAddressField(null=True, blank=True)
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add: listings.tracking writes views in batches and sets the time of the view itself
+    viewed_at = models.DateTimeField(default=timezone.now)
+
+class PropertyDailyViews(models.Model):
+    """Per-property view counter for one day, incremented in batches by listings.tracking."""
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='daily_views')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('property', 'date')
+        verbose_name_plural = "Property daily views"
+
+class SimilarProperty(models.Model):
+    """One precomputed "you might also like" neighbour; rows are maintained by listings.similarity."""
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='similar')
+    neighbour = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='neighbour_of')
+    rank = models.PositiveSmallIntegerField()
+    distance = models.FloatField()
+
+    class Meta:
+        ordering = ['property', 'rank']
+        verbose_name_plural = "Similar properties"
+        constraints = [
+            models.UniqueConstraint(fields=['property', 'rank'], name='similar_property_rank_unique'),
+        ]
+
+class SimilarityRefresh(models.Model):
+    """A listing whose neighbour lists are out of date; queued by listings.similarity.mark_stale()."""
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name='+')
+    queued_at = models.DateTimeField(default=timezone.now)
+
+class MarketStats(models.Model):
+    """City market figures per property and listing type, over available listings; see listings.market."""
+    city = models.CharField(max_length=100)
+    property_type = models.CharField(max_length=50, choices=Property.PROPERTY_TYPES)
+    listing_type = models.CharField(max_length=10, choices=Property.LISTING_TYPE)
+    listings = models.PositiveIntegerField(default=0)
+    price_p25 = models.DecimalField(max_digits=14, decimal_places=2)
+    median_price = models.DecimalField(max_digits=14, decimal_places=2)
+    price_p75 = models.DecimalField(max_digits=14, decimal_places=2)
+    median_price_per_sqft = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    median_price_per_acre = models.DecimalField(max_digits=16, decimal_places=2, null=True, blank=True)
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['city', 'property_type', 'listing_type']
+        verbose_name_plural = "Market statistics"
+        constraints = [
+            models.UniqueConstraint(fields=['city', 'property_type', 'listing_type'], name='market_stats_group_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.city} / {self.get_property_type_display()} / {self.get_listing_type_display()}"
 
 class PricingHistory(TimeStampedModel):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='price_history')
@@ -103,6 +241,18 @@ class PricingHistory(TimeStampedModel):
     reason = models.CharField(max_length=255, blank=True)
     changed_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        verbose_name_plural = "Pricing history"
+        indexes = [
+            # Per-listing series and the compaction scan (listings.pricing)
+            models.Index(fields=['property', 'changed_at'], name='pricing_property_changed_idx'),
+            # Window filter of the city price index
+            models.Index(fields=['changed_at'], name='pricing_changed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.property_id}: {self.old_price} -> {self.new_price}"
+
 class Inquiry(TimeStampedModel):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='inquiries')
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
@@ -0,0 +1,129 @@
+"""
+Keyset (cursor) pagination for the listing feed.
+
+Instead of OFFSET, each page seeks past the last row of the previous one
+on (sort column, id), which the composite indexes on Property serve
+directly, so page 5000 costs the same as page 1. Totals come from a
+short-lived cached COUNT rather than being recomputed on every page.
+"""
+import base64
+import hashlib
+import json
+from collections.abc import Sequence
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+COUNT_CACHE_TIMEOUT = 60 * 2
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Sequence):
+    """A page of results; mirrors the parts of django.core.paginator.Page templates use."""
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Paginate queryset by a single sort key plus id as the tie-breaker.
+    ordering is a field or annotation name, optionally prefixed with '-'.
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+
+    def get_page(self, cursor=None):
+        """Like Paginator.get_page: a bad or stale cursor falls back to the first page."""
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page(None)
+
+    def page(self, cursor=None):
+        value, pk, backwards = self._decode(cursor) if cursor else (None, None, False)
+        # Walking backwards flips both the comparison and the ordering, then the rows are reversed
+        descending = self.descending != backwards
+        prefix = '-' if descending else ''
+        queryset = self.queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+        if cursor:
+            queryset = queryset.filter(self._seek(value, pk, descending))
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return CursorPage(rows)
+        has_next = has_more if not backwards else True
+        has_previous = bool(cursor) if not backwards else has_more
+        return CursorPage(
+            rows,
+            next_cursor=self._encode(rows[-1], False) if has_next else None,
+            previous_cursor=self._encode(rows[0], True) if has_previous else None,
+        )
+
+    def _seek(self, value, pk, descending):
+        op = 'lt' if descending else 'gt'
+        # The plain range on the leading column is what lets the index do the seek
+        bound = Q(**{f'{self.field}__{op}e': value})
+        return bound & (Q(**{f'{self.field}__{op}': value}) | Q(**{f'{self.field}': value, f'id__{op}': pk}))
+
+    def _encode(self, obj, backwards):
+        value = getattr(obj, self.field)
+        raw = value.isoformat() if hasattr(value, 'isoformat') else str(value)
+        payload = json.dumps([raw, obj.pk, int(backwards)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def _decode(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw, pk, backwards = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return self._to_python(raw), int(pk), bool(backwards)
+        except (ValueError, TypeError, ValidationError):
+            raise InvalidCursor(cursor)
+
+    def _to_python(self, raw):
+        try:
+            field = self.queryset.model._meta.get_field(self.field)
+        except FieldDoesNotExist:
+            # Annotations we paginate on (e.g. search_rank) are floats
+            return float(raw)
+        value = field.to_python(raw)
+        if value is None:
+            raise ValueError(raw)
+        return value
+
+
+def cached_count(queryset, params, timeout=COUNT_CACHE_TIMEOUT):
+    """COUNT(*) for a filtered queryset, shared for a couple of minutes per filter set."""
+    digest = hashlib.md5(json.dumps(sorted(params.items())).encode()).hexdigest()
+    return cache.get_or_set(f'listings:count:{digest}', queryset.count, timeout)
@@ -0,0 +1,158 @@
+"""
+Price history: capture, series and a per-city index.
+
+Every price change ends up in PricingHistory:
+
+* ordinary saves (admin form, PropertyCreateForm, the shell) through the
+  record_price_change signal, which compares against the price the row
+  was loaded with. Set instance._changed_by to credit a user; the admin does.
+* bulk changes through change_prices(). QuerySet.update() sends no
+  signals, so it updates the rows and writes their history together.
+
+series() is one listing's price over time. city_index() chains the
+geometric mean price change per city and month into an index (start =
+100), from one grouped query over the history.
+
+compact() keeps the table bounded. Past RETENTION_DAYS, a listing's changes
+within one month are merged into a single row (first old price -> last
+new price), so series() stays continuous, only coarser.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField
+from django.db.models.functions import Cast, Ln, TruncMonth
+from django.utils import timezone
+
+from core import cache as cache_versions
+from core import kpi
+from .models import PricingHistory, Property
+from . import analytics, clustering, market, similarity
+
+RETENTION_DAYS = 365
+INDEX_MONTHS = 24
+CACHE_NAMESPACE = 'pricing'
+CACHE_TIMEOUT = 60 * 60
+CENT = Decimal('0.01')
+
+
+def record(property_id, old_price, new_price, changed_by=None, reason=''):
+    PricingHistory.objects.create(
+        property_id=property_id, old_price=old_price, new_price=new_price,
+        changed_by=changed_by, reason=reason,
+    )
+    cache_versions.bump_version(CACHE_NAMESPACE)
+
+
+def change_prices(new_prices, changed_by=None, reason=''):
+    """
+    Set many prices at once ({property_id: price}) and record the changes.
+    Returns how many listings actually changed.
+    """
+    rows = {pk: rest for pk, *rest in Property.objects.filter(pk__in=new_prices)
+            .values_list('pk', 'price', 'status', *market.GROUP_FIELDS)}
+    current = {pk: row[0] for pk, row in rows.items()}
+    changed = {
+        pk: Decimal(price).quantize(CENT) for pk, price in new_prices.items()
+        if pk in current and Decimal(price).quantize(CENT) != current[pk]
+    }
+    if not changed:
+        return 0
+    now = timezone.now()
+    with transaction.atomic():
+        Property.objects.bulk_update(
+            [Property(pk=pk, price=price, updated_at=now) for pk, price in changed.items()],
+            ['price', 'updated_at'], batch_size=500,
+        )
+        PricingHistory.objects.bulk_create([
+            PricingHistory(property_id=pk, old_price=current[pk], new_price=price,
+                           changed_by=changed_by, reason=reason)
+            for pk, price in changed.items()
+        ], batch_size=500)
+
+    # bulk_update skips post_save, so refresh what the signals would have
+    cache_versions.bump_version(CACHE_NAMESPACE)
+    analytics.invalidate()
+    clustering.bump_version()
+    # Of the KPIs only the value of the listings on the market depends on price
+    kpi.adjust(portfolio_value=sum(price - current[pk] for pk, price in changed.items() if rows[pk][1] == 'available'))
+    market.recompute({tuple(rows[pk][2:]) for pk in changed})
+    similarity.mark_stale(changed)
+    return len(changed)
+
+
+def series(prop):
+    """[(when, price), ...] oldest first: the price at listing time, then after each change."""
+    changes = list(prop.price_history.order_by('changed_at', 'id').values_list('changed_at', 'old_price', 'new_price'))
+    first = changes[0][1] if changes else prop.price
+    return [(prop.created_at, first)] + [(at, new) for at, _, new in changes]
+
+
+def city_index(city=None, months=INDEX_MONTHS):
+    """{city: [(month, index, changes), ...]}: chained monthly price index per city, 100 at the start."""
+    version = cache_versions.get_version(CACHE_NAMESPACE)
+    key = f'pricing:index:{version}:{(city or "").lower()}:{months}:{timezone.localdate():%Y-%m}'
+    return cache.get_or_set(key, lambda: _compute_index(city, months), CACHE_TIMEOUT)
+
+
+def _compute_index(city, months):
+    since = timezone.localdate().replace(day=1) - timedelta(days=31 * (months - 1))
+    rows = PricingHistory.objects.filter(old_price__gt=0, new_price__gt=0, changed_at__date__gte=since)
+    if city:
+        rows = rows.filter(property__city__iexact=city)
+    ratio = Cast(F('new_price'), FloatField()) / Cast(F('old_price'), FloatField())
+    rows = rows.annotate(month=TruncMonth('changed_at'), listing_city=F('property__city'))\
+        .values('listing_city', 'month')\
+        .annotate(mean_log=Avg(Ln(ratio)), changes=Count('id'))\
+        .order_by('listing_city', 'month')
+
+    index = defaultdict(list)
+    level = {}
+    for row in rows:
+        name = row['listing_city']
+        level[name] = level.get(name, 100.0) * math.exp(row['mean_log'])
+        index[name].append((row['month'].date(), round(level[name], 2), row['changes']))
+    return dict(index)
+
+
+def compact(days=RETENTION_DAYS):
+    """Merge each listing's changes per month older than `days`. Returns the number of rows removed."""
+    cutoff = timezone.now() - timedelta(days=days)
+    old = PricingHistory.objects.filter(changed_at__lt=cutoff)\
+        .order_by('property_id', 'changed_at', 'id')\
+        .only('id', 'property_id', 'changed_at', 'old_price', 'new_price')
+
+    keep, drop = [], []
+
+    def merge(rows):
+        if len(rows) < 2:
+            return
+        last = rows[-1]
+        last.old_price = rows[0].old_price
+        drop.extend(r.pk for r in rows[:-1])
+        if last.old_price == last.new_price:
+            drop.append(last.pk)  # back where the month started; nothing to show
+        else:
+            keep.append(last)
+
+    # Rows arrive grouped by listing and month, so one group is held at a time
+    group, group_key = [], None
+    for row in old.iterator(chunk_size=2000):
+        row_key = row.property_id, timezone.localtime(row.changed_at).strftime('%Y-%m')
+        if row_key != group_key:
+            merge(group)
+            group, group_key = [], row_key
+        group.append(row)
+    merge(group)
+
+    with transaction.atomic():
+        PricingHistory.objects.bulk_update(keep, ['old_price'], batch_size=500)
+        for start in range(0, len(drop), 500):
+            PricingHistory.objects.filter(pk__in=drop[start:start + 500]).delete()
+    if drop:
+        cache_versions.bump_version(CACHE_NAMESPACE)
+    return len(drop)
@@ -0,0 +1,116 @@
+"""
+Fixed-size JPEG/WebP derivatives of PropertyImage uploads.
+
+Every original gets a thumb, card and detail rendition in both formats,
+stored next to it under a renditions/ folder with a predictable name, so
+templates can build URLs without touching the database. The name keeps the
+original's extension, so house.jpg and house.png in one folder don't share
+renditions. Generation runs after each upload commits, and delete() clears
+them once an image is deleted or replaced; generate_many() fans a backlog out over a
+process pool (see the generate_renditions management command).
+"""
+import logging
+import posixpath
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes; images are shrunk to fit, never upscaled
+RENDITIONS = {
+    'detail': (1600, 1200),
+    'card': (800, 600),
+    'thumb': (320, 240),
+}
+FORMATS = {
+    'jpeg': ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+}
+
+
+def rendition_name(name, size, fmt='jpeg'):
+    """Storage name of a rendition, e.g. properties/2026/01/22/renditions/house_jpg_card.webp."""
+    directory, filename = posixpath.split(name)
+    stem, ext = posixpath.splitext(filename)
+    return posixpath.join(directory, 'renditions', f'{stem}_{ext.lstrip(".")}_{size}.{FORMATS[fmt][0]}')
+
+
+def delete(name, storage=default_storage):
+    """Remove every rendition of one original; missing ones are skipped."""
+    for size in RENDITIONS:
+        for fmt in FORMATS:
+            storage.delete(rendition_name(name, size, fmt))
+
+
+def generate(name, storage=default_storage):
+    """Write every size and format for one original image."""
+    with storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        # Let the JPEG decoder skip detail we'd throw away anyway
+        image.draft('RGB', RENDITIONS['detail'])
+        image = ImageOps.exif_transpose(image)
+        image = _to_rgb(image)
+
+    # Largest first; each smaller size is resampled from the previous one
+    for size, box in sorted(RENDITIONS.items(), key=lambda item: -item[1][0] * item[1][1]):
+        image = image.copy()
+        image.thumbnail(box, Image.Resampling.LANCZOS)
+        for fmt, (_, pil_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, pil_format, **options)
+            target = rendition_name(name, size, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+
+
+def _to_rgb(image):
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def _generate_quietly(name):
+    try:
+        generate(name)
+        return name, None
+    except Exception as e:
+        return name, str(e)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def generate_many(names, workers=None, chunksize=4):
+    """
+    Generate renditions for many originals across a process pool.
+    Yields (name, error) pairs; error is None on success.
+    """
+    if workers == 1:
+        for name in names:
+            yield _generate_quietly(name)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        yield from pool.map(_generate_quietly, names, chunksize=chunksize)
+
+
+def build_for(image):
+    """Generate renditions for one PropertyImage and mark it ready."""
+    name, error = _generate_quietly(image.image.name)
+    if error:
+        logger.warning("Rendition generation failed for %s: %s", name, error)
+        return False
+    from .conditional import touch
+    type(image).objects.filter(pk=image.pk).update(renditions_ready=True)
+    touch(image.property_id)
+    image.renditions_ready = True
+    return True
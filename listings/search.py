@@ -0,0 +1,169 @@
+"""
+Full-text search over Property title/description/address/city.
+
+On SQLite builds with FTS5 an external-content index (listings_property_fts)
+mirrors those columns. Triggers keep it in step with every insert, update
+and delete on listings_property, including bulk writes that skip signals.
+Searches go through the index with BM25 ranking and prefix matching; other
+databases, or SQLite without FTS5, fall back to icontains filters.
+
+SQLite drops a table's triggers whenever a migration has to rebuild it
+(adding a unique column, most AlterFields). repair_index() runs after
+every migrate (see signals.py) and puts missing triggers back, reindexing
+what was written without them. Until then fts_available() reports the
+index as unusable, so searches fall back to icontains rather than serving
+a stale index.
+"""
+import re
+
+from django.db import connections, OperationalError
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'listings_property_fts'
+FTS_COLUMNS = ('title', 'description', 'address', 'city')
+# bm25() column weights, in FTS_COLUMNS order: a hit in the title counts most
+BM25_WEIGHTS = (10.0, 1.0, 3.0, 5.0)
+MAX_TERMS = 8
+
+_cols = ', '.join(FTS_COLUMNS)
+_new_cols = ', '.join(f'new.{c}' for c in FTS_COLUMNS)
+_old_cols = ', '.join(f'old.{c}' for c in FTS_COLUMNS)
+
+CREATE_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_cols}, content='listings_property', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON listings_property BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new_cols});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON listings_property BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) VALUES ('delete', old.id, {_old_cols});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_cols} ON listings_property BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_cols}) VALUES ('delete', old.id, {_old_cols});
+        INSERT INTO {FTS_TABLE}(rowid, {_cols}) VALUES (new.id, {_new_cols});
+    END""",
+]
+
+TRIGGERS = tuple(f'{FTS_TABLE}_{suffix}' for suffix in ('ai', 'ad', 'au'))
+
+DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+_availability = {}
+
+
+# ==========================================
+# 1. INDEX MANAGEMENT
+# ==========================================
+
+def create_index(connection):
+    """Create the FTS table and triggers. Returns False if FTS5 is unsupported."""
+    if connection.vendor != 'sqlite':
+        return False
+    try:
+        with connection.cursor() as cursor:
+            for statement in CREATE_SQL:
+                cursor.execute(statement)
+    except OperationalError:
+        # SQLite compiled without FTS5 ("no such module: fts5")
+        return False
+    _availability.pop(connection.settings_dict['NAME'], None)
+    return True
+
+
+def drop_index(connection):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in DROP_SQL:
+            cursor.execute(statement)
+    _availability.pop(connection.settings_dict['NAME'], None)
+
+
+def rebuild_index(connection):
+    """Repopulate the index from listings_property and merge its segments."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def repair_index(connection):
+    """Re-create triggers a table rebuild dropped and reindex. Returns True if anything was missing."""
+    if connection.vendor != 'sqlite':
+        return False
+    found = _index_objects(connection)
+    if FTS_TABLE not in found or found >= set(TRIGGERS):
+        return False
+    if create_index(connection):
+        rebuild_index(connection)
+    return True
+
+
+def _index_objects(connection):
+    names = (FTS_TABLE,) + TRIGGERS
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names,
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def fts_available(using='default'):
+    """The index exists and its triggers are in place, so it is up to date."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _availability:
+        _availability[name] = _index_objects(connection) == {FTS_TABLE, *TRIGGERS}
+    return _availability[name]
+
+
+# ==========================================
+# 2. QUERYING
+# ==========================================
+
+def build_match_expression(query):
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match,
+    the last one as a prefix so "nair" finds "Nairobi" while typing.
+    """
+    terms = re.findall(r'\w+', query.lower())[:MAX_TERMS]
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search(queryset, query):
+    """
+    Filter a Property queryset to rows matching query.
+    With FTS5 the rows are annotated with search_rank (lower is better).
+    """
+    if not fts_available(queryset.db):
+        condition = Q()
+        for term in query.split()[:MAX_TERMS]:
+            condition &= (Q(title__icontains=term) | Q(description__icontains=term)
+                          | Q(address__icontains=term) | Q(city__icontains=term))
+        return queryset.filter(condition)
+
+    match = build_match_expression(query)
+    if not match:
+        return queryset.none()
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    table = queryset.model._meta.db_table
+    # Join the index once: MATCH filters the join and bm25() reads the same matched row.
+    # The unary + keeps SQLite from probing the index by rowid for every listing
+    # (re-running MATCH each time); the MATCH scan has to drive the join instead.
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'+{FTS_TABLE}.rowid = "{table}"."id"', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    ).annotate(search_rank=RawSQL(f'bm25({FTS_TABLE}, {weights})', [], output_field=FloatField()))
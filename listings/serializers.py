@@ -0,0 +1,123 @@
+"""
+Read-only Property serializers for the public API (see listings.api).
+
+Clients choose their columns with ?fields=a,b,c. PropertySerializer drops
+everything else, and property_queryset() builds the matching queryset:
+only() the requested columns, one JOIN per requested to-one relation and
+one prefetch per requested to-many, so no field costs a query per row.
+"""
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .models import Property, PropertyImage
+
+# Plain columns clients may ask for
+SCALAR_FIELDS = (
+    'id', 'title', 'description', 'property_type', 'listing_type', 'status',
+    'price', 'currency', 'price_negotiable',
+    'address', 'city', 'state', 'country', 'zipcode', 'latitude', 'longitude',
+    'bedrooms', 'bathrooms', 'area_sqft', 'year_built', 'land_size_acres', 'zoning_type',
+    'has_parking', 'parking_spaces', 'has_swimming_pool', 'has_garden', 'has_security',
+    'has_elevator', 'has_gym', 'has_air_conditioning', 'has_road_access', 'has_electricity',
+    'has_water_connection', 'is_waterfront',
+    'created_at', 'updated_at',
+)
+RELATED_FIELDS = ('primary_image', 'images', 'agent')
+
+LIST_FIELDS = (
+    'id', 'title', 'property_type', 'listing_type', 'status', 'price', 'currency',
+    'city', 'bedrooms', 'bathrooms', 'area_sqft', 'created_at', 'primary_image',
+)
+DETAIL_FIELDS = SCALAR_FIELDS + RELATED_FIELDS
+
+IMAGE_SIZES = ('thumb', 'card', 'detail')
+
+
+def parse_fields(raw, default):
+    """?fields=a,b,c -> the known names in request order; unknown names are ignored."""
+    if not raw:
+        return tuple(default)
+    known = set(DETAIL_FIELDS)
+    requested = [name.strip() for name in raw.split(',')]
+    return tuple(dict.fromkeys(name for name in requested if name in known)) or tuple(default)
+
+
+def property_queryset(queryset, fields, always=('id',)):
+    """Narrow a Property queryset to what serializing `fields` needs."""
+    columns = [name for name in fields if name in SCALAR_FIELDS]
+    columns.extend(name for name in always if name not in columns)
+
+    if 'primary_image' in fields:
+        queryset = queryset.select_related('primary_image')
+        columns += ['primary_image', 'primary_image__image', 'primary_image__renditions_ready']
+    if 'agent' in fields:
+        queryset = queryset.select_related('agent')
+        columns += ['agent', 'agent__name']
+    if 'images' in fields:
+        images = PropertyImage.objects.only(
+            'id', 'property', 'image', 'is_primary', 'caption', 'image_type', 'renditions_ready',
+        ).order_by('-is_primary', 'id')
+        queryset = queryset.prefetch_related(Prefetch('images', queryset=images))
+    return queryset.only(*columns)
+
+
+def _image_urls(image, request):
+    urls = {size: image.rendition_url(size) for size in IMAGE_SIZES}
+    if request is not None:
+        urls = {size: request.build_absolute_uri(url) for size, url in urls.items()}
+    return urls
+
+
+class PropertyFilterSerializer(serializers.Serializer):
+    """The list endpoints' query parameters; bad values are a 400, not a 500 from the ORM."""
+    q = serializers.CharField(required=False, allow_blank=True)
+    property_type = serializers.ChoiceField(choices=Property.PROPERTY_TYPES, required=False)
+    city = serializers.CharField(required=False)
+    min_price = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+
+    @classmethod
+    def parse(cls, query_params):
+        # Empty parameters (e.g. from a submitted blank form) mean "no filter"
+        given = {name: value for name, value in query_params.items() if name in cls._declared_fields and value}
+        serializer = cls(data=given)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+
+class PropertyImageSerializer(serializers.ModelSerializer):
+    urls = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PropertyImage
+        fields = ('id', 'caption', 'image_type', 'is_primary', 'urls')
+
+    def get_urls(self, obj):
+        return _image_urls(obj, self.context.get('request'))
+
+
+class AgentSerializer(serializers.Serializer):
+    # The API is anonymous: agents' phone and e-mail stay on the enquiry form
+    name = serializers.CharField()
+
+
+class PropertySerializer(serializers.ModelSerializer):
+    """Serializes only the names passed as fields=; see property_queryset()."""
+    primary_image = serializers.SerializerMethodField()
+    images = PropertyImageSerializer(many=True, read_only=True)
+    agent = AgentSerializer(read_only=True)
+
+    class Meta:
+        model = Property
+        fields = DETAIL_FIELDS
+        read_only_fields = DETAIL_FIELDS
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    def get_primary_image(self, obj):
+        image = obj.primary_image
+        return _image_urls(image, self.context.get('request')) if image else None
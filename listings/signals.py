@@ -0,0 +1,104 @@
+from django.db import connections, transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, post_migrate
+from django.dispatch import receiver
+from .models import Property, PropertyImage, SimilarProperty
+from . import analytics, clustering, conditional, market, pricing, renditions, search, similarity
+
+@receiver([post_save, post_delete], sender=Property)
+def invalidate_map_tiles(sender, instance, **kwargs):
+    # Cached map clusters carry a version; any listing change retires them all
+    clustering.bump_version()
+
+@receiver(post_save, sender=Property)
+def invalidate_sales_analytics(sender, instance, created, **kwargs):
+    # The admin sales series only depends on status/price, so ordinary edits keep the cache
+    if created or instance.has_changed('status') or instance.has_changed('price'):
+        analytics.invalidate()
+
+@receiver(post_delete, sender=Property)
+def invalidate_sales_analytics_on_delete(sender, instance, **kwargs):
+    analytics.invalidate()
+
+@receiver(post_delete, sender=Property)
+def retire_page_etags(sender, instance, **kwargs):
+    # A deletion leaves no newer updated_at behind for the page validators to see
+    conditional.bump()
+
+@receiver(post_save, sender=Property)
+def record_price_change(sender, instance, created, **kwargs):
+    # Bulk changes bypass this and record their own history (pricing.change_prices)
+    old_price = instance.loaded_value('price')
+    if not created and old_price is not None and instance.has_changed('price'):
+        pricing.record(instance.pk, old_price, instance.price, changed_by=getattr(instance, '_changed_by', None))
+
+@receiver(post_save, sender=Property)
+def refresh_similar(sender, instance, created, **kwargs):
+    # Only the recommender's features (and availability) move neighbours around
+    fields = similarity.FEATURE_FIELDS + ('status',)
+    if created or any(instance.has_changed(f) for f in fields):
+        similarity.mark_stale([instance.pk])
+
+@receiver(pre_delete, sender=Property)
+def refill_similar_lists(sender, instance, **kwargs):
+    # The cascade is about to drop this listing from other lists; they get refilled by the next refresh
+    owners = list(SimilarProperty.objects.filter(neighbour=instance).values_list('property_id', flat=True))
+    if owners:
+        similarity.mark_stale(owners)
+
+@receiver(post_save, sender=Property)
+def refresh_market_stats(sender, instance, created, **kwargs):
+    if created or any(instance.has_changed(f) for f in market.TRIGGER_FIELDS):
+        # The group it left (if any) and the one it is in now
+        groups = {market.group_of(instance), None if created else market.loaded_group_of(instance)}
+        transaction.on_commit(lambda: market.recompute(groups))
+
+@receiver(post_delete, sender=Property)
+def refresh_market_stats_on_delete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: market.recompute([market.group_of(instance)]))
+
+@receiver([post_save, post_delete], sender=PropertyImage)
+def touch_property(sender, instance, **kwargs):
+    # Pages revalidate on Property.updated_at, so image changes have to move it
+    conditional.touch(instance.property_id)
+
+@receiver(post_save, sender=PropertyImage)
+def sync_primary_image(sender, instance, **kwargs):
+    # Only one primary per property; the pointer on Property follows it
+    if instance.is_primary:
+        PropertyImage.objects.filter(property_id=instance.property_id, is_primary=True)\
+            .exclude(pk=instance.pk).update(is_primary=False)
+        Property.objects.filter(pk=instance.property_id).update(primary_image=instance)
+    else:
+        Property(pk=instance.property_id).refresh_primary_image()
+
+@receiver(post_delete, sender=PropertyImage)
+def replace_primary_image(sender, instance, **kwargs):
+    # on_delete=SET_NULL has already cleared the pointer if it was this image
+    if Property.objects.filter(pk=instance.property_id, primary_image=None).exists():
+        Property(pk=instance.property_id).refresh_primary_image()
+
+@receiver(pre_save, sender=PropertyImage)
+def reset_renditions_on_replace(sender, instance, **kwargs):
+    if instance.pk:
+        stored = PropertyImage.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+        if stored and stored != instance.image.name:
+            instance.renditions_ready = False
+            transaction.on_commit(lambda: renditions.delete(stored))
+
+@receiver(post_delete, sender=PropertyImage)
+def delete_renditions(sender, instance, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: renditions.delete(name))
+
+@receiver(post_save, sender=PropertyImage)
+def queue_renditions(sender, instance, **kwargs):
+    # Resize once the upload is committed; templates serve the original until then
+    if instance.image and not instance.renditions_ready:
+        transaction.on_commit(lambda: renditions.build_for(instance))
+
+@receiver(post_migrate)
+def repair_search_index(sender, using, **kwargs):
+    # A migration that rebuilt listings_property took the FTS triggers with it
+    if sender.name == 'listings':
+        search.repair_index(connections[using])
@@ -0,0 +1,247 @@
+"""
+"You might also like" recommender for the property detail page.
+
+Every listing becomes one row of a NumPy feature matrix:
+
+* log price, bedrooms/bathrooms and log floor area, z-scored over the
+  catalogue (missing values count as average),
+* position as a point on the unit sphere, z-scored too so distances inside
+  one country still matter,
+* property_type and listing_type one-hot, so a rental is rarely offered
+  next to a sale,
+* the has_* amenity flags.
+
+Each group is scaled by WEIGHTS. Neighbours are the K closest available
+listings by Euclidean distance. Distances come from one matrix product
+per block of BLOCK listings, never from a Python loop over pairs, and are
+stored in SimilarProperty. The detail page reads them with one indexed
+join.
+
+Edits don't recompute anything in the request: each pass needs the whole
+catalogue's feature matrix. Listing edits, admin status actions and
+repricing only mark_stale() the listings, which is one upsert into
+SimilarityRefresh. `manage.py rebuild_similar --stale`, run every few
+minutes, hands the queue to refresh(), which loads the catalogue once
+per run. refresh() recomputes the changed listings' own neighbours, plus
+every list a change could affect: lists that contained a changed
+listing, and lists it is now close enough to enter. The scaling
+statistics drift slowly as listings change, so a plain `manage.py
+rebuild_similar` recomputes everything (and empties the queue). Run it
+nightly and after bulk imports.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Property, SimilarProperty, SimilarityRefresh
+
+K = 6
+BLOCK = 512
+
+AMENITIES = (
+    'has_parking', 'has_swimming_pool', 'has_garden', 'has_security', 'has_elevator', 'has_gym',
+    'has_air_conditioning', 'has_road_access', 'has_electricity', 'has_water_connection', 'is_waterfront',
+)
+FEATURE_FIELDS = (
+    'price', 'bedrooms', 'bathrooms', 'area_sqft', 'latitude', 'longitude',
+    'property_type', 'listing_type',
+) + AMENITIES
+
+WEIGHTS = {
+    'price': 2.0,
+    'rooms': 1.0,
+    'area': 1.0,
+    'location': 1.5,
+    'property_type': 2.0,
+    'listing_type': 3.0,
+    'amenities': 0.5,
+}
+
+
+def for_property(property_id, limit=3):
+    """Cards of the stored neighbours that are still available, closest first."""
+    return Property.objects.cards()\
+        .filter(neighbour_of__property_id=property_id, status='available')\
+        .order_by('neighbour_of__rank')[:limit]
+
+
+# ==========================================
+# FEATURES
+# ==========================================
+
+def _load():
+    return list(Property.objects.order_by('id').values_list('id', 'status', *FEATURE_FIELDS))
+
+
+def _numbers(values, log=False):
+    a = np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+    if log:
+        a = np.log1p(np.clip(a, 0, None))
+    return a
+
+
+def _zscore(a):
+    """Column-wise z-scores; NaNs (missing values) end up at 0, the mean."""
+    known = ~np.isnan(a)
+    count = np.maximum(known.sum(axis=0), 1)
+    mean = np.where(known, a, 0.0).sum(axis=0) / count
+    centered = np.where(known, a - mean, 0.0)
+    std = np.sqrt((centered ** 2).sum(axis=0) / count)
+    return centered / np.where(std > 0, std, 1.0)
+
+
+def _one_hot(values, choices):
+    return (np.array(values, dtype=object)[:, None] == np.array([c for c, _ in choices], dtype=object)[None, :])\
+        .astype(float)
+
+
+def features(rows):
+    """(ids, available mask, feature matrix) for rows from _load()."""
+    ids = np.array([r[0] for r in rows], dtype=np.int64)
+    available = np.array([r[1] == 'available' for r in rows], dtype=bool)
+    col = dict(zip(FEATURE_FIELDS, zip(*(r[2:] for r in rows))))
+
+    lat = np.radians(_numbers(col['latitude']))
+    lng = np.radians(_numbers(col['longitude']))
+    sphere = np.column_stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)])
+
+    matrix = np.hstack([
+        WEIGHTS['price'] * _zscore(_numbers(col['price'], log=True)[:, None]),
+        WEIGHTS['rooms'] * _zscore(np.column_stack([_numbers(col['bedrooms']), _numbers(col['bathrooms'])])),
+        WEIGHTS['area'] * _zscore(_numbers(col['area_sqft'], log=True)[:, None]),
+        WEIGHTS['location'] * _zscore(sphere),
+        WEIGHTS['property_type'] * _one_hot(col['property_type'], Property.PROPERTY_TYPES),
+        WEIGHTS['listing_type'] * _one_hot(col['listing_type'], Property.LISTING_TYPE),
+        WEIGHTS['amenities'] * np.column_stack([np.array(col[name], dtype=float) for name in AMENITIES]),
+    ])
+    return ids, available, matrix
+
+
+# ==========================================
+# NEIGHBOURS
+# ==========================================
+
+def _squared_distances(matrix, sq_norms, rows, cols):
+    """Squared Euclidean distances between matrix[rows] and matrix[cols], len(rows) x len(cols)."""
+    d2 = sq_norms[rows, None] + sq_norms[None, cols] - 2.0 * matrix[rows] @ matrix[cols].T
+    return np.clip(d2, 0.0, None, out=d2)
+
+
+def nearest(matrix, rows, candidates, k=K):
+    """
+    For each index in rows, its k nearest candidate indices and their
+    distances, closest first: {row: [(index, distance), ...]}.
+    A listing is never its own neighbour.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.flatnonzero(candidates)
+    result = {int(r): [] for r in rows}
+    if not len(cols) or not len(rows):
+        return result
+    sq_norms = (matrix ** 2).sum(axis=1)
+    for start in range(0, len(rows), BLOCK):
+        block = rows[start:start + BLOCK]
+        # Ranking on squared distances; the square root is only taken for the k kept
+        dist = _squared_distances(matrix, sq_norms, block, cols)
+        dist[block[:, None] == cols[None, :]] = np.inf
+        kk = min(k, len(cols))
+        top = np.argpartition(dist, kk - 1, axis=1)[:, :kk]
+        top_dist = np.take_along_axis(dist, top, axis=1)
+        order = np.argsort(top_dist, axis=1, kind='stable')
+        top, top_dist = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_dist, order, axis=1)
+        for row, picks, dists in zip(block, top, top_dist):
+            result[int(row)] = [(int(cols[c]), float(np.sqrt(d))) for c, d in zip(picks, dists) if np.isfinite(d)]
+    return result
+
+
+def _store(ids, neighbours, replace_all=False):
+    """Save neighbours ({row: [(index, distance)]}), replacing those listings' old lists."""
+    objs = [
+        SimilarProperty(property_id=int(ids[row]), neighbour_id=int(ids[col]), rank=rank, distance=dist)
+        for row, picks in neighbours.items()
+        for rank, (col, dist) in enumerate(picks)
+    ]
+    with transaction.atomic():
+        if replace_all:
+            SimilarProperty.objects.all().delete()
+        else:
+            SimilarProperty.objects.filter(property_id__in=[int(ids[row]) for row in neighbours]).delete()
+        SimilarProperty.objects.bulk_create(objs, batch_size=1000)
+    return len(neighbours)
+
+
+# ==========================================
+# MAINTENANCE
+# ==========================================
+
+def mark_stale(property_ids):
+    """Queue these listings for the next refresh_stale(); cheap enough for the request path."""
+    now = timezone.now()
+    SimilarityRefresh.objects.bulk_create(
+        [SimilarityRefresh(property_id=pk, queued_at=now) for pk in set(property_ids)],
+        update_conflicts=True, unique_fields=['property'], update_fields=['queued_at'],
+    )
+
+
+def refresh_stale():
+    """refresh() the queued listings. Returns the number of lists recomputed."""
+    started = timezone.now()
+    ids = list(SimilarityRefresh.objects.filter(queued_at__lte=started).values_list('property_id', flat=True))
+    if not ids:
+        return 0
+    count = refresh(ids)
+    # Listings queued again while this ran stay queued for the next run
+    SimilarityRefresh.objects.filter(property_id__in=ids, queued_at__lte=started).delete()
+    return count
+
+
+def rebuild():
+    """Recompute every listing's neighbours. Returns the number of listings."""
+    started = timezone.now()
+    rows = _load()
+    if not rows:
+        SimilarProperty.objects.all().delete()
+        return 0
+    ids, available, matrix = features(rows)
+    count = _store(ids, nearest(matrix, np.arange(len(ids)), available), replace_all=True)
+    SimilarityRefresh.objects.filter(queued_at__lte=started).delete()
+    return count
+
+
+def refresh(property_ids):
+    """
+    Bring the stored lists up to date after the given listings were
+    created or edited. Returns the number of lists recomputed.
+    """
+    property_ids = set(property_ids)
+    rows = _load()
+    if not rows or not property_ids:
+        return 0
+    ids, available, matrix = features(rows)
+    changed = np.array([i for i, pid in enumerate(ids) if pid in property_ids], dtype=np.int64)
+
+    # Lists that held a changed listing may have lost it or seen it move away
+    affected = set(SimilarProperty.objects.filter(neighbour_id__in=property_ids)
+                   .values_list('property_id', flat=True))
+    affected.update(int(ids[i]) for i in changed)
+
+    # Lists a changed (available) listing is now closer to than their current last entry
+    entering = changed[available[changed]]
+    if len(entering):
+        stored = {
+            pid: (n, worst) for pid, n, worst in SimilarProperty.objects.values('property_id')
+            .annotate(n=Count('id'), worst=Max('distance')).values_list('property_id', 'n', 'worst')
+        }
+        cutoff = np.array([
+            stored[pid][1] if pid in stored and stored[pid][0] >= K else np.inf for pid in ids.tolist()
+        ])
+        sq_norms = (matrix ** 2).sum(axis=1)
+        closest = np.sqrt(_squared_distances(matrix, sq_norms, entering, np.arange(len(ids))).min(axis=0))
+        affected.update(int(pid) for pid in ids[closest < cutoff])
+
+    if len(affected) > len(ids) // 2:
+        # Small catalogues, or a change that reaches most lists: cheaper to redo them all
+        return _store(ids, nearest(matrix, np.arange(len(ids)), available), replace_all=True)
+    rows = [i for i, pid in enumerate(ids) if int(pid) in affected]
+    return _store(ids, nearest(matrix, rows, available))
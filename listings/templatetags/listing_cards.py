@@ -0,0 +1,27 @@
+from django import template
+
+from listings import fragments
+
+register = template.Library()
+
+
+@register.simple_tag
+def load_cards(properties):
+    """
+    {% load_cards properties %} before the loop fetches every card on the
+    page in one cache round trip; {% property_card %} then just prints them.
+    """
+    fragments.load_cards(properties)
+    return ''
+
+
+@register.simple_tag
+def property_card(property):
+    """The cached card body for one listing. Per-user buttons go around it, not in it."""
+    return fragments.card(property)
+
+
+@register.simple_tag
+def detail_section(name, property):
+    """{% detail_section "gallery" property %}: a cached static section of the detail page."""
+    return fragments.section(name, property)
@@ -0,0 +1,28 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def rendition(image, spec='card'):
+    """
+    URL of a PropertyImage rendition: {{ img|rendition:"thumb" }} or {{ img|rendition:"card.webp" }}.
+    Falls back to the original upload until the renditions exist.
+    """
+    if not image:
+        return ''
+    size, _, fmt = spec.partition('.')
+    return image.rendition_url(size, fmt or 'jpeg')
+
+
+@register.inclusion_tag('properties/partials/picture.html')
+def picture(image, size='card', css_class='', alt='', height=None):
+    """<picture> with a WebP source and JPEG fallback for one rendition size."""
+    return {
+        'image': image,
+        'webp': image.rendition_url(size, 'webp') if image and image.renditions_ready else '',
+        'src': image.rendition_url(size) if image else '',
+        'css_class': css_class,
+        'alt': alt,
+        'height': height,
+    }
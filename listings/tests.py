@@ -1,3 +1,528 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from booking.models import Agent, BookingSettings
+from core import kpi
+from . import clustering, fragments, geo, importer, pricing, renditions, search, similarity, tracking
+from .models import Favorite, MarketStats, PricingHistory, Property, PropertyImage, SimilarityRefresh
+
+
+class MapClusterTests(TestCase):
+    def test_huge_viewport_at_high_zoom_is_rejected_without_enumerating_tiles(self):
+        with self.assertRaises(ValueError):
+            clustering.tiles_for_bbox(-10, -10, 10, 10, 20, limit=clustering.MAX_TILES)
+        response = self.client.get('/map/clusters/', {'bbox': '-10,-10,10,10', 'zoom': 20})
+        self.assertEqual(response.status_code, 400)
+
+    def test_small_viewport_is_answered(self):
+        response = self.client.get('/map/clusters/', {'bbox': '51.5,-0.2,51.52,-0.1', 'zoom': 12})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 0)
+
+
+class NearbySearchTests(TestCase):
+    def test_cells_cover_a_circle_around_the_pole(self):
+        # 10km from (89.95, 0) across the pole lands at longitude 180
+        cells = geo.covering_cells(89.95, 0, 10)
+        self.assertTrue(any(geo.encode(89.99, 180).startswith(cell) for cell in cells))
+
+    def test_radius_must_be_finite_and_positive(self):
+        for radius in (float('nan'), float('inf'), 0, -5):
+            with self.assertRaises(ValueError):
+                geo.covering_cells(-1.29, 36.8, radius)
+        response = self.client.get('/nearby/', {'lat': '-1.29', 'lng': '36.8', 'radius': 'nan'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['radius'], 10)
+
+
+class SearchTests(TestCase):
+    def test_title_hits_rank_first_and_the_cursor_walks_every_hit(self):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        for title, description in [('Flat', 'near the lake'), ('Lake House', 'x'), ('Villa', 'x'), ('Cottage', 'lakeside')]:
+            Property.objects.create(
+                title=title, description=description, property_type='house', price=1000,
+                address='Karen Rd', city='Nairobi', state='Nairobi', owner=owner,
+            )
+        seen, url, params = [], '/api/properties/search/', {'q': 'lake', 'fields': 'title', 'page_size': 1}
+        while url:
+            data = self.client.get(url, params).json()
+            seen += [row['title'] for row in data['results']]
+            url, params = data['next'], None
+        self.assertEqual(seen[0], 'Lake House')
+        self.assertCountEqual(seen, ['Lake House', 'Flat', 'Cottage'])
+
+    def test_missing_triggers_fall_back_to_icontains_until_repaired(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER {search.TRIGGERS[0]}')
+        search._availability.clear()
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        Property.objects.create(
+            title='Lake House', description='x', property_type='house', price=1000,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=owner,
+        )
+        # Not indexed: the insert trigger is gone
+        results = search.search(Property.objects.all(), 'lake')
+        self.assertNotIn('search_rank', results.query.annotations)
+        self.assertEqual(results.count(), 1)
+
+        self.assertTrue(search.repair_index(connection))
+        results = search.search(Property.objects.all(), 'lake')
+        self.assertIn('search_rank', results.query.annotations)
+        self.assertEqual(results.count(), 1)
+        self.assertFalse(search.repair_index(connection))
+
+
+class ViewTrackingTests(TestCase):
+    def test_flushed_views_keep_the_time_they_happened(self):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        listing = Property.objects.create(
+            title='Garden Villa', description='x', property_type='villa', price=1000,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=owner,
+        )
+        tracking.discard()  # views buffered by earlier tests
+        self.client.get(f'/property/{listing.pk}/')
+        viewed_at = tracking._buffer[-1][3]
+        self.assertEqual(tracking.flush(), 1)
+        self.assertEqual(listing.views.get().viewed_at, viewed_at)
+        self.assertEqual(listing.daily_views.get().views, 1)
+
+
+@override_settings(MEDIA_ROOT='/tmp/listings-tests-media')
+class RenditionTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        self.listing = Property.objects.create(
+            title='Garden Villa', description='x', property_type='villa', price=1000,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=owner,
+        )
+
+    def upload(self, filename, pil_format):
+        buffer = BytesIO()
+        Image.new('RGB', (40, 30), 'green').save(buffer, pil_format)
+        with self.captureOnCommitCallbacks(execute=True):
+            return PropertyImage.objects.create(
+                property=self.listing, image=SimpleUploadedFile(filename, buffer.getvalue()),
+            )
+
+    def test_same_stem_different_extension_and_cleanup_on_delete(self):
+        jpg, png = self.upload('house.jpg', 'JPEG'), self.upload('house.png', 'PNG')
+        jpg_card, png_card = (renditions.rendition_name(i.image.name, 'card') for i in (jpg, png))
+        self.assertNotEqual(jpg_card, png_card)
+        self.assertTrue(default_storage.exists(jpg_card) and default_storage.exists(png_card))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jpg.delete()
+        self.assertFalse(default_storage.exists(jpg_card))
+        self.assertTrue(default_storage.exists(png_card))
+
+
+@override_settings(MEDIA_ROOT='/tmp/listings-tests-media')
+class PropertyApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        agent = Agent.objects.create(user=owner, name='Jane Agent')
+        for i in range(25):
+            listing = Property.objects.create(
+                title=f'Listing {i}', description='x', property_type='house', price=1000 + i,
+                address='Karen Rd', city='Nairobi', state='Nairobi', owner=owner, agent=agent,
+            )
+            for primary in (True, False):
+                PropertyImage.objects.create(
+                    property=listing, is_primary=primary, renditions_ready=True,
+                    image=SimpleUploadedFile(f'p{i}.jpg', b'not really a jpeg', content_type='image/jpeg'),
+                )
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        fields = 'id,title,price,primary_image,images,agent'
+        for size in (1, 5, 20):
+            # One query for the page and one prefetch for the images, whatever the size
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/properties/', {'fields': fields, 'page_size': size})
+            results = response.json()['results']
+            self.assertEqual(len(results), size)
+            self.assertEqual(set(results[0]), set(fields.split(',')))
+            self.assertEqual(len(results[0]['images']), 2)
+
+    def test_sparse_fields_defer_unrequested_columns(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/properties/', {'fields': 'title'})
+        self.assertEqual(set(response.json()['results'][0]), {'title'})
+
+    def test_malformed_filters_are_a_bad_request(self):
+        for params in ({'min_price': 'abc'}, {'max_price': 'nan'}, {'property_type': 'castle'}):
+            self.assertEqual(self.client.get('/api/properties/', params).status_code, 400)
+        self.assertEqual(self.client.get('/api/properties/abc/price-history/').status_code, 404)
+        response = self.client.get('/api/properties/', {'min_price': '1020', 'max_price': '', 'fields': 'price'})
+        self.assertEqual(len(response.json()['results']), 5)
+
+    def test_agent_contact_details_are_not_published(self):
+        listing = Property.objects.first()
+        agent = self.client.get(f'/api/properties/{listing.pk}/', {'fields': 'agent'}).json()['agent']
+        self.assertEqual(agent, {'name': 'Jane Agent'})
+
+    def test_cursor_walks_every_row_once(self):
+        seen, url, params = [], '/api/properties/', {'fields': 'id', 'sort': 'price', 'page_size': 7}
+        while url:
+            data = self.client.get(url, params).json()
+            seen += [row['id'] for row in data['results']]
+            url, params = data['next'], None
+        self.assertEqual(seen, list(Property.objects.order_by('price', 'id').values_list('id', flat=True)))
+
+
+@override_settings(MEDIA_ROOT='/tmp/listings-tests-media')
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('viewer', 'viewer@example.com', 'pw')
+        self.listing = Property.objects.create(
+            title='Garden Villa', description='x', property_type='villa', price=1000,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=self.user,
+        )
+        self.url = f'/property/{self.listing.pk}/'
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code
+
+    def test_unchanged_pages_answer_304(self):
+        for url in ('/', self.url):
+            response = self.client.get(url)
+            self.assertEqual(self.revalidate(url, response), 304)
+
+    def test_edits_and_image_changes_invalidate(self):
+        response = self.client.get(self.url)
+        self.listing.save()
+        self.assertEqual(self.revalidate(self.url, response), 200)
+
+        response = self.client.get('/')
+        PropertyImage.objects.create(
+            property=self.listing, image=SimpleUploadedFile('a.jpg', b'x', content_type='image/jpeg'),
+        )
+        self.assertEqual(self.revalidate('/', response), 200)
+
+    def test_validators_are_per_user(self):
+        anonymous = self.client.get('/')
+        self.client.force_login(self.user)
+        self.assertEqual(self.revalidate('/', anonymous), 200)
+
+        mine = self.client.get('/')
+        Favorite.objects.create(user=self.user, property=self.listing)
+        self.assertEqual(self.revalidate('/', mine), 200)
+
+
+@override_settings(MEDIA_ROOT='/tmp/listings-tests-media')
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        fragments.discard()
+        self.user = User.objects.create_user('viewer', 'viewer@example.com', 'pw')
+        self.listing = Property.objects.create(
+            title='Garden Villa', description='x', property_type='villa', price=1000,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=self.user,
+        )
+
+    def test_cards_are_reused_until_the_listing_changes(self):
+        self.client.get('/')
+        self.assertEqual(fragments.stats()['misses'], 1)
+        self.client.get('/')
+        self.assertEqual(fragments.stats()['hits'], 1)
+
+        self.listing.title = 'Hillside Villa'
+        self.listing.save()
+        self.assertContains(self.client.get('/'), 'Hillside Villa')
+        self.assertEqual(fragments.stats()['misses'], 2)
+
+    def test_counts_reach_the_cache_only_when_flushed(self):
+        self.client.get('/')
+        self.client.get('/')
+        self.assertIsNone(cache.get('fragments:hits'))
+        fragments.flush()
+        self.assertEqual(cache.get_many(['fragments:hits', 'fragments:misses']),
+                         {'fragments:hits': 1, 'fragments:misses': 1})
+        self.assertEqual(fragments.stats()['hits'], 1)
+
+    def test_favorite_heart_is_outside_the_cached_card(self):
+        self.client.get('/')
+        Favorite.objects.create(user=self.user, property=self.listing)
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get('/'), 'bi-heart-fill')
+        self.assertEqual(fragments.stats()['hits'], 1)
+
+
+class SimilarityTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        self.houses = [self.listing(f'House {i}', 'house', 5_000_000 + i * 100_000, bedrooms=3) for i in range(8)]
+        self.flats = [self.listing(f'Flat {i}', 'apartment', 40_000 + i * 1_000, listing_type='rent', bedrooms=1)
+                      for i in range(8)]
+        similarity.rebuild()
+
+    def listing(self, title, property_type, price, **extra):
+        return Property.objects.create(
+            title=title, description='x', property_type=property_type, price=price,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=self.owner,
+            latitude=-1.3, longitude=36.7, **extra,
+        )
+
+    def similar_titles(self, listing):
+        return [p.title for p in similarity.for_property(listing.pk, limit=similarity.K)]
+
+    def test_neighbours_share_type_and_exclude_self(self):
+        titles = self.similar_titles(self.houses[0])
+        self.assertEqual(len(titles), similarity.K)
+        self.assertNotIn('House 0', titles)
+        self.assertTrue(all(t.startswith('House') for t in titles))
+
+    def test_new_and_sold_listings_update_existing_lists(self):
+        twin = self.listing('Twin', 'apartment', 40_000, listing_type='rent', bedrooms=1)
+        self.assertNotIn('Twin', self.similar_titles(self.flats[0]))  # queued, not computed in the request
+        similarity.refresh_stale()
+        self.assertEqual(self.similar_titles(self.flats[0])[0], 'Twin')
+        self.assertIn('Flat 0', self.similar_titles(twin))
+
+        twin.status = 'sold'
+        twin.save()
+        similarity.refresh_stale()
+        self.assertNotIn('Twin', self.similar_titles(self.flats[0]))
+        self.assertFalse(SimilarityRefresh.objects.exists())
+
+    def test_deleted_listing_is_replaced(self):
+        neighbour = similarity.for_property(self.houses[0].pk)[0]
+        neighbour.delete()
+        call_command('rebuild_similar', stale=True, stdout=StringIO())
+        self.assertEqual(len(self.similar_titles(self.houses[0])), similarity.K)
+
+
+class PriceHistoryTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        self.listing = Property.objects.create(
+            title='Garden Villa', description='x', property_type='villa', price=1000,
+            address='Karen Rd', city='Nairobi', state='Nairobi', owner=self.owner,
+        )
+
+    def test_saves_and_bulk_changes_are_recorded(self):
+        self.listing.title = 'Renamed'
+        self.listing.save()
+        self.assertFalse(PricingHistory.objects.exists())
+
+        self.listing.price = 1100
+        self.listing.save()
+        self.assertEqual(pricing.change_prices({self.listing.pk: 1210}, reason='bulk'), 1)
+        self.assertEqual(
+            [price for _, price in pricing.series(self.listing)], [1000, 1100, 1210],
+        )
+        response = self.client.get(f'/api/properties/{self.listing.pk}/price-history/')
+        self.assertEqual(len(response.json()['points']), 3)
+
+    def test_bulk_changes_adjust_the_portfolio_value_and_their_own_market_group(self):
+        MarketStats.objects.create(city='Kisumu', property_type='villa', listing_type='sale', listings=7,
+                                   price_p25=1, median_price=1, price_p75=1)
+        kpi.refresh()
+        pricing.change_prices({self.listing.pk: 1500})
+        self.assertEqual(kpi.snapshot().portfolio_value, 1500)
+        self.assertEqual(MarketStats.objects.get(city='Nairobi').median_price, 1500)
+        self.assertEqual(MarketStats.objects.get(city='Kisumu').listings, 7)
+
+    def test_city_index_chains_monthly_changes(self):
+        pricing.change_prices({self.listing.pk: 1100})
+        index = self.client.get('/api/price-index/', {'city': 'nairobi'}).json()
+        self.assertAlmostEqual(index['Nairobi'][-1]['index'], 110.0)
+
+    def test_compaction_keeps_the_series_continuous(self):
+        for price in (1100, 1200, 1300):
+            pricing.change_prices({self.listing.pk: price})
+        PricingHistory.objects.update(changed_at=timezone.now() - timedelta(days=pricing.RETENTION_DAYS + 40))
+        self.assertEqual(pricing.compact(), 2)
+        row = PricingHistory.objects.get()
+        self.assertEqual((row.old_price, row.new_price), (1000, 1300))
+
+
+class MarketStatsTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+
+    def listing(self, price, area, city='Nairobi'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Property.objects.create(
+                title='House', description='x', property_type='house', price=price, area_sqft=area,
+                address='Karen Rd', city=city, state='Nairobi', owner=self.owner,
+            )
+
+    def test_groups_follow_listing_changes(self):
+        first = self.listing(100, 10)
+        self.listing(300, 10)
+        stats = MarketStats.objects.get(city='Nairobi')
+        self.assertEqual((stats.listings, stats.median_price, stats.median_price_per_sqft), (2, 200, 20))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.city = 'Mombasa'
+            first.save()
+        self.assertEqual(MarketStats.objects.get(city='Nairobi').median_price, 300)
+        self.assertEqual(MarketStats.objects.get(city='Mombasa').listings, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertFalse(MarketStats.objects.filter(city='Mombasa').exists())
+
+    def test_listing_page_reads_the_table(self):
+        self.listing(100, 10)
+        self.assertContains(self.client.get('/', {'city': 'nairobi'}), 'Market in Nairobi')
+
+    def test_admin_status_actions_touch_only_the_selected_groups(self):
+        sold = self.listing(100, 10)
+        self.listing(300, 10)
+        MarketStats.objects.create(city='Kisumu', property_type='house', listing_type='sale', listings=7,
+                                   price_p25=1, median_price=1, price_p75=1)
+        kpi.refresh()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.client.post('/admin/listings/property/', {'action': 'mark_as_sold', '_selected_action': [sold.pk]})
+        self.assertEqual(MarketStats.objects.get(city='Nairobi').listings, 1)
+        self.assertEqual(MarketStats.objects.get(city='Kisumu').listings, 7)
+        snapshot = kpi.snapshot()
+        self.assertEqual((snapshot.active_listings, snapshot.portfolio_value), (1, 300))
+
+
+@override_settings(MEDIA_ROOT='/tmp/listings-tests-media')
+class ImportListingsTests(TestCase):
+    HEADER = 'external_ref,title,description,property_type,price,address,city,state,has_parking,images\n'
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        Image.new('RGB', (40, 30), 'green').save(os.path.join(self.dir, 'front.jpg'), 'JPEG')
+
+    def run_import(self, rows, **options):
+        path = os.path.join(self.dir, 'feed.csv')
+        with open(path, 'w') as f:
+            f.write(self.HEADER + ''.join(rows))
+        call_command('import_listings', path, owner='owner', batch_size=2, stdout=StringIO(),
+                     stderr=StringIO(), **options)
+
+    def test_import_then_reimport_updates_by_reference(self):
+        self.run_import([
+            'A1,Villa,x,villa,100,Karen Rd,Nairobi,Nairobi,yes,front.jpg\n',
+            'A2,Flat,x,apartment,50,Moi Ave,Mombasa,Mombasa,0,\n',
+            'A3,Bad,x,castle,50,Moi Ave,Mombasa,Mombasa,0,\n',
+        ])
+        villa = Property.objects.get(external_ref='A1')
+        self.assertEqual(Property.objects.count(), 2)
+        self.assertTrue(villa.has_parking)
+        self.assertFalse(Property.objects.get(external_ref='A2').has_parking)
+        self.assertEqual(villa.primary_image, villa.images.get())
+        self.assertEqual(BookingSettings.objects.filter(listing__external_ref__isnull=False).count(), 2)
+        self.assertTrue(MarketStats.objects.filter(city='Mombasa').exists())
+
+        self.run_import(['A1,Villa,x,villa,120,Karen Rd,Nairobi,Nairobi,yes,front.jpg\n'])
+        villa.refresh_from_db()
+        self.assertEqual((Property.objects.count(), villa.price, villa.images.count()), (2, 120, 1))
+        self.assertEqual(list(villa.price_history.values_list('old_price', 'new_price')), [(100, 120)])
+
+    def test_reimport_leaves_columns_missing_from_the_feed_alone(self):
+        path = os.path.join(self.dir, 'feed.jsonl')
+        with open(path, 'w') as f:
+            f.write(json.dumps({
+                'external_ref': 'A1', 'title': 'Villa', 'description': 'x', 'property_type': 'villa',
+                'price': 100, 'address': 'Karen Rd', 'city': 'Nairobi', 'state': 'Nairobi', 'status': 'sold',
+                'has_parking': 'yes', 'latitude': -1.3, 'longitude': 36.7,
+            }) + '\n')
+        call_command('import_listings', path, owner='owner', stdout=StringIO(), stderr=StringIO())
+        with open(path, 'w') as f:
+            f.write(json.dumps({'external_ref': 'A1', 'price': 130}) + '\n')
+        call_command('import_listings', path, owner='owner', stdout=StringIO(), stderr=StringIO())
+
+        villa = Property.objects.get(external_ref='A1')
+        self.assertEqual((villa.price, villa.status, villa.has_parking), (130, 'sold', True))
+        self.assertEqual((float(villa.latitude), float(villa.longitude)), (-1.3, 36.7))
+        self.assertTrue(villa.geohash)
+
+    def test_dry_run_writes_nothing(self):
+        self.run_import(['A1,Villa,x,villa,100,Karen Rd,Nairobi,Nairobi,yes,\n'], dry_run=True)
+        self.assertFalse(Property.objects.exists())
+
+    def test_images_outside_the_images_dir_reject_the_row(self):
+        with open(os.path.join(self.dir, 'notes.jpg'), 'w') as f:
+            f.write('not an image')
+        self.run_import([
+            'A1,Villa,x,villa,100,Karen Rd,Nairobi,Nairobi,yes,/etc/passwd\n',
+            'A2,Flat,x,apartment,50,Moi Ave,Mombasa,Mombasa,0,../front.jpg\n',
+            'A3,Cabin,x,villa,70,Moi Ave,Mombasa,Mombasa,0,notes.jpg\n',
+        ])
+        # The traversals are row errors; a file that isn't an image is skipped
+        cabin = Property.objects.get()
+        self.assertEqual((cabin.external_ref, cabin.images.count()), ('A3', 0))
+
+    def test_bad_jsonl_lines_are_row_errors(self):
+        path = os.path.join(self.dir, 'feed.jsonl')
+        with open(path, 'w') as f:
+            f.write('{"external_ref": "A1", "title": \n[1, 2]\n' + json.dumps({
+                'external_ref': 'A2', 'title': 'Flat', 'description': 'x', 'property_type': 'apartment',
+                'price': 50, 'address': 'Moi Ave', 'city': 'Mombasa', 'state': 'Mombasa',
+            }) + '\n')
+        result = importer.Importer(self.owner).run(importer.read_rows(path))
+        self.assertEqual([line for line, _ in result.errors], [1, 2])
+        self.assertEqual(result.created, 1)
+
+    def test_derived_data_is_refreshed_for_the_touched_listings_only(self):
+        self.run_import(['A1,Villa,x,villa,100,Karen Rd,Nairobi,Nairobi,yes,\n'])
+        villa = Property.objects.get()
+        self.assertEqual(list(SimilarityRefresh.objects.values_list('property_id', flat=True)), [villa.pk])
+        MarketStats.objects.create(city='Kisumu', property_type='villa', listing_type='sale', listings=7,
+                                   price_p25=1, median_price=1, price_p75=1)
+        self.run_import(['A1,Villa,x,villa,150,Karen Rd,Nairobi,Nairobi,yes,\n'])
+        self.assertEqual(MarketStats.objects.get(city='Kisumu').listings, 7)
+        self.assertEqual(MarketStats.objects.get(city='Nairobi').median_price, 150)
+
+
+class AnalyticsApiTests(TestCase):
+    def test_far_out_months_are_clamped(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        for params in ({'end': '9999-12'}, {'start': '0001-01', 'end': '0001-12'}):
+            response = self.client.get('/admin/listings/property/analytics/', params)
+            self.assertEqual(response.status_code, 200)
+
+
+class AdminExportTests(TestCase):
+    def setUp(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        owner = User.objects.create_user('owner', 'owner@example.com', 'pw')
+        for i, status in enumerate(['available', 'available', 'sold']):
+            Property.objects.create(
+                title=f'Listing {i}', description='x', property_type='house', price=1000, status=status,
+                address='Karen Rd', city='Nairobi', state='Nairobi', owner=owner,
+            )
+        self.client.force_login(admin_user)
+
+    def test_export_follows_the_changelist_filters(self):
+        response = self.client.get('/admin/listings/property/export/csv/', {'status__exact': 'available'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn('owner', lines[0].split(','))
+        self.assertTrue(all(',owner,' in line for line in lines[1:]))
+
+    def test_csv_cells_that_look_like_formulas_are_quoted(self):
+        Property.objects.filter(title='Listing 0').update(title='=HYPERLINK("http://evil")', price=-5)
+        response = self.client.get('/admin/listings/property/export/csv/', {'status__exact': 'available'})
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('"\'=HYPERLINK(""http://evil"")"', content)
+        self.assertIn(',-5.00,', content)
+
+    def test_export_action_streams_the_selection(self):
+        pk = Property.objects.get(title='Listing 2').pk
+        response = self.client.post('/admin/listings/property/', {'action': 'export_jsonl', '_selected_action': [pk]})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([(r['id'], r['status'], r['owner']) for r in rows], [(pk, 'sold', 'owner')])
@@ -0,0 +1,117 @@
+"""
+Buffered PropertyView tracking.
+
+property_detail calls record_view(), which only appends to an in-process
+buffer. The buffer is flushed once it holds FLUSH_SIZE events (by that
+request) or is FLUSH_INTERVAL seconds old (by a timer thread, so a quiet
+site still writes its views out), and at interpreter exit. A flush is one
+bulk_create for the raw PropertyView rows, each stamped with the time of
+the view, plus one upsert that adds the batch's counts to
+PropertyDailyViews. A popular listing therefore costs one counter write
+per flush rather than one INSERT per page view.
+
+The test runner turns the timer off (FLUSH_INTERVAL = None) and discard()s
+whatever is left, so nothing is written into the real database at exit.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Property, PropertyDailyViews, PropertyView
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = getattr(settings, 'PROPERTY_VIEW_FLUSH_SIZE', 200)
+FLUSH_INTERVAL = getattr(settings, 'PROPERTY_VIEW_FLUSH_INTERVAL', 10)
+
+_lock = threading.Lock()
+_buffer = []
+_timer = None
+
+
+def record_view(property_obj, request):
+    """Queue one view of property_obj; may trigger a flush of the whole buffer."""
+    user_id = request.user.pk if request.user.is_authenticated else None
+    event = (property_obj.pk, user_id, request.META.get('REMOTE_ADDR'), timezone.now())
+    with _lock:
+        _buffer.append(event)
+        if len(_buffer) == 1:
+            _start_timer()
+        due = len(_buffer) >= FLUSH_SIZE
+    if due:
+        flush()
+
+
+def _start_timer():
+    # Called with _lock held, for the first event of a batch
+    global _timer
+    if FLUSH_INTERVAL and _timer is None:
+        _timer = threading.Timer(FLUSH_INTERVAL, _flush_on_timer)
+        _timer.daemon = True
+        _timer.start()
+
+
+def _flush_on_timer():
+    global _timer
+    with _lock:
+        _timer = None
+    try:
+        flush()
+    finally:
+        connection.close()  # this thread's own connection
+
+
+def flush():
+    """Write out everything buffered so far. Returns the number of events written."""
+    global _buffer
+    with _lock:
+        events, _buffer = _buffer, []
+    if not events:
+        return 0
+    try:
+        _write(events)
+    except Exception:
+        logger.exception("Dropping %s buffered property views", len(events))
+        return 0
+    return len(events)
+
+
+def _write(events):
+    # Listings deleted since the view was buffered would fail the FK checks
+    live = set(Property.objects.filter(pk__in={e[0] for e in events}).values_list('pk', flat=True))
+    events = [e for e in events if e[0] in live]
+    daily = Counter((property_id, timezone.localdate(viewed_at)) for property_id, _, _, viewed_at in events)
+    rows = [
+        PropertyView(property_id=property_id, user_id=user_id, viewer_ip=ip, viewed_at=viewed_at)
+        for property_id, user_id, ip, viewed_at in events
+    ]
+    table = PropertyDailyViews._meta.db_table
+    with transaction.atomic():
+        PropertyView.objects.bulk_create(rows, batch_size=500)
+        with connection.cursor() as cursor:
+            # Add to the counter instead of overwriting it (SQLite >= 3.24 and PostgreSQL)
+            cursor.executemany(
+                f"INSERT INTO {table} (property_id, date, views) VALUES (%s, %s, %s) "
+                f"ON CONFLICT (property_id, date) DO UPDATE SET views = {table}.views + excluded.views",
+                [(property_id, day.isoformat(), count) for (property_id, day), count in daily.items()],
+            )
+
+
+def pending():
+    with _lock:
+        return len(_buffer)
+
+
+def discard():
+    """Drop the buffered events without writing them (tests)."""
+    global _buffer
+    with _lock:
+        _buffer = []
+
+
+atexit.register(flush)
@@ -7,6 +7,7 @@ urlpatterns = [
     path('search/', views.property_search, name='property_search'),
     path('property/<int:pk>/', views.property_detail, name='property_detail'),
     path('map/', views.property_map_search, name='property_map_search'),
+    path('map/clusters/', views.property_map_clusters, name='property_map_clusters'),
     path('nearby/', views.property_nearby_search, name='property_nearby_search'),
 
     # User Personal
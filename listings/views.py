@@ -1,26 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator
-from django.db.models import Q, Exists, OuterRef
+from django.db.models import Exists, OuterRef
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import condition, require_POST
+from django.utils.cache import patch_cache_control
 import math
 
 from .models import Property, Inquiry, Favorite
 from .forms import InquiryForm
+from .pagination import CursorPaginator, cached_count
+from . import geo, clustering, conditional, facets, market, search, similarity, tracking
 from booking.forms import BookingForm
 
+PAGE_SIZE = 12
+SORT_OPTIONS = ['price', '-price', 'created_at', '-created_at']
+FILTER_PARAMS = ['q', 'property_type', 'city', 'min_price', 'max_price']
+MAP_SIDEBAR_SIZE = 30
+
 # ==========================================
 # 1. PUBLIC BROWSING
 # ==========================================
 
+@condition(etag_func=conditional.list_etag, last_modified_func=conditional.list_last_modified)
 def property_list(request):
     """Main public browsing page."""
-    queryset = Property.objects.filter(status='available')\
-        .select_related('owner')\
-        .prefetch_related('images')\
-        .order_by('-created_at')
+    queryset = Property.objects.cards().filter(status='available')
     
     # Efficient Favorite Check
     if request.user.is_authenticated:
@@ -28,9 +34,9 @@ def property_list(request):
         queryset = queryset.annotate(is_favorited=Exists(is_fav))
     
     # Search & Filters
-    query = request.GET.get('q')
+    query = request.GET.get('q', '').strip()
     if query:
-        queryset = queryset.filter(Q(title__icontains=query) | Q(city__icontains=query))
+        queryset = search.search(queryset, query)
     
     if request.GET.get('property_type'):
         queryset = queryset.filter(property_type=request.GET.get('property_type'))
@@ -41,36 +47,54 @@ def property_list(request):
     if request.GET.get('max_price'):
         queryset = queryset.filter(price__lte=request.GET.get('max_price'))
         
-    # Sort
-    sort_by = request.GET.get('sort', '-created_at')
-    if sort_by in ['price', '-price', 'created_at', '-created_at']:
-        queryset = queryset.order_by(sort_by)
+    # Sort (id breaks ties so both paginators see a stable order)
+    sort_by = request.GET.get('sort')
+    if sort_by in SORT_OPTIONS:
+        ordering = sort_by
+    elif query and 'search_rank' in queryset.query.annotations:
+        ordering = 'search_rank'
+    else:
+        ordering = '-created_at'
+    queryset = queryset.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+
+    # Cursor mode (opt-in via ?paginate=cursor) seeks on (sort key, id) instead of OFFSET
+    if 'cursor' in request.GET or request.GET.get('paginate') == 'cursor':
+        page_obj = CursorPaginator(queryset, PAGE_SIZE, ordering).get_page(request.GET.get('cursor'))
+        filters = {k: v for k, v in request.GET.items() if k in FILTER_PARAMS}
+        total_count = cached_count(queryset, filters)
+    else:
+        paginator = Paginator(queryset, PAGE_SIZE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        total_count = paginator.count
 
-    paginator = Paginator(queryset, 12) 
-    page_obj = paginator.get_page(request.GET.get('page'))
-    
     context = {
         'properties': page_obj,
-        'total_count': queryset.count(),
-        'property_types': Property.PROPERTY_TYPES,
-        'cities': Property.objects.filter(status='available').values_list('city', flat=True).distinct(),
+        'total_count': total_count,
+        **facets.sidebar(request),
+        # Read from the maintained table, never aggregated here (listings.market)
+        'market_stats': market.for_city(request.GET['city'], request.GET.get('property_type'))
+                        if request.GET.get('city') else None,
     }
-    return render(request, 'properties/property_list.html', context)
+    response = render(request, 'properties/property_list.html', context)
+    # Per user (favorites), and always revalidated; see listings.conditional
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 def property_search(request):
     return property_list(request)
 
+@condition(etag_func=conditional.detail_etag)
 def property_detail(request, pk):
     """Public property detail page."""
     property_obj = get_object_or_404(
-        Property.objects.select_related('owner').prefetch_related('images'), 
+        Property.objects.select_related('owner', 'primary_image', 'booking_settings'),
         pk=pk
     )
     
-    # View Counter (Session based)
+    # View Counter (Session based, buffered and written in batches)
     session_key = f'viewed_property_{pk}'
     if not request.session.get(session_key, False):
-        # property_obj.views.create(...) # If you track analytics
+        tracking.record_view(property_obj, request)
         request.session[session_key] = True
 
     # Inquiry Form Logic
@@ -96,6 +120,7 @@ def property_detail(request, pk):
     booking_enabled = hasattr(property_obj, 'booking_settings') and property_obj.booking_settings.is_active
     
     if booking_enabled:
+        # Cached per listing until one of its bookings changes
         suggested_slots = property_obj.booking_settings.get_available_slots()
 
     is_favorited = False
@@ -109,9 +134,11 @@ def property_detail(request, pk):
         'booking_enabled': booking_enabled,
         'suggested_slots': suggested_slots[:4],
         'is_favorited': is_favorited,
-        'similar_properties': Property.objects.filter(city=property_obj.city).exclude(pk=pk)[:3]
+        'similar_properties': similarity.for_property(pk),
     }
-    return render(request, 'properties/property_detail.html', context)
+    response = render(request, 'properties/property_detail.html', context)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 # ==========================================
 # 2. USER ACTIONS (Favorites & Profile)
@@ -129,13 +156,15 @@ def toggle_favorite(request, pk):
 
 @login_required
 def favorite_list(request):
-    favorites = Favorite.objects.filter(user=request.user).select_related('property')
-    return render(request, 'properties/favorites.html', {'properties': [f.property for f in favorites]})
+    properties = Property.objects.cards().filter(favorited_by__user=request.user)\
+        .order_by('-favorited_by__created_at')
+    return render(request, 'properties/favorites.html', {'properties': properties})
 
 @login_required
 def inquiry_list(request):
     """User sees inquiries they have SENT."""
-    inquiries = Inquiry.objects.filter(user=request.user).order_by('-created_at')
+    inquiries = Inquiry.objects.filter(user=request.user)\
+        .select_related('property__primary_image').order_by('-created_at')
     return render(request, 'properties/inquiry_list.html', {'inquiries': inquiries})
 
 # ==========================================
@@ -143,9 +172,66 @@ def inquiry_list(request):
 # ==========================================
 
 def property_map_search(request):
-    properties = Property.objects.filter(status='available')
-    return render(request, 'properties/property_map_search.html', {'properties': properties})
+    """Map page; markers come from property_map_clusters, the sidebar shows the newest listings."""
+    queryset = Property.objects.filter(status='available')
+    properties = queryset.cards()[:MAP_SIDEBAR_SIZE]
+    return render(request, 'properties/property_map_search.html', {
+        'properties': properties,
+        'total_count': queryset.count(),
+    })
+
+def property_map_clusters(request):
+    """
+    JSON clusters for the visible map area.
+    Expects ?bbox=south,west,north,east&zoom=N; results are cached per map tile.
+    """
+    try:
+        south, west, north, east = (float(v) for v in request.GET['bbox'].split(','))
+        zoom = int(request.GET['zoom'])
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'bbox and zoom are required'}, status=400)
+    if not (0 <= zoom <= clustering.MAX_ZOOM and -90 <= south < north <= 90 and -180 <= west < east <= 180):
+        return JsonResponse({'error': 'Invalid bbox or zoom'}, status=400)
+
+    try:
+        clusters = clustering.get_clusters(south, west, north, east, zoom)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = JsonResponse({
+        'zoom': zoom,
+        'count': sum(c['count'] for c in clusters),
+        'clusters': clusters,
+    })
+    patch_cache_control(response, public=True, max_age=60)
+    return response
 
 def property_nearby_search(request):
-    # (Keep your distance logic here)
-    return render(request, 'properties/property_nearby.html', {})
\ No newline at end of file
+    """
+    Properties around the browser's ?lat=&lng= position.
+    Radius search by default (?radius= in miles); ?k= switches to k-nearest.
+    """
+    try:
+        radius = min(geo.validate_radius(float(request.GET.get('radius', 10))), 300)
+    except ValueError:
+        radius = 10
+    context = {'radius': radius, 'nearby_properties': []}
+
+    try:
+        lat = float(request.GET['lat'])
+        lng = float(request.GET['lng'])
+    except (KeyError, ValueError):
+        return render(request, 'properties/property_nearby.html', context)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return render(request, 'properties/property_nearby.html', context)
+
+    queryset = Property.objects.cards().filter(status='available')
+    if request.GET.get('k', '').isdigit():
+        nearby = geo.nearest(queryset, lat, lng, min(int(request.GET['k']), 50))
+    else:
+        nearby = list(geo.within_radius(queryset, lat, lng, radius * geo.KM_PER_MILE)[:50])
+
+    for prop in nearby:
+        prop.distance_miles = round(prop.distance_km / geo.KM_PER_MILE, 1)
+    context['nearby_properties'] = nearby
+    return render(request, 'properties/property_nearby.html', context)
\ No newline at end of file
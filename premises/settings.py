@@ -52,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover everything below; samples QUERY_STATS_SAMPLE_RATE of requests
+    'core.middleware.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -96,6 +98,41 @@ DATABASES = {
 }
 
 
+# Cache
+# Per-process LRU (core.cache_backends.TieredCache) in front of a shared
+# on-disk cache every worker sees. Entries are mostly versioned (core.cache),
+# so a few seconds in process memory is safe; version keys and counters
+# always go to the shared tier. Both tiers are size-bounded and cull the
+# oldest entries. `manage.py warm_cache` fills them after a deploy.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'TIMEOUT': 60 * 15,
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_TIMEOUT': 5,
+            'MAX_ENTRIES': 2000,
+            'SHARED_ONLY_PREFIXES': ('version:', 'fragments:'),
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / '.cache'),
+        'TIMEOUT': 60 * 15,
+        'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 4},
+    },
+}
+
+# Per-view SQL and timing statistics (core.perf), shown on the admin's Performance page
+QUERY_STATS_SAMPLE_RATE = float(os.environ.get('QUERY_STATS_SAMPLE_RATE', 0.1))
+QUERY_STATS_FLUSH_INTERVAL = 30
+QUERY_STATS_RETENTION_HOURS = 24 * 7
+
+# Tests get their own shared cache directory; see core.test_runner
+TEST_RUNNER = 'core.test_runner.IsolatedCacheRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -8,4 +8,5 @@ urlpatterns = [
     path('', include('listings.urls')),
     path('auth/', include('core.urls')), 
     path('booking/', include('booking.urls')),
+    path('api/', include('listings.api')),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file